@@ -0,0 +1,365 @@
+"""
+Teste de carga do protocolo BLE sem celular e sem BlueZ.
+
+Roda o ConnectProtocol com um transporte em memória (LoopbackTransport) e
+celulares simulados (FakeCentral) que repetem uma sessão roteirizada:
+LIST, GET, N x CHUNK, rajada de SETTINGS, leituras do stream ao vivo e DEL.
+O transporte corta as notificações em MTU-3 como o BlueZ, e o stream ao
+vivo é remontado como o app faria para conferir que todo final chegou
+inteiro (o processo sai com erro se algum faltar).
+
+    python ble_loadtest.py --conversations 20 --lines 400 --centrals 2
+    python ble_loadtest.py --conversations 5 --lines 50 --centrals 2 --mtu 23
+"""
+
+import asyncio
+import datetime
+import functools
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from ble_protocol import ConnectProtocol
+from utils import conversation_store
+
+
+class LiveStreamReceiver:
+    """Remonta o stream ao vivo como o app: junta as partes, aplica deltas e guarda os finais."""
+
+    def __init__(self):
+        self.finals = []
+        self.partial = ""
+        self.errors = 0
+        self._parts = {}
+        self._partials = {}
+
+    def feed(self, payload):
+        try:
+            frames = json.loads(payload)
+        except ValueError:
+            self.errors += 1  # notificação cortada
+            return
+        if frames and not isinstance(frames[0], dict):
+            self._feed_part(frames)
+            return
+        for frame in frames:
+            self._apply(frame)
+
+    def _feed_part(self, part):
+        """Parte de frame dividido: [s, 0, x, n, t] e depois [s, i, x]."""
+        seq, index, text = part[:3]
+        if index == 0:
+            self._parts[seq] = ({"s": seq, "t": part[4]}, part[3], [text])
+        else:
+            pending = self._parts.get(seq)
+            if pending is None or index != len(pending[2]):
+                self.errors += 1
+                self._parts.pop(seq, None)
+                return
+            pending[2].append(text)
+        header, count, pieces = self._parts[seq]
+        if len(pieces) == count:
+            del self._parts[seq]
+            self._apply(dict(header, x="".join(pieces)))
+
+    def _apply(self, frame):
+        kind = frame["t"]
+        if kind == "f":
+            self.finals.append(frame["x"])
+            self._partials.clear()
+            self.partial = ""
+            return
+        if kind == "d":
+            base = self._partials.get(frame["b"])
+            if base is None:
+                self.errors += 1
+                return
+            text = base[: frame["p"]] + frame["x"]
+        else:
+            text = frame["x"]
+        self._partials[frame["s"]] = text
+        self.partial = text
+
+
+class LoopbackTransport:
+    """Transporte em memória: guarda as notificações que iriam para o BlueZ, cortadas em MTU-3."""
+
+    def __init__(self, mtu=185, receiver=None):
+        self.payload_limit = mtu - 3
+        self.receiver = receiver
+        self.notifications = []
+        self.bytes_notified = 0
+        self.truncated = 0
+
+    def notify(self, characteristic_name, payload):
+        if len(payload) > self.payload_limit:
+            # O BlueZ envia só o que cabe no MTU
+            payload = payload[: self.payload_limit]
+            self.truncated += 1
+        self.notifications.append((characteristic_name, payload))
+        self.bytes_notified += len(payload)
+        if self.receiver is not None and characteristic_name == "transcription_stream":
+            self.receiver.feed(payload)
+
+
+class FakeCentral:
+    """Celular simulado: escreve comandos e lê as characteristics como o app faria."""
+
+    def __init__(self, protocol, name, mtu=185):
+        self.protocol = protocol
+        self.name = name
+        self.options = {"device": f"/org/bluez/hci0/dev_{name}", "mtu": mtu}
+        self._rid = itertools.count(1)
+        self._early = {}
+        self.round_trips = []
+        self.bytes_received = 0
+        self.list_pages = 0
+
+    def write(self, text):
+        self.protocol.handle_command_write(text.encode("utf-8"), self.options)
+
+    def read_conversations(self):
+        return self.protocol.read_conversations(self.options)
+
+    def read_stream(self):
+        payload = self.protocol.read_transcription_stream(self.options)
+        self.bytes_received += len(payload)
+        return payload
+
+    async def request(self, command, timeout=5.0):
+        """Envia o comando com request-id e espera a resposta correspondente."""
+        rid = f"{self.name}-{next(self._rid)}"
+        started = time.perf_counter()
+        self.write(f"{rid}|{command}")
+        deadline = started + timeout
+        while rid not in self._early:
+            raw = self.read_conversations()
+            try:
+                envelope = json.loads(raw)
+            except ValueError:
+                envelope = None
+            # Sem resposta pronta o protocolo devolve a lista em cache (sem "rid")
+            if isinstance(envelope, dict) and "rid" in envelope:
+                self._early[envelope["rid"]] = (envelope.get("data"), len(raw))
+                continue
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"{command} sem resposta em {timeout}s")
+            await asyncio.sleep(0.001)
+        data, size = self._early.pop(rid)
+        self.round_trips.append(time.perf_counter() - started)
+        self.bytes_received += size
+        return data, size
+
+
+def build_synthetic_transcripts(target_dir, conversations, lines):
+    """Cria conversas finalizadas com linhas de ~40 caracteres."""
+    os.makedirs(target_dir, exist_ok=True)
+    words = "a aula de hoje vai tratar de acessibilidade e inclusão no ambiente escolar".split()
+    base = datetime.datetime(2025, 1, 1, 8, 0, 0)
+    for c in range(conversations):
+        created = base + datetime.timedelta(days=c)
+        conv_id = f"Conversa_{created.strftime('%Y-%m-%d_%H-%M-%S')}"
+        payload = {
+            "conversation_id": conv_id,
+            "created_at": created.isoformat(),
+            "finalized": True,
+            "lines": [
+                {
+                    "text": " ".join(words[(i + j) % len(words)] for j in range(7)),
+                    "timestamp": (created + datetime.timedelta(seconds=3 * i)).isoformat(),
+                }
+                for i in range(lines)
+            ],
+        }
+        with open(os.path.join(target_dir, f"{conv_id}.json"), "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False, indent=2)
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+async def list_all_pages(central):
+    """Percorre o LIST paginado até o fim; retorna (conversas, páginas lidas)."""
+    items, pages, cursor = [], 0, None
+    while True:
+        options = {"cursor": cursor} if cursor else {}
+        page, _ = await central.request("LIST:" + json.dumps(options))
+        pages += 1
+        items.extend({"conversation_id": item["id"]} for item in (page or {}).get("items", []))
+        cursor = (page or {}).get("next")
+        if not cursor:
+            return items, pages
+
+
+async def run_central_session(central, sync_limit, settings_burst, delete, paged_list=False):
+    """Sessão roteirizada de um celular; retorna bytes gastos por conversa sincronizada."""
+    per_conversation = []
+    if paged_list:
+        listing, central.list_pages = await list_all_pages(central)
+    else:
+        listing, _ = await central.request("LIST")
+    for item in (listing or [])[:sync_limit]:
+        conv_id = item.get("conversation_id")
+        meta, size = await central.request(f"GET:{conv_id}")
+        total = size
+        for chunk_index in range((meta or {}).get("total_chunks", 0)):
+            _, size = await central.request(f"CHUNK:{conv_id}:{chunk_index}")
+            total += size
+        per_conversation.append(total)
+
+    for i in range(settings_burst):
+        central.write("SETTINGS:" + json.dumps({"fontSize": 30 + i % 10}))
+        await asyncio.sleep(0)
+
+    if delete and listing:
+        await central.request(f"DEL:{listing[-1]['conversation_id']}")
+    return per_conversation
+
+
+async def run_live_stream(protocol, centrals, updates):
+    """
+    Simula o transcriber: parciais crescendo palavra a palavra e um final a
+    cada frase (uma em cada três bem maior que uma notificação).
+
+    Returns:
+        Finais enviados, em ordem
+    """
+    words = "o professor explicou que a prova será na próxima semana".split()
+    finals = []
+    for i in range(updates):
+        n = i % (len(words) + 1)
+        if n == len(words):
+            sentence = " ".join(words * (6 if len(finals) % 3 == 2 else 1))
+            finals.append(sentence)
+            protocol.push_final(sentence)
+        else:
+            protocol.push_partial(" ".join(words[: n + 1]))
+        for central in centrals:
+            central.read_stream()
+        await asyncio.sleep(0.005)
+    # espera o pump esvaziar a fila
+    await asyncio.sleep(0.1)
+    while protocol._live_queue.has_pending():
+        await asyncio.sleep(0.05)
+    return finals
+
+
+async def run_loadtest(transcripts_dir, centrals=1, mtu=185, sync_limit=5, settings_burst=20, live_updates=200, delete=True, paged_list=False):
+    settings_applied = []
+    receiver = LiveStreamReceiver()
+    transport = LoopbackTransport(mtu=mtu, receiver=receiver)
+    protocol = ConnectProtocol(
+        get_conversations_cb=functools.partial(conversation_store.get_conversations, transcripts_dir=transcripts_dir),
+        get_conversation_by_id_cb=functools.partial(conversation_store.get_conversation_by_id, transcripts_dir=transcripts_dir),
+        get_conversation_chunk_cb=functools.partial(conversation_store.get_conversation_chunk, transcripts_dir=transcripts_dir),
+        delete_conversation_cb=functools.partial(conversation_store.delete_conversation, transcripts_dir=transcripts_dir),
+        search_conversations_cb=functools.partial(conversation_store.search_conversations, transcripts_dir=transcripts_dir),
+        list_conversations_page_cb=functools.partial(conversation_store.list_conversations_page, transcripts_dir=transcripts_dir),
+        sync_changes_cb=functools.partial(conversation_store.sync_changes, transcripts_dir=transcripts_dir),
+        ack_conversation_cb=functools.partial(conversation_store.ack_conversation, transcripts_dir=transcripts_dir),
+        set_settings_cb=settings_applied.append,
+        transport=transport,
+        log_commands=False,
+    )
+    protocol.attach_loop(asyncio.get_running_loop())
+    pump = asyncio.ensure_future(protocol.run_live_pump())
+
+    phones = [FakeCentral(protocol, f"PHONE{i}", mtu=mtu) for i in range(centrals)]
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        run_live_stream(protocol, phones, live_updates),
+        *(run_central_session(p, sync_limit, settings_burst, delete, paged_list) for p in phones),
+    )
+    wall = time.perf_counter() - started
+    pump.cancel()
+    protocol.shutdown_executor()
+
+    # A fila junta finais quando enche: compara o texto corrido
+    finals_sent = results[0]
+    finals_intact = " ".join(receiver.finals) == " ".join(finals_sent)
+    per_conversation = [size for sizes in results[1:] for size in sizes]
+    round_trips = [rt for p in phones for rt in p.round_trips]
+    stats = protocol.get_command_stats()
+    live = protocol.get_live_stats()
+    return {
+        "centrals": centrals,
+        "wall_seconds": round(wall, 3),
+        "commands": stats["commands"],
+        "commands_per_second": round(stats["commands"] / wall, 1) if wall else 0.0,
+        "build_ms_p50": round(stats["p50_ms"], 3),
+        "build_ms_p95": round(stats["p95_ms"], 3),
+        "build_ms_p99": round(stats["p99_ms"], 3),
+        "round_trip_ms_p50": round(_percentile(round_trips, 0.50) * 1000.0, 3),
+        "round_trip_ms_p95": round(_percentile(round_trips, 0.95) * 1000.0, 3),
+        "conversations_synced": len(per_conversation),
+        "list_pages": sum(p.list_pages for p in phones),
+        "bytes_per_conversation": round(sum(per_conversation) / len(per_conversation)) if per_conversation else 0,
+        "settings_applied": len(settings_applied),
+        "live_frames": live["frames_sent"],
+        "live_notifications": live["batches_sent"],
+        "live_bytes": live["bytes_sent"],
+        "live_split_frames": live["split_frames"],
+        "live_dropped_partials": live["dropped_partials"],
+        "live_finals_sent": len(finals_sent),
+        "live_finals_received": len(receiver.finals),
+        "live_finals_intact": finals_intact,
+        "live_stream_errors": receiver.errors,
+        "notifications_truncated": transport.truncated,
+    }
+
+
+def _build_cli_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Teste de carga do protocolo BLE com celulares simulados")
+    parser.add_argument("--transcripts", dest="transcripts", default=None, help="Pasta de transcripts a copiar (padrão: dados sintéticos)")
+    parser.add_argument("--conversations", type=int, default=10, help="Conversas sintéticas geradas")
+    parser.add_argument("--lines", type=int, default=200, help="Linhas por conversa sintética")
+    parser.add_argument("--centrals", type=int, default=1, help="Celulares conectados ao mesmo tempo")
+    parser.add_argument("--mtu", type=int, default=185, help="MTU negociado pelos celulares simulados")
+    parser.add_argument("--sync", dest="sync_limit", type=int, default=5, help="Conversas baixadas por celular")
+    parser.add_argument("--settings-burst", type=int, default=20, help="Comandos SETTINGS enviados em rajada")
+    parser.add_argument("--live-updates", type=int, default=200, help="Parciais/finais enviados pelo stream ao vivo")
+    parser.add_argument("--no-delete", dest="delete", action="store_false", help="Não executa DEL no fim da sessão")
+    parser.add_argument("--paged-list", action="store_true", help="Lista todas as conversas pelo LIST paginado")
+    return parser
+
+
+def _run_cli():
+    args = _build_cli_parser().parse_args()
+    work_dir = tempfile.mkdtemp(prefix="sonoris_loadtest_")
+    transcripts_dir = os.path.join(work_dir, "transcripts")
+    try:
+        if args.transcripts:
+            # Copia para não apagar conversas reais com o DEL
+            shutil.copytree(args.transcripts, transcripts_dir)
+        else:
+            build_synthetic_transcripts(transcripts_dir, args.conversations, args.lines)
+        report = asyncio.run(
+            run_loadtest(
+                transcripts_dir,
+                centrals=args.centrals,
+                mtu=args.mtu,
+                sync_limit=args.sync_limit,
+                settings_burst=args.settings_burst,
+                live_updates=args.live_updates,
+                delete=args.delete,
+                paged_list=args.paged_list,
+            )
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if not report["live_finals_intact"] or report["live_stream_errors"]:
+        raise SystemExit("stream ao vivo: finais perdidos ou cortados")
+
+
+if __name__ == "__main__":
+    _run_cli()
@@ -0,0 +1,607 @@
+"""Protocolo de comandos/respostas do serviço BLE Sonoris, sem dependência do BlueZ."""
+
+import asyncio
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ble_stream import LiveCaptionQueue, LIVE_PUSH_INTERVAL_MS, DEFAULT_ATT_MTU, notify_payload_limit
+
+# Respostas prontas aguardando leitura pelo app (as mais antigas são descartadas)
+RESPONSE_QUEUE_MAX = 16
+
+# Amostras usadas nos percentis de tempo de montagem das respostas
+COMMAND_STATS_WINDOW = 1000
+
+# Celulares com sessão própria ao mesmo tempo (a sessão inativa há mais tempo é descartada)
+MAX_SESSIONS = 8
+DEFAULT_SESSION_KEY = "local"
+
+# Separador opcional de request-id: "<rid>|GET:<id>" responde {"rid": "<rid>", "data": ...}
+REQUEST_ID_SEP = "|"
+
+
+class BleCommand:
+    """Comando recebido pela characteristic connect, com id próprio para a resposta."""
+
+    __slots__ = ("rid", "name", "arg", "chunk_index", "raw", "explicit_rid", "mtu", "phone")
+
+    def __init__(self, rid, name, arg=None, chunk_index=0, raw="", explicit_rid=False):
+        self.rid = rid
+        self.name = name
+        self.arg = arg
+        self.chunk_index = chunk_index
+        self.raw = raw
+        self.explicit_rid = explicit_rid
+        self.mtu = DEFAULT_ATT_MTU  # MTU da sessão, para empacotar respostas paginadas
+        self.phone = None  # identidade do celular (cursores do SYNC/ACK)
+
+
+def parse_command(txt, auto_rid):
+    """
+    Interpreta o texto escrito pelo app.
+
+    Args:
+        txt: Texto do comando (ex.: "GET:Conversa_x" ou "7|CHUNK:Conversa_x:2")
+        auto_rid: Id usado quando o app não envia um request-id
+
+    Returns:
+        BleCommand, ou None se o comando for desconhecido/mal formatado
+    """
+    rid = auto_rid
+    explicit = False
+    head, sep, rest = txt.partition(REQUEST_ID_SEP)
+    if sep and head.strip() and ":" not in head:
+        rid = head.strip()
+        explicit = True
+        txt = rest.strip()
+
+    # Usa upper() apenas para comparação, não para processar o payload
+    txt_upper = txt.upper()
+    if txt_upper in ("START", "STOP", "RESYNC"):
+        return BleCommand(rid, txt_upper, raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("SETTINGS:"):
+        # IMPORTANTE: usa txt original (não upper) para preservar case do JSON
+        return BleCommand(rid, "SETTINGS", txt.split(":", 1)[1], raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("SEARCH:"):
+        # Preserva o texto original da consulta (acentos e maiúsculas são normalizados no índice)
+        query = txt.split(":", 1)[1].strip()
+        if not query:
+            return None
+        return BleCommand(rid, "SEARCH", query, raw=txt, explicit_rid=explicit)
+    if txt_upper == "SYNC" or txt_upper.startswith("SYNC:"):
+        # SYNC ou SYNC:{"phone": ..., "cursor": ..., "limit": ...}
+        try:
+            options = json.loads(txt.split(":", 1)[1] or "{}") if ":" in txt else {}
+        except ValueError:
+            print(f"[BLE] Opções do SYNC inválidas: {txt}")
+            return None
+        if not isinstance(options, dict):
+            return None
+        return BleCommand(rid, "SYNC", options, raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("ACK:"):
+        # Formato: ACK:conversation_id:linhas_recebidas
+        parts = txt.split(":", 2)
+        if len(parts) != 3 or not parts[1].strip():
+            print(f"[BLE] Comando ACK mal formatado: {txt}")
+            return None
+        try:
+            lines = int(parts[2].strip())
+        except ValueError:
+            print(f"[BLE] Quantidade de linhas inválida no ACK: {txt}")
+            return None
+        # chunk_index carrega a quantidade de linhas confirmadas
+        return BleCommand(rid, "ACK", parts[1].strip(), lines, raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("LIST:"):
+        # LIST paginado: LIST:{"cursor": ..., "since": ..., "finalized": true, "unsynced": true}
+        try:
+            options = json.loads(txt.split(":", 1)[1] or "{}")
+        except ValueError:
+            print(f"[BLE] Opções do LIST inválidas: {txt}")
+            return None
+        if not isinstance(options, dict):
+            return None
+        return BleCommand(rid, "LIST", options, raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("LIST"):
+        return BleCommand(rid, "LIST", raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("GET:") or txt_upper.startswith("DEL:"):
+        conv_id = txt.split(":", 1)[1].strip()
+        if not conv_id:
+            return None
+        return BleCommand(rid, txt_upper[:3], conv_id, raw=txt, explicit_rid=explicit)
+    if txt_upper.startswith("CHUNK:"):
+        # Formato: CHUNK:conversation_id:chunk_index
+        parts = txt.split(":", 2)
+        if len(parts) != 3 or not parts[1].strip():
+            print(f"[BLE] Comando CHUNK mal formatado: {txt}")
+            return None
+        try:
+            chunk_index = int(parts[2].strip())
+        except ValueError:
+            chunk_index = 0
+            print(f"[BLE] Índice de chunk inválido, usando 0")
+        return BleCommand(rid, "CHUNK", parts[1].strip(), chunk_index, raw=txt, explicit_rid=explicit)
+    return None
+
+
+class CentralSession:
+    """Estado de um celular conectado, identificado pelo caminho D-Bus do device."""
+
+    def __init__(self, key):
+        self.key = key
+        self.responses = OrderedDict()  # rid -> (comando, bytes ou None enquanto em preparo)
+        self.pending = deque()          # comandos aguardando a vez no executor
+        self.mtu = DEFAULT_ATT_MTU
+        self.cursor = (None, 0)         # (conversa, chunk) da última transferência
+        self.phone = None               # id enviado pelo app no SYNC (senão vale o device)
+        self.commands = 0
+        self.last_seen = time.monotonic()
+
+    def get_stats(self):
+        return {
+            "device": self.key,
+            "mtu": self.mtu,
+            "commands": self.commands,
+            "pending": len(self.pending),
+            "responses": len(self.responses),
+            "cursor": list(self.cursor),
+        }
+
+
+def session_key(options):
+    """Extrai o caminho D-Bus do device das opções do bluez (ou uma chave padrão)."""
+    device = getattr(options, "device", None)
+    if isinstance(options, dict):
+        device = options.get("device", device)
+    return str(device) if device else DEFAULT_SESSION_KEY
+
+
+class ConnectProtocol:
+    """
+    Lógica de comandos e respostas do serviço BLE, independente do BlueZ.
+
+    O transporte (ConnectService no Raspberry Pi, LoopbackTransport nos testes
+    de carga) repassa leituras/escritas das characteristics para os métodos
+    handle_*/read_* e recebe as notificações por transport.notify(nome, bytes).
+    """
+
+    def __init__(
+        self,
+        on_start_cb=None,
+        on_stop_cb=None,
+        device_info_cb=None,
+        set_device_name_cb=None,
+        get_conversations_cb=None,
+        get_conversation_by_id_cb=None,
+        get_conversation_chunk_cb=None,
+        delete_conversation_cb=None,
+        set_settings_cb=None,
+        search_conversations_cb=None,
+        list_conversations_page_cb=None,
+        sync_changes_cb=None,
+        ack_conversation_cb=None,
+        transport=None,
+        log_commands=True,
+    ):
+        self.transport = transport
+        self.log_commands = log_commands
+        self.on_start_cb = on_start_cb
+        self.on_stop_cb = on_stop_cb
+        self.device_info_cb = device_info_cb
+        self.set_device_name_cb = set_device_name_cb
+        self.get_conversations_cb = get_conversations_cb
+        self.get_conversation_by_id_cb = get_conversation_by_id_cb
+        self.get_conversation_chunk_cb = get_conversation_chunk_cb
+        self.delete_conversation_cb = delete_conversation_cb
+        self.set_settings_cb = set_settings_cb
+        self.search_conversations_cb = search_conversations_cb
+        self.list_conversations_page_cb = list_conversations_page_cb
+        self.sync_changes_cb = sync_changes_cb
+        self.ack_conversation_cb = ack_conversation_cb
+        self._device_info = {"device_name": "Sonoris Device", "total_active_time": 0, "total_conversations": 0}
+
+        # Stream de transcrições: fila coalescida enviada por notify no loop asyncio
+        self._transcription_buffer = b"[]"
+        self._loop = None
+        self._live_ready = None
+        self._live_queue = LiveCaptionQueue(on_ready=self._wake_live_pump)
+
+        # Pipeline de comandos: uma sessão por celular, cada comando com request-id próprio
+        self._response_lock = threading.Lock()
+        self._sessions = OrderedDict()  # chave -> CentralSession (ordem = uso mais recente)
+        self._ready_sessions = deque()  # sessões com comandos pendentes (round-robin)
+        self._work_ready = None
+        self._scheduler = None
+        self._auto_rid = itertools.count(1)
+        self._list_cache = b"[]"
+        self._build_latencies = deque(maxlen=COMMAND_STATS_WINDOW)
+        self._commands_done = 0
+        self._response_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            self._list_cache = self._build_response_sync("LIST")
+        except Exception:
+            pass
+
+    def handle_command_write(self, value, options):
+        """Escrita na characteristic connect (comandos do app)."""
+        session = self._session_for(options)
+        try:
+            txt = bytes(value).decode('utf-8').strip()
+        except Exception:
+            txt = ""
+        
+        if self.log_commands:
+            print(f"[BLE] Comando recebido: '{txt}'")
+
+        cmd = parse_command(txt, f"_{next(self._auto_rid)}")
+        if cmd is None:
+            return
+        session.commands += 1
+        if cmd.name == "SYNC" and cmd.arg.get("phone"):
+            # Endereço BLE pode mudar (privacidade): o app manda uma identidade estável
+            session.phone = str(cmd.arg["phone"])
+
+        # Comandos baratos rodam direto no handler; o resto vai para o executor
+        if cmd.name == "START":
+            if callable(self.on_start_cb):
+                self.on_start_cb()
+        elif cmd.name == "STOP":
+            if callable(self.on_stop_cb):
+                self.on_stop_cb()
+        elif cmd.name == "RESYNC":
+            # App perdeu frames do stream: próximo parcial vai completo
+            self._live_queue.request_keyframe()
+        else:
+            if cmd.name == "SETTINGS" and not cmd.explicit_rid:
+                # SETTINGS legado não tem resposta para o app ler
+                cmd.rid = None
+            self._submit_command(session, cmd)
+    
+    def read_device_info(self, options):
+        # Obtém informações atualizadas do dispositivo se disponível
+        if callable(self.device_info_cb):
+            info = self.device_info_cb()
+            if info:
+                self._device_info = info
+            else:
+                print(f"[BLE] Callback retornou None, usando dados em cache")
+        else:
+            print(f"[BLE] device_info_cb não é callable")
+        
+        # Converte para JSON e depois para bytes
+        try:
+            info_json = json.dumps(self._device_info)
+            return bytes(info_json, 'utf-8')
+        except Exception as e:
+            print(f"[BLE] Erro ao enviar info do dispositivo: {e}")
+            import traceback
+            traceback.print_exc()
+            return bytes("{}", 'utf-8')
+    
+    def handle_device_name_write(self, value, options):
+        try:
+            name = bytes(value).decode('utf-8').strip()
+            if name and callable(self.set_device_name_cb):
+                success = self.set_device_name_cb(name)
+                print(f"[BLE] Nome do dispositivo atualizado para: '{name}' (sucesso: {success})")
+        except Exception as e:
+            print(f"[BLE] Erro ao definir nome do dispositivo: {e}")
+    
+    def read_conversations(self, options):
+        try:
+            session = self._session_for(options)
+            cmd_name, payload = self._pop_ready_response(session)
+            if cmd_name in {"GET", "CHUNK"}:
+                # Após GET/CHUNK o app volta a ler a lista: atualiza o cache em background
+                self._submit_command(session, BleCommand(None, "LIST"))
+            return payload
+        except Exception as e:
+            print(f"[BLE] Erro ao enviar conversas: {e}")
+            import traceback
+            traceback.print_exc()
+            return bytes("[]", 'utf-8')
+    
+    def read_transcription_stream(self, options):
+        """Stream de transcrições em tempo real (último lote enviado)."""
+        self._session_for(options)
+        return self._transcription_buffer
+    
+    def send_transcription_data(self, json_data: str):
+        """Mantido por compatibilidade: envia o texto como frame final."""
+        try:
+            payload = json.loads(json_data)
+            text = payload.get("text", "") if isinstance(payload, dict) else str(payload)
+        except Exception:
+            text = json_data
+        self.push_final(text)
+
+    def push_partial(self, text: str):
+        """Enfileira um parcial (substitui o parcial ainda não enviado). Thread-safe."""
+        self._live_queue.push_partial(text)
+
+    def push_final(self, text: str):
+        """Enfileira uma linha final (nunca descartada). Thread-safe."""
+        self._live_queue.push_final(text)
+
+    def get_live_stats(self):
+        return self._live_queue.get_stats()
+
+    def attach_loop(self, loop):
+        """Associa o loop asyncio do BLE para acordar o envio de notificações."""
+        self._loop = loop
+        self._live_ready = asyncio.Event()
+        self._work_ready = asyncio.Event()
+        if self._live_queue.has_pending():
+            self._live_ready.set()
+
+    def _wake_live_pump(self):
+        loop = self._loop
+        if loop is None or self._live_ready is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._live_ready.set)
+        except RuntimeError:
+            # Loop já encerrado
+            pass
+
+    def _session_for(self, options):
+        """Retorna (criando se preciso) a sessão do celular que fez a operação."""
+        key = session_key(options)
+        with self._response_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = CentralSession(key)
+                self._sessions[key] = session
+                while len(self._sessions) > MAX_SESSIONS:
+                    old_key, _ = self._sessions.popitem(last=False)
+                    print(f"[BLE] Sessão inativa descartada: {old_key}")
+            else:
+                self._sessions.move_to_end(key)
+            session.last_seen = time.monotonic()
+        mtu = getattr(options, "mtu", None)
+        if isinstance(options, dict):
+            mtu = options.get("mtu", mtu)
+        if mtu:
+            try:
+                session.mtu = int(mtu)
+            except (TypeError, ValueError):
+                pass
+        return session
+
+    def _live_payload_limit(self):
+        # O notify vai para todos os inscritos: usa o menor MTU entre as sessões
+        with self._response_lock:
+            mtus = [s.mtu for s in self._sessions.values()]
+        return notify_payload_limit(min(mtus) if mtus else DEFAULT_ATT_MTU)
+
+    def get_session_stats(self):
+        with self._response_lock:
+            return [s.get_stats() for s in self._sessions.values()]
+
+    async def run_live_pump(self):
+        """Envia lotes de legendas por notify, no ritmo do connection interval."""
+        interval = LIVE_PUSH_INTERVAL_MS / 1000.0
+        while True:
+            await self._live_ready.wait()
+            self._live_ready.clear()
+            while True:
+                payload = self._live_queue.pop_batch(self._live_payload_limit())
+                if payload is None:
+                    break
+                self._transcription_buffer = payload
+                try:
+                    if self.transport is not None:
+                        self.transport.notify("transcription_stream", payload)
+                except Exception as e:
+                    print(f"[BLE] Erro ao notificar transcrição: {e}")
+                # Frames que chegarem durante a pausa são coalescidos no próximo lote
+                await asyncio.sleep(interval)
+
+    def _submit_command(self, session, cmd):
+        """Registra o slot de resposta na sessão e enfileira o comando para o executor."""
+        cmd.mtu = session.mtu
+        cmd.phone = session.phone or session.key
+        if cmd.name in {"GET", "CHUNK"}:
+            session.cursor = (cmd.arg, cmd.chunk_index)
+        if cmd.rid is not None:
+            with self._response_lock:
+                if not cmd.explicit_rid:
+                    # App legado lê uma resposta por vez: o comando novo substitui as não lidas
+                    for rid in [r for r, (c, _) in session.responses.items() if not c.explicit_rid]:
+                        del session.responses[rid]
+                session.responses[cmd.rid] = (cmd, None)
+                while len(session.responses) > RESPONSE_QUEUE_MAX:
+                    dropped, _ = session.responses.popitem(last=False)
+                    print(f"[BLE] Resposta '{dropped}' descartada (app não leu)")
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            session.pending.append(cmd)
+            if session.key not in self._ready_sessions:
+                self._ready_sessions.append(session.key)
+            if self._scheduler is None or self._scheduler.done():
+                self._scheduler = loop.create_task(self._run_scheduler())
+            self._work_ready.set()
+        elif self._executor:
+            # Sem loop (ex.: antes do register): usa o executor diretamente
+            future = self._executor.submit(self._execute_command, cmd)
+            future.add_done_callback(functools.partial(self._finish_executor_command, session, cmd))
+
+    def _finish_executor_command(self, session, cmd, future):
+        """Done-callback do executor: erro vira resposta vazia, como em _run_command."""
+        try:
+            payload = future.result()
+        except Exception as exc:
+            print(f"[BLE] Erro ao executar {cmd.name}: {exc}")
+            payload = b"[]"
+        self._store_response(session, cmd, payload)
+
+    async def _run_scheduler(self):
+        """
+        Executa um comando por vez, alternando entre as sessões com trabalho.
+        Um celular baixando uma conversa longa (N x CHUNK) não atrasa os
+        comandos do outro; o stream ao vivo roda à parte no próprio loop.
+        """
+        while True:
+            if not self._ready_sessions:
+                self._work_ready.clear()
+                await self._work_ready.wait()
+                continue
+            key = self._ready_sessions.popleft()
+            session = self._sessions.get(key)
+            if session is None or not session.pending:
+                continue
+            cmd = session.pending.popleft()
+            if session.pending:
+                self._ready_sessions.append(key)
+            await self._run_command(session, cmd)
+
+    async def _run_command(self, session, cmd):
+        if not self._executor:
+            return
+        try:
+            payload = await self._loop.run_in_executor(
+                self._executor, functools.partial(self._execute_command, cmd)
+            )
+        except Exception as exc:
+            print(f"[BLE] Erro ao executar {cmd.name}: {exc}")
+            payload = b"[]"
+        self._store_response(session, cmd, payload)
+
+    def _execute_command(self, cmd):
+        """Roda na thread do executor e mede o tempo de montagem da resposta."""
+        started = time.perf_counter()
+        payload = self._execute_command_sync(cmd)
+        elapsed = time.perf_counter() - started
+        with self._response_lock:
+            self._build_latencies.append(elapsed)
+            self._commands_done += 1
+            self._response_bytes += len(payload or b"")
+        return payload
+
+    def _execute_command_sync(self, cmd):
+        """Callbacks lentos (disco, fontes, settings) fora do loop D-Bus."""
+        if cmd.name == "SETTINGS":
+            try:
+                settings = json.loads(cmd.arg)
+                if callable(self.set_settings_cb):
+                    self.set_settings_cb(settings)
+                else:
+                    print(f"[BLE] Aviso: set_settings_cb não definido")
+                return b'{"ok":true}'
+            except Exception as e:
+                print(f"[BLE] Erro ao processar SETTINGS: {e}")
+                return b'{"ok":false}'
+        if cmd.name == "DEL":
+            if callable(self.delete_conversation_cb):
+                try:
+                    self.delete_conversation_cb(cmd.arg)
+                except Exception as e:
+                    print(f"[BLE] Erro ao deletar conversa '{cmd.arg}': {e}")
+            # após deletar, responde com a lista atualizada
+            return self._build_response_sync("LIST")
+        if cmd.name == "LIST" and cmd.arg is not None:
+            return self._build_page(cmd, self.list_conversations_page_cb, cmd.arg)
+        if cmd.name == "SYNC":
+            return self._build_page(cmd, self.sync_changes_cb, cmd.phone, cmd.arg)
+        if cmd.name == "ACK":
+            result = {}
+            try:
+                if callable(self.ack_conversation_cb):
+                    result = self.ack_conversation_cb(cmd.phone, cmd.arg, cmd.chunk_index) or {}
+            except Exception as exc:
+                print(f"[BLE] Erro ao registrar ACK de '{cmd.arg}': {exc}")
+            return json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return self._build_response_sync(cmd.name, cmd.arg, cmd.chunk_index)
+
+    def _build_page(self, cmd, callback, *args):
+        """LIST paginado/SYNC: uma página com tantas conversas quanto cabem no MTU da sessão."""
+        budget = notify_payload_limit(cmd.mtu)
+        if cmd.explicit_rid:
+            # Desconta o envelope {"rid": ..., "data": ...}
+            budget -= len(b'{"rid":,"data":}') + len(json.dumps(cmd.rid).encode('utf-8'))
+        page = {"items": [], "next": None}
+        try:
+            if callable(callback):
+                page = callback(*args, budget) or page
+        except Exception as exc:
+            print(f"[BLE] Erro ao preparar {cmd.name}: {exc}")
+        return json.dumps(page, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _store_response(self, session, cmd, payload):
+        if payload is None:
+            payload = b"[]"
+        with self._response_lock:
+            if cmd.name == "DEL" or (cmd.name == "LIST" and cmd.arg is None):
+                self._list_cache = payload
+            if cmd.rid is None:
+                # Atualização interna ou SETTINGS legado: nada a entregar
+                return
+            if cmd.rid in session.responses:
+                if cmd.explicit_rid:
+                    payload = b'{"rid":' + json.dumps(cmd.rid).encode('utf-8') + b',"data":' + payload + b'}'
+                session.responses[cmd.rid] = (cmd, payload)
+
+    def _pop_ready_response(self, session):
+        """Retorna (comando, payload) da resposta pronta mais antiga da sessão, ou a lista em cache."""
+        with self._response_lock:
+            for rid, (cmd, payload) in session.responses.items():
+                if payload is not None:
+                    del session.responses[rid]
+                    return cmd.name, payload
+            return None, self._list_cache or b"[]"
+
+    def _build_response_sync(self, mode, conversation_id=None, chunk_index=0):
+        try:
+            if mode == "LIST":
+                data = []
+                if callable(self.get_conversations_cb):
+                    data = self.get_conversations_cb() or []
+                return json.dumps(data).encode('utf-8')
+            if mode == "GET" and conversation_id:
+                metadata = {}
+                if callable(self.get_conversation_by_id_cb):
+                    metadata = self.get_conversation_by_id_cb(conversation_id) or {}
+                return json.dumps(metadata).encode('utf-8')
+            if mode == "CHUNK" and conversation_id is not None:
+                chunk_data = {}
+                if callable(self.get_conversation_chunk_cb):
+                    chunk_data = self.get_conversation_chunk_cb(conversation_id, chunk_index) or {}
+                return json.dumps(chunk_data).encode('utf-8')
+            if mode == "SEARCH" and conversation_id:
+                # conversation_id carrega a consulta
+                results = {}
+                if callable(self.search_conversations_cb):
+                    results = self.search_conversations_cb(conversation_id) or {}
+                return json.dumps(results, ensure_ascii=False).encode('utf-8')
+        except Exception as exc:
+            print(f"[BLE] Erro ao preparar resposta {mode}: {exc}")
+        return b"[]"
+
+    def get_command_stats(self):
+        """Comandos executados, bytes de resposta e percentis do tempo de montagem (ms)."""
+        with self._response_lock:
+            samples = sorted(self._build_latencies)
+            stats = {"commands": self._commands_done, "response_bytes": self._response_bytes}
+        for name, pct in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            if samples:
+                idx = min(len(samples) - 1, int(round(pct * (len(samples) - 1))))
+                stats[name] = samples[idx] * 1000.0
+            else:
+                stats[name] = 0.0
+        return stats
+
+    def shutdown_executor(self):
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            self._scheduler = None
+        if self._executor:
+            try:
+                self._executor.shutdown(wait=False)
+            except Exception:
+                pass
+            self._executor = None
@@ -1,14 +1,13 @@
 import asyncio
 import threading
-import time
-import json
-from concurrent.futures import ThreadPoolExecutor
 from bluez_peripheral.gatt.service import Service
 from bluez_peripheral.gatt.characteristic import characteristic, CharacteristicFlags as CharFlags
 from bluez_peripheral.gatt.descriptor import descriptor, DescriptorFlags as DescFlags
 from bluez_peripheral.advert import Advertisement
 from bluez_peripheral.util import get_message_bus
 
+from ble_protocol import ConnectProtocol
+
 SERVICE_UUID = "12345678-1234-5678-1234-56789abcdef0"
 CHAR_UUID    = "12345678-1234-5678-1234-56789abcdef1"
 DEVICE_INFO_UUID = "12345678-1234-5678-1234-56789abcdef2"
@@ -17,6 +16,8 @@ CONVERSATIONS_UUID = "12345678-1234-5678-1234-56789abcdef4"
 TRANSCRIPTION_STREAM_UUID = "12345678-1234-5678-1234-56789abcdef5"
 
 class ConnectService(Service):
+    """Serviço GATT do BlueZ: repassa as characteristics para o ConnectProtocol."""
+
     def __init__(
         self,
         on_start_cb=None,
@@ -28,36 +29,32 @@ class ConnectService(Service):
         get_conversation_chunk_cb=None,
         delete_conversation_cb=None,
         set_settings_cb=None,
+        search_conversations_cb=None,
+        list_conversations_page_cb=None,
+        sync_changes_cb=None,
+        ack_conversation_cb=None,
     ):
         super().__init__(SERVICE_UUID, True)
-        self.on_start_cb = on_start_cb
-        self.on_stop_cb = on_stop_cb
-        self.device_info_cb = device_info_cb
-        self.set_device_name_cb = set_device_name_cb
-        self.get_conversations_cb = get_conversations_cb
-        self.get_conversation_by_id_cb = get_conversation_by_id_cb
-        self.get_conversation_chunk_cb = get_conversation_chunk_cb
-        self.delete_conversation_cb = delete_conversation_cb
-        self.set_settings_cb = set_settings_cb
-        self._device_info = {"device_name": "Sonoris Device", "total_active_time": 0, "total_conversations": 0}
-
-        # Estado simples para comandos
-        self._last_cmd = "LIST"  # LIST | GET | DEL | CHUNK
-        self._last_id = None
-        self._last_chunk_index = 0
-        
-        # Buffer para stream de transcrições
-        self._transcription_buffer = b""
-        self._response_lock = threading.Lock()
-        self._pending_response = b"[]"
-        self._active_mode = "LIST"
-        self._next_mode_after_consume = None
-        self._executor = ThreadPoolExecutor(max_workers=1)
-        try:
-            self._pending_response = self._build_response_sync("LIST")
-        except Exception:
-            pass
-        self._queue_response("LIST")
+        self.protocol = ConnectProtocol(
+            on_start_cb=on_start_cb,
+            on_stop_cb=on_stop_cb,
+            device_info_cb=device_info_cb,
+            set_device_name_cb=set_device_name_cb,
+            get_conversations_cb=get_conversations_cb,
+            get_conversation_by_id_cb=get_conversation_by_id_cb,
+            get_conversation_chunk_cb=get_conversation_chunk_cb,
+            delete_conversation_cb=delete_conversation_cb,
+            set_settings_cb=set_settings_cb,
+            search_conversations_cb=search_conversations_cb,
+            list_conversations_page_cb=list_conversations_page_cb,
+            sync_changes_cb=sync_changes_cb,
+            ack_conversation_cb=ack_conversation_cb,
+            transport=self,
+        )
+
+    def notify(self, characteristic_name, payload):
+        """Transporte BlueZ: dispara o notify da characteristic (roda no loop BLE)."""
+        getattr(self, characteristic_name).changed(payload)
 
     @characteristic(CHAR_UUID, CharFlags.WRITE | CharFlags.WRITE_WITHOUT_RESPONSE)
     def connect(self, options):
@@ -65,93 +62,11 @@ class ConnectService(Service):
 
     @connect.setter
     def connect(self, value, options):
-        try:
-            txt = bytes(value).decode('utf-8').strip()
-        except Exception:
-            txt = ""
-        
-        print(f"[BLE] Comando recebido: '{txt}'")
-
-        # Usa upper() apenas para comparação, não para processar o payload
-        txt_upper = txt.upper()
-        
-        if txt_upper == "START":
-            if callable(self.on_start_cb):
-                self.on_start_cb()
-        elif txt_upper == "STOP":
-            if callable(self.on_stop_cb):
-                self.on_stop_cb()
-        elif txt_upper.startswith("SETTINGS:"):
-            # Processa configurações de legendas enviadas pelo app
-            # IMPORTANTE: usa txt original (não upper) para preservar case do JSON
-            try:
-                payload = txt.split(":", 1)[1]
-                settings = json.loads(payload)
-                if callable(self.set_settings_cb):
-                    self.set_settings_cb(settings)
-                else:
-                    print(f"[BLE] Aviso: set_settings_cb não definido")
-            except Exception as e:
-                print(f"[BLE] Erro ao processar SETTINGS: {e}")
-        elif txt_upper.startswith("LIST"):
-            self._last_cmd = "LIST"
-            self._last_id = None
-            self._queue_response("LIST")
-        elif txt_upper.startswith("GET:"):
-            self._last_cmd = "GET"
-            self._last_id = txt.split(":", 1)[1].strip()
-            if self._last_id:
-                self._queue_response("GET", conversation_id=self._last_id)
-        elif txt_upper.startswith("CHUNK:"):
-            # Formato: CHUNK:conversation_id:chunk_index
-            parts = txt.split(":", 2)
-            if len(parts) == 3:
-                self._last_cmd = "CHUNK"
-                self._last_id = parts[1].strip()
-                try:
-                    self._last_chunk_index = int(parts[2].strip())
-                except ValueError:
-                    self._last_chunk_index = 0
-                    print(f"[BLE] Índice de chunk inválido, usando 0")
-                if self._last_id:
-                    self._queue_response("CHUNK", conversation_id=self._last_id, chunk_index=self._last_chunk_index)
-            else:
-                print(f"[BLE] Comando CHUNK mal formatado: {txt}")
-        elif txt_upper.startswith("DEL:"):
-            self._last_cmd = "DEL"
-            self._last_id = txt.split(":", 1)[1].strip()
-            # executa delete imediatamente
-            if self._last_id and callable(self.delete_conversation_cb):
-                try:
-                    ok = self.delete_conversation_cb(self._last_id)
-                except Exception as e:
-                    print(f"[BLE] Erro ao deletar conversa '{self._last_id}': {e}")
-            # após deletar, volta para LIST
-            self._last_cmd = "LIST"
-            self._last_id = None
-            self._queue_response("LIST")
+        self.protocol.handle_command_write(value, options)
     
     @characteristic(DEVICE_INFO_UUID, CharFlags.READ | CharFlags.NOTIFY)
     def device_info(self, options):
-        # Obtém informações atualizadas do dispositivo se disponível
-        if callable(self.device_info_cb):
-            info = self.device_info_cb()
-            if info:
-                self._device_info = info
-            else:
-                print(f"[BLE] Callback retornou None, usando dados em cache")
-        else:
-            print(f"[BLE] device_info_cb não é callable")
-        
-        # Converte para JSON e depois para bytes
-        try:
-            info_json = json.dumps(self._device_info)
-            return bytes(info_json, 'utf-8')
-        except Exception as e:
-            print(f"[BLE] Erro ao enviar info do dispositivo: {e}")
-            import traceback
-            traceback.print_exc()
-            return bytes("{}", 'utf-8')
+        return self.protocol.read_device_info(options)
     
     @characteristic(DEVICE_NAME_UUID, CharFlags.WRITE | CharFlags.WRITE_WITHOUT_RESPONSE)
     def device_name(self, options):
@@ -159,93 +74,101 @@ class ConnectService(Service):
     
     @device_name.setter
     def device_name(self, value, options):
-        try:
-            name = bytes(value).decode('utf-8').strip()
-            if name and callable(self.set_device_name_cb):
-                success = self.set_device_name_cb(name)
-                print(f"[BLE] Nome do dispositivo atualizado para: '{name}' (sucesso: {success})")
-        except Exception as e:
-            print(f"[BLE] Erro ao definir nome do dispositivo: {e}")
+        self.protocol.handle_device_name_write(value, options)
     
     @characteristic(CONVERSATIONS_UUID, CharFlags.READ | CharFlags.NOTIFY)
     def conversations(self, options):
-        try:
-            with self._response_lock:
-                payload = self._pending_response or b"[]"
-                followup = self._next_mode_after_consume
-                self._next_mode_after_consume = None
-            if followup:
-                self._queue_response(followup)
-            return payload
-        except Exception as e:
-            print(f"[BLE] Erro ao enviar conversas: {e}")
-            import traceback
-            traceback.print_exc()
-            return bytes("[]", 'utf-8')
+        return self.protocol.read_conversations(options)
     
     @characteristic(TRANSCRIPTION_STREAM_UUID, CharFlags.READ | CharFlags.NOTIFY)
     def transcription_stream(self, options):
         """Characteristic para stream de transcrições em tempo real."""
-        result = self._transcription_buffer
-        self._transcription_buffer = b""  # Limpa o buffer após leitura
-        return result
-    
+        return self.protocol.read_transcription_stream(options)
+
+    # Repasses usados pelo BleServerHandle e pelo _ble_main
     def send_transcription_data(self, json_data: str):
-        """Envia dados de transcrição via notify. Chamado externamente."""
+        self.protocol.send_transcription_data(json_data)
+
+    def push_partial(self, text: str):
+        self.protocol.push_partial(text)
+
+    def push_final(self, text: str):
+        self.protocol.push_final(text)
+
+    def attach_loop(self, loop):
+        self.protocol.attach_loop(loop)
+
+    async def run_live_pump(self):
+        await self.protocol.run_live_pump()
+
+    def shutdown_executor(self):
+        self.protocol.shutdown_executor()
+
+class BleServerHandle:
+    """
+    Controle thread-safe do servidor BLE que roda em uma thread própria.
+    Todas as operações são repassadas ao loop asyncio via call_soon_threadsafe,
+    então não há polling: parar, START/STOP e notificações têm efeito imediato.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.loop = None
+        self.service = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._stop_requested = False
+
+    def _attach(self, loop, service, stop):
+        """Chamado pelo próprio loop BLE quando o service está pronto."""
+        self.loop = loop
+        self.service = service
+        self._stop = stop
+        self._ready.set()
+        if self._stop_requested:
+            stop.set()
+
+    def __getitem__(self, key):
+        # Compatível com o antigo service_ref = {'instance': service}
+        if key == 'instance':
+            return self.service
+        raise KeyError(key)
+
+    def get(self, key, default=None):
         try:
-            self._transcription_buffer = bytes(json_data, 'utf-8')
-            # NOTA: O notify será disparado automaticamente quando o app fizer read
-            # ou quando o characteristic state mudar (depende da implementação do bluez_peripheral)
-        except Exception as e:
-            print(f"[BLE] Erro ao preparar transcrição para envio: {e}")
-
-    def _queue_response(self, mode, conversation_id=None, chunk_index=0):
-        if not self._executor:
-            return
-        self._executor.submit(
-            self._build_response,
-            mode,
-            conversation_id,
-            chunk_index,
-        )
+            return self[key]
+        except KeyError:
+            return default
 
-    def _build_response(self, mode, conversation_id=None, chunk_index=0):
-        payload = self._build_response_sync(mode, conversation_id, chunk_index)
-        if payload is None:
-            payload = b"[]"
-        with self._response_lock:
-            self._pending_response = payload
-            self._active_mode = mode
-            self._next_mode_after_consume = "LIST" if mode in {"GET", "CHUNK"} else None
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
 
-    def _build_response_sync(self, mode, conversation_id=None, chunk_index=0):
+    def call_soon(self, fn, *args):
+        """Agenda fn(*args) no loop BLE. Retorna False se o loop não estiver ativo."""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return False
         try:
-            if mode == "LIST":
-                data = []
-                if callable(self.get_conversations_cb):
-                    data = self.get_conversations_cb() or []
-                return json.dumps(data).encode('utf-8')
-            if mode == "GET" and conversation_id:
-                metadata = {}
-                if callable(self.get_conversation_by_id_cb):
-                    metadata = self.get_conversation_by_id_cb(conversation_id) or {}
-                return json.dumps(metadata).encode('utf-8')
-            if mode == "CHUNK" and conversation_id is not None:
-                chunk_data = {}
-                if callable(self.get_conversation_chunk_cb):
-                    chunk_data = self.get_conversation_chunk_cb(conversation_id, chunk_index) or {}
-                return json.dumps(chunk_data).encode('utf-8')
-        except Exception as exc:
-            print(f"[BLE] Erro ao preparar resposta {mode}: {exc}")
-        return b"[]"
+            loop.call_soon_threadsafe(fn, *args)
+            return True
+        except RuntimeError:
+            return False
 
-    def shutdown_executor(self):
-        if self._executor:
-            try:
-                self._executor.shutdown(wait=False)
-            except Exception:
-                pass
-            self._executor = None
+    def push_partial(self, text):
+        if self.service is not None:
+            self.service.push_partial(text)
+
+    def push_final(self, text):
+        if self.service is not None:
+            self.service.push_final(text)
+
+    def stop(self, timeout=None):
+        """Encerra o servidor BLE imediatamente; opcionalmente aguarda a thread."""
+        self._stop_requested = True
+        if self._stop is not None:
+            self.call_soon(self._stop.set)
+        if timeout is not None and self.thread is not None:
+            self.thread.join(timeout)
 
 async def _ble_main(
     on_start_cb,
@@ -257,9 +180,14 @@ async def _ble_main(
     get_conversation_chunk_cb=None,
     delete_conversation_cb=None,
     set_settings_cb=None,
-    stop_event: threading.Event=None,
-    service_ref: dict=None,
+    handle: BleServerHandle=None,
+    search_conversations_cb=None,
+    list_conversations_page_cb=None,
+    sync_changes_cb=None,
+    ack_conversation_cb=None,
 ):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
     bus = await get_message_bus()
     service = ConnectService(
         on_start_cb=on_start_cb, 
@@ -271,11 +199,16 @@ async def _ble_main(
         get_conversation_chunk_cb=get_conversation_chunk_cb,
         delete_conversation_cb=delete_conversation_cb,
         set_settings_cb=set_settings_cb,
+        search_conversations_cb=search_conversations_cb,
+        list_conversations_page_cb=list_conversations_page_cb,
+        sync_changes_cb=sync_changes_cb,
+        ack_conversation_cb=ack_conversation_cb,
     )
-    
-    # Armazena referência do service para acesso externo
-    if service_ref is not None:
-        service_ref['instance'] = service
+    service.attach_loop(loop)
+
+    # Expõe o service e o loop para controle externo
+    if handle is not None:
+        handle._attach(loop, service, stop)
     
     await service.register(bus)
 
@@ -292,10 +225,13 @@ async def _ble_main(
     await advert.register(bus)
     print("[BLE] Advert registered - advertising service:", SERVICE_UUID)
 
+    live_pump = asyncio.ensure_future(service.run_live_pump())
+
     try:
-        while not stop_event.is_set():
-            await asyncio.sleep(0.5)
+        # Sem polling: o loop dorme até alguém chamar handle.stop()
+        await stop.wait()
     finally:
+        live_pump.cancel()
         try:
             await advert.unregister()
         except Exception:
@@ -320,9 +256,19 @@ def start_ble_server_in_thread(
     get_conversation_chunk_cb=None,
     delete_conversation_cb=None,
     set_settings_cb=None,
+    search_conversations_cb=None,
+    list_conversations_page_cb=None,
+    sync_changes_cb=None,
+    ack_conversation_cb=None,
 ):
-    stop_event = threading.Event()
-    service_ref = {'instance': None}  # Para armazenar referência do service
+    """
+    Inicia o servidor BLE em uma thread daemon.
+
+    Returns:
+        BleServerHandle para parar o servidor, agendar chamadas no loop BLE
+        e enviar legendas ao vivo
+    """
+    handle = BleServerHandle()
 
     def target():
         try:
@@ -336,12 +282,19 @@ def start_ble_server_in_thread(
                 get_conversation_chunk_cb,
                 delete_conversation_cb,
                 set_settings_cb,
-                stop_event,
-                service_ref
+                handle,
+                search_conversations_cb,
+                list_conversations_page_cb,
+                sync_changes_cb,
+                ack_conversation_cb,
             ))
         except Exception as e:
             print("[BLE] exceção no loop async:", e)
+        finally:
+            # Destrava quem estiver esperando wait_ready() caso o BLE falhe
+            handle._ready.set()
 
     th = threading.Thread(target=target, daemon=True)
+    handle.thread = th
     th.start()
-    return stop_event, th, service_ref
+    return handle
@@ -0,0 +1,319 @@
+"""Canal de legendas ao vivo enviado ao app via notify BLE."""
+
+import json
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+# Limite de frames aguardando envio (parciais são coalescidos, finais nunca são descartados)
+LIVE_QUEUE_MAX_FRAMES = 64
+
+# Intervalo mínimo entre notificações (aproxima o connection interval negociado pelo celular)
+LIVE_PUSH_INTERVAL_MS = 30
+
+# MTU assumido até o celular negociar outro (iOS costuma usar 185)
+DEFAULT_ATT_MTU = 185
+ATT_NOTIFY_OVERHEAD = 3
+
+# A cada N parciais envia o texto completo (keyframe) para o app se ressincronizar
+LIVE_KEYFRAME_INTERVAL = 8
+
+FRAME_PARTIAL = "partial"
+FRAME_FINAL = "final"
+
+# Tipos no formato compacto enviado ao app (campo "t")
+WIRE_FINAL = "f"
+WIRE_KEYFRAME = "k"
+WIRE_DELTA = "d"
+
+
+def notify_payload_limit(mtu: Optional[int]) -> int:
+    """Bytes úteis de uma notificação para o MTU informado."""
+    try:
+        value = int(mtu or DEFAULT_ATT_MTU)
+    except (TypeError, ValueError):
+        value = DEFAULT_ATT_MTU
+    return max(20, value - ATT_NOTIFY_OVERHEAD)
+
+
+def _encode_frame(frame: object) -> bytes:
+    return json.dumps(frame, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _split_frame(frame: Dict[str, object], max_bytes: int) -> Optional[List[bytes]]:
+    """
+    Divide um frame que não cabe em uma notificação; cada parte vai sozinha
+    em uma notificação, fora do array do lote. No MTU mínimo (23) sobram 20
+    bytes e nem as chaves do frame cabem, então as partes são posicionais:
+        primeira: [s, 0, x, n, t]
+        demais:   [s, i, x]
+    Só a primeira leva o cabeçalho e o total de partes `n`; o app junta os
+    "x" das partes de mesmo `s` em ordem e aplica o frame ao receber a n-ésima.
+
+    Returns:
+        Partes codificadas, ou None se nem a primeira parte (mesmo vazia) ou
+        uma parte com um caractere couber em max_bytes
+    """
+    text = str(frame.get("x", ""))
+    seq = frame["s"]
+    header = [frame["t"]]
+    costs = [len(_encode_frame(ch)) - 2 for ch in text]
+    if max_bytes - len(_encode_frame([seq, len(text), ""])) < max(costs or [1]):
+        return None
+    # `n` só é conhecido depois de dividir: reserva um dígito e refaz se faltar
+    reserve = 9
+    while True:
+        first_room = max_bytes - len(_encode_frame([seq, 0, "", reserve] + header))
+        if first_room < 0:
+            return None
+        pieces = _split_text(text, costs, first_room, lambda index: max_bytes - len(_encode_frame([seq, index, ""])))
+        if len(pieces) <= reserve:
+            break
+        reserve = reserve * 10 + 9
+    parts = [_encode_frame([seq, 0, pieces[0], len(pieces)] + header)]
+    for index, piece in enumerate(pieces[1:], start=1):
+        parts.append(_encode_frame([seq, index, piece]))
+    return parts
+
+
+def _split_text(text: str, costs: List[int], first_room: int, room_for: Callable[[int], int]) -> List[str]:
+    """Quebra o texto em pedaços cujo custo JSON cabe no espaço de cada parte (a primeira pode ficar vazia)."""
+    pieces: List[str] = []
+    room = first_room
+    start = 0
+    used = 0
+    for pos, cost in enumerate(costs):
+        if used + cost > room:
+            pieces.append(text[start:pos])
+            start = pos
+            used = 0
+            room = room_for(len(pieces))
+        used += cost
+    pieces.append(text[start:])
+    return pieces
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class PartialDeltaEncoder:
+    """
+    Codifica parciais como delta do último parcial enviado.
+
+    Frames (campo "s" é o número de sequência):
+        keyframe: {"s": n, "t": "k", "x": texto}
+        delta:    {"s": n, "t": "d", "b": seq_base, "p": prefixo, "x": sufixo}
+        final:    {"s": n, "t": "f", "x": texto}
+    Delta ou keyframe é escolhido pelo tamanho codificado; um parcial que não
+    cabe em uma notificação é descartado, e só finais vão em partes
+    posicionais (ver _split_frame).
+    No delta o app mantém os primeiros `p` caracteres (code points) do parcial
+    de seq `b` e acrescenta `x`. Keyframes são enviados periodicamente, após
+    um final e quando o app pede RESYNC.
+    """
+
+    def __init__(self, keyframe_interval: int = LIVE_KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self._base_text: Optional[str] = None
+        self._base_seq = 0
+        self._since_key = 0
+        self._force_key = True
+
+    def request_keyframe(self) -> None:
+        self._force_key = True
+
+    def reset(self) -> None:
+        """Chamado após um final: o próximo parcial começa uma frase nova."""
+        self._base_text = None
+        self._force_key = True
+
+    def encode(self, text: str, seq: int, max_bytes: Optional[int] = None) -> Optional[Dict[str, object]]:
+        """
+        Monta o frame sem alterar o estado (ver commit). Entre delta e keyframe
+        fica o menor já codificado; com max_bytes, devolve None se nem o menor
+        cabe em uma notificação (parcial não vale a pena fragmentar).
+        """
+        frame: Dict[str, object] = {"s": seq, "t": WIRE_KEYFRAME, "x": text}
+        size = len(_encode_frame(frame))
+        base = self._base_text
+        if base is not None and not self._force_key and self._since_key < self.keyframe_interval:
+            prefix = _common_prefix_len(base, text)
+            delta = {"s": seq, "t": WIRE_DELTA, "b": self._base_seq, "p": prefix, "x": text[prefix:]}
+            delta_size = len(_encode_frame(delta))
+            if delta_size < size:
+                frame, size = delta, delta_size
+        if max_bytes is not None and size > max_bytes:
+            return None
+        return frame
+
+    def commit(self, text: str, frame: Dict[str, object]) -> None:
+        self._base_text = text
+        self._base_seq = int(frame["s"])
+        if frame["t"] == WIRE_KEYFRAME:
+            self._since_key = 0
+            self._force_key = False
+        else:
+            self._since_key += 1
+
+
+class LiveCaptionQueue:
+    """
+    Fila limitada de legendas ao vivo.
+    Mantém apenas o parcial mais recente, preserva todos os finais em ordem
+    e numera os frames no momento do envio para o app detectar perdas.
+    """
+
+    def __init__(self, max_frames: int = LIVE_QUEUE_MAX_FRAMES, on_ready: Optional[Callable[[], None]] = None):
+        self.max_frames = max(2, int(max_frames))
+        self.on_ready = on_ready
+        self._lock = threading.Lock()
+        self._pending: Deque[Dict[str, str]] = deque()
+        # Partes já numeradas de um frame dividido, enviadas uma por notificação
+        self._fragments: Deque[bytes] = deque()
+        self._seq = 0
+        self._encoder = PartialDeltaEncoder()
+        self._stats = {
+            "pushed": 0,
+            "coalesced": 0,
+            "merged_finals": 0,
+            "frames_sent": 0,
+            "batches_sent": 0,
+            "bytes_sent": 0,
+            "keyframes": 0,
+            "deltas": 0,
+            "split_frames": 0,
+            "fragments_sent": 0,
+            "dropped_partials": 0,
+            "oversized_finals": 0,
+        }
+
+    def push_partial(self, text: str) -> None:
+        with self._lock:
+            self._stats["pushed"] += 1
+            if self._pending and self._pending[-1]["type"] == FRAME_PARTIAL:
+                self._pending.pop()
+                self._stats["coalesced"] += 1
+            self._pending.append({"type": FRAME_PARTIAL, "text": text or ""})
+            self._enforce_bound()
+        self._signal_ready()
+
+    def push_final(self, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            self._stats["pushed"] += 1
+            # O final substitui o parcial pendente da mesma frase
+            if self._pending and self._pending[-1]["type"] == FRAME_PARTIAL:
+                self._pending.pop()
+                self._stats["coalesced"] += 1
+            self._pending.append({"type": FRAME_FINAL, "text": text})
+            self._enforce_bound()
+        self._signal_ready()
+
+    def _enforce_bound(self) -> None:
+        # Fila cheia só de finais: junta os dois mais antigos para não perder texto
+        while len(self._pending) > self.max_frames:
+            first = self._pending.popleft()
+            second = self._pending.popleft()
+            if second["type"] == FRAME_PARTIAL:
+                self._pending.appendleft(second)
+                self._pending.appendleft(first)
+                break
+            merged = {"type": FRAME_FINAL, "text": f"{first['text']} {second['text']}".strip()}
+            self._pending.appendleft(merged)
+            self._stats["merged_finals"] += 1
+
+    def _signal_ready(self) -> None:
+        if callable(self.on_ready):
+            try:
+                self.on_ready()
+            except Exception as exc:
+                print(f"[BLE_STREAM] Erro ao sinalizar envio: {exc}")
+
+    def request_keyframe(self) -> None:
+        """O próximo parcial sai completo (usado quando o app perde a sequência)."""
+        with self._lock:
+            self._encoder.request_keyframe()
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending or self._fragments)
+
+    def pop_batch(self, max_bytes: int) -> Optional[bytes]:
+        """
+        Retira quantos frames couberem em uma notificação. Um final que não
+        cabe sozinho é dividido em partes e cada chamada seguinte envia a
+        próxima parte antes de qualquer outro frame. Parciais nunca são
+        divididos: o que não cabe sozinho (nem como delta) é descartado e o
+        próximo parcial o substitui, o que em MTU baixo deixa só os finais.
+
+        Returns:
+            Array JSON com os frames numerados, uma parte de frame dividido,
+            ou None se não houver nada pendente
+        """
+        with self._lock:
+            if self._fragments:
+                return self._account(self._fragments.popleft(), frames=0, fragment=True)
+            encoded: List[bytes] = []
+            size = 2  # colchetes do array
+            while self._pending:
+                item = self._pending[0]
+                seq = self._seq + 1
+                if item["type"] == FRAME_PARTIAL:
+                    frame = self._encoder.encode(item["text"], seq, max_bytes - 2)
+                    if frame is None:
+                        self._pending.popleft()
+                        self._stats["dropped_partials"] += 1
+                        continue
+                else:
+                    frame = {"s": seq, "t": WIRE_FINAL, "x": item["text"]}
+                data = _encode_frame(frame)
+                extra = len(data) + (1 if encoded else 0)
+                parts: Optional[List[bytes]] = None
+                if size + extra > max_bytes:
+                    if encoded:
+                        break
+                    # Final sozinho não cabe (o BlueZ cortaria a notificação): vai em partes
+                    parts = _split_frame(frame, max_bytes)
+                    if parts is None:
+                        # Final não se descarta: segue inteiro e o app pede RESYNC
+                        print(f"[BLE_STREAM] Final {seq} não cabe em {max_bytes} bytes")
+                        self._stats["oversized_finals"] += 1
+                self._pending.popleft()
+                self._seq = seq
+                if item["type"] == FRAME_PARTIAL:
+                    self._encoder.commit(item["text"], frame)
+                    self._stats["keyframes" if frame["t"] == WIRE_KEYFRAME else "deltas"] += 1
+                else:
+                    self._encoder.reset()
+                if parts is not None:
+                    self._fragments.extend(parts[1:])
+                    self._stats["split_frames"] += 1
+                    return self._account(parts[0], frames=1, fragment=True)
+                encoded.append(data)
+                size += extra
+            if not encoded:
+                return None
+            return self._account(b"[" + b",".join(encoded) + b"]", frames=len(encoded), fragment=False)
+
+    def _account(self, payload: bytes, frames: int, fragment: bool) -> bytes:
+        """Chamado com o lock."""
+        self._stats["frames_sent"] += frames
+        self._stats["batches_sent"] += 1
+        self._stats["bytes_sent"] += len(payload)
+        if fragment:
+            self._stats["fragments_sent"] += 1
+        return payload
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+            stats["pending_fragments"] = len(self._fragments)
+            stats["last_seq"] = self._seq
+            return stats
@@ -1,5 +1,4 @@
 import os
-from kivy.core.text import LabelBase
 
 BASE_DIR = os.path.dirname(__file__)
 
@@ -28,18 +27,10 @@ LINE_HEIGHT = 1.2  # Multiplicador da altura da linha (0.8 = mais compacta, 1.2
 
 icons_dir = os.path.join(BASE_DIR, "assets", "icons")
 
-# Mapeamento de font weights para nomes de arquivo
-FONT_WEIGHT_MAP = {
-    100: "Thin",
-    200: "ExtraLight",
-    300: "Light",
-    400: "Regular",
-    500: "Medium",
-    600: "SemiBold",
-    700: "Bold",
-    800: "ExtraBold",
-    900: "Black"
-}
+# Fontes: índice de fonts/ montado uma vez; registro no Kivy só quando usadas
+from utils.font_registry import FONT_WEIGHT_MAP, get_font_registry
+
+_font_registry = get_font_registry()
 
 # Determina o nome do arquivo de fonte baseado no peso e família
 def get_font_file(family="Inter", weight=400):
@@ -53,35 +44,22 @@ def get_font_file(family="Inter", weight=400):
     Returns:
         Caminho do arquivo de fonte ou None se não encontrado
     """
-    weight_name = FONT_WEIGHT_MAP.get(weight, "Regular")
-    
-    # Tenta encontrar o arquivo específico da família e peso
-    font_path = os.path.join(BASE_DIR, "fonts", f"{family}-{weight_name}.ttf")
-    
-    # Se não encontrar o peso específico, tenta o Regular da mesma família
-    if not os.path.exists(font_path):
-        font_path = os.path.join(BASE_DIR, "fonts", f"{family}-Regular.ttf")
-        if not os.path.exists(font_path):
-            # Fallback: tenta apenas o nome da família
-            font_path = os.path.join(BASE_DIR, "fonts", f"{family}.ttf")
-            if not os.path.exists(font_path):
-                return None
-    
-    return font_path
+    return _font_registry.get_font_file(family, weight)
 
-# Nome da fonte registrada (usa a família escolhida)
-FONT_NAME = FONT_FAMILY
+def font_name_for(family, weight):
+    """
+    Nome registrado no Kivy para (família, peso), registrando na primeira vez.
+    
+    Returns:
+        Nome da fonte ou None se a família não tiver arquivos
+    """
+    return _font_registry.font_name(family, weight)
 
-# Registra fonte customizada com a família e peso especificados
-font_file = get_font_file(FONT_FAMILY, FONT_WEIGHT)
-if font_file:
-    LabelBase.register(name=FONT_NAME, fn_regular=font_file)
-else:
+# Nome da fonte registrada (família e peso escolhidos)
+FONT_NAME = font_name_for(FONT_FAMILY, FONT_WEIGHT)
+if not FONT_NAME:
     print(f"[ENV] Aviso: Arquivo de fonte não encontrado para '{FONT_FAMILY}' com peso {FONT_WEIGHT}")
-
-# Registra pesos adicionais para uso específico em componentes
-# Isso permite que botões usem Bold enquanto texto normal usa Regular, etc.
-_registered_weights = {FONT_WEIGHT}  # Já registramos o peso principal
+    FONT_NAME = "Roboto"  # fonte embutida do Kivy
 
 def register_font_weight(weight):
     """
@@ -93,30 +71,25 @@ def register_font_weight(weight):
     Returns:
         Nome da fonte registrada para esse peso
     """
-    # Se for o mesmo peso já registrado como padrão, retorna o nome padrão
-    if weight == FONT_WEIGHT:
-        _registered_weights.add(weight)
-        return FONT_NAME
-    
-    weight_name_suffix = FONT_WEIGHT_MAP.get(weight, 'Regular')
-    font_name = f"{FONT_FAMILY}-{weight_name_suffix}"
-    
-    # Se já foi registrado, apenas retorna o nome
-    if weight in _registered_weights:
-        return font_name
-    
-    font_file = get_font_file(FONT_FAMILY, weight)
-    if font_file:
-        LabelBase.register(name=font_name, fn_regular=font_file)
-        _registered_weights.add(weight)
-        return font_name
-    else:
-        # Se não encontrar, usa o peso padrão já registrado
-        print(f"[ENV] Aviso: Peso {weight} ({weight_name_suffix}) não encontrado, usando peso padrão {FONT_WEIGHT}")
-        return FONT_NAME
-
-# Registra pesos comumente usados na UI
-FONT_NAME_BOLD = register_font_weight(700)      # Para botões e títulos
-FONT_NAME_SEMIBOLD = register_font_weight(600)  # Para subtítulos
-FONT_NAME_MEDIUM = register_font_weight(500)    # Para texto de ênfase
-FONT_NAME_REGULAR = register_font_weight(400)   # Para texto normal (fallback)
+    name = font_name_for(FONT_FAMILY, weight)
+    if name:
+        return name
+    # Se não encontrar, usa o peso padrão já registrado
+    print(f"[ENV] Aviso: Peso {weight} ({FONT_WEIGHT_MAP.get(weight, 'Regular')}) não encontrado, usando peso padrão {FONT_WEIGHT}")
+    return FONT_NAME
+
+# Pesos usados na UI: registrados só quando algum módulo importa o nome
+_UI_FONT_WEIGHTS = {
+    "FONT_NAME_BOLD": 700,      # Para botões e títulos
+    "FONT_NAME_SEMIBOLD": 600,  # Para subtítulos
+    "FONT_NAME_MEDIUM": 500,    # Para texto de ênfase
+    "FONT_NAME_REGULAR": 400,   # Para texto normal (fallback)
+}
+
+def __getattr__(name):
+    weight = _UI_FONT_WEIGHTS.get(name)
+    if weight is None:
+        raise AttributeError(f"module 'env' has no attribute '{name}'")
+    value = register_font_weight(weight)
+    globals()[name] = value
+    return value
@@ -5,13 +5,14 @@ from __future__ import annotations
 import json
 import os
 import queue
+import re
 import sys
 import threading
 import time
 import wave
 from collections import deque
 from dataclasses import dataclass
-from typing import Callable, Deque, Dict, Optional, Tuple
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 try:
     from vosk import Model, KaldiRecognizer
@@ -31,6 +32,7 @@ import sounddevice as sd
 
 
 Callback = Optional[Callable[[str], None]]
+FinalCallback = Optional[Callable[[str, Optional["FinalTiming"]], None]]
 
 DEFAULT_CONFIG: Dict[str, object] = {
     "model_path": "modelLarge",
@@ -46,8 +48,25 @@ DEFAULT_CONFIG: Dict[str, object] = {
     "max_silence_frames": 6,
     "partial_debounce_ms": 120,
     "word_blacklist": ["aguardando...", "<unk>", "ah"],
+    # Hesitations dropped from finals when Vosk is not confident about them
+    "filler_pattern": r"h+m+|hu+m+|u+h+|u+m+|e+h+|é{2,}|é+h+|a+h+n*|ã+|hã+",
+    "filler_min_conf": 0.8,
+    # Any final word below this confidence is dropped (0 disables)
+    "min_word_conf": 0.0,
 }
 
+@dataclass
+class FinalTiming:
+    """Word timings of a final result, on the capture clock (epoch seconds).
+
+    ``words`` holds one ``(start, end, conf)`` tuple per token of the final
+    text, in order; ``start``/``end`` span the whole utterance.
+    """
+
+    start: float
+    end: float
+    words: List[Tuple[float, float, float]]
+
 
 @dataclass
 class BenchmarkResult:
@@ -78,10 +97,7 @@ class Transcriber:
         self.energy_gate_dbfs = float(cfg.get("energy_gate_dbfs", -45.0))
         self.max_silence_frames = int(cfg.get("max_silence_frames", 6))
         self.partial_debounce = float(cfg.get("partial_debounce_ms", 120)) / 1000.0
-        raw_blacklist = cfg.get("word_blacklist", []) or []
-        normalized = [str(item).strip() for item in raw_blacklist if str(item).strip()]
-        self._blacklist_exact = {item.lower() for item in normalized}
-        self._blacklist_tokens = {token.lower() for item in normalized for token in item.split()}
+        self._compile_filters(cfg)
 
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Model not found at {self.model_path}")
@@ -115,11 +131,12 @@ class Transcriber:
         self._pending_bytes = bytearray()
         self._chunk_times: Deque[Tuple[float, int]] = deque()
         self._speech_buffer = bytearray()
+        self._speech_buffer_ts = 0.0
         self._silence_frames = 0
         self._speech_active = False
 
         self._on_partial: Callback = None
-        self._on_final: Callback = None
+        self._on_final: FinalCallback = None
         self._on_error: Optional[Callable[[Exception], None]] = None
 
         self._last_partial_text = ""
@@ -129,10 +146,19 @@ class Transcriber:
         self._latency_samples: Deque[float] = deque(maxlen=100)
         self._frames_processed = 0
 
+        # Vosk word times count the audio fed since the recognizer was created
+        # (silence dropped by the VAD never reaches it); each feed records
+        # (recognizer offset, capture perf_counter) so words map back to capture time.
+        self._bytes_per_second = float(self.sample_rate * self.bytes_per_sample)
+        self._fed_bytes = 0
+        self._feed_segments: Deque[Tuple[float, float]] = deque(maxlen=4096)
+        self._epoch_offset = time.time() - time.perf_counter()
+
     # ---------------------------------------------------------------------
     # Public API
     # ---------------------------------------------------------------------
-    def set_callbacks(self, on_partial: Callback = None, on_final: Callback = None, on_error: Callback = None) -> None:
+    def set_callbacks(self, on_partial: Callback = None, on_final: FinalCallback = None, on_error: Callback = None) -> None:
+        """``on_final`` receives ``(text, timing)``; ``timing`` is None when Vosk gave no word data."""
         self._on_partial = on_partial
         self._on_final = on_final
         self._on_error = on_error
@@ -141,6 +167,7 @@ class Transcriber:
         if self._running.is_set():
             return
         self._running.set()
+        self._epoch_offset = time.time() - time.perf_counter()
         self._worker = threading.Thread(target=self._worker_loop, daemon=True)
         self._worker.start()
 
@@ -235,34 +262,44 @@ class Transcriber:
         while len(self._pending_bytes) >= self.frame_bytes:
             frame = bytes(self._pending_bytes[: self.frame_bytes])
             del self._pending_bytes[: self.frame_bytes]
-            frame_ts = self._consume_chunk_time(self.frame_bytes)
-            self._handle_frame(frame, frame_ts)
+            capture_ts, frame_ts = self._consume_chunk_time(self.frame_bytes)
+            self._handle_frame(frame, frame_ts, capture_ts)
 
-    def _consume_chunk_time(self, consumed: int) -> float:
+    def _consume_chunk_time(self, consumed: int) -> Tuple[float, float]:
+        """Capture time of the first byte of the next ``consumed`` bytes and the arrival
+        time of its chunk (both perf_counter); latency stats keep measuring from arrival."""
         ts = 0.0
+        arrival = 0.0
         remaining = consumed
         while remaining > 0 and self._chunk_times:
             chunk_ts, chunk_len = self._chunk_times[0]
             if ts == 0:
-                ts = chunk_ts
+                # chunk_ts is taken when the callback fires, right after the chunk's last sample
+                ts = chunk_ts - chunk_len / self._bytes_per_second
+                arrival = chunk_ts
             take = min(remaining, chunk_len)
             remaining -= take
             if take == chunk_len:
                 self._chunk_times.popleft()
             else:
                 self._chunk_times[0] = (chunk_ts, chunk_len - take)
-        return ts or time.perf_counter()
+        if not ts:
+            now = time.perf_counter()
+            return now, now
+        return ts, arrival
 
     # ------------------------------------------------------------------
     # Frame handling and decoding
     # ------------------------------------------------------------------
-    def _handle_frame(self, frame: bytes, frame_ts: float) -> None:
+    def _handle_frame(self, frame: bytes, frame_ts: float, capture_ts: Optional[float] = None) -> None:
         self._frames_processed += 1
         speech = self._is_speech(frame)
 
         if speech:
             self._speech_active = True
             self._silence_frames = 0
+            if not self._speech_buffer:
+                self._speech_buffer_ts = capture_ts or frame_ts
             self._speech_buffer.extend(frame)
             if len(self._speech_buffer) >= self.min_feed_bytes:
                 self._feed_recognizer(frame_ts)
@@ -298,6 +335,9 @@ class Transcriber:
         chunk = bytes(self._speech_buffer)
         self._speech_buffer.clear()
         self._last_audio_ts = frame_ts or time.perf_counter()
+        # Frames in the buffer are contiguous: the whole feed maps linearly from its first frame
+        self._feed_segments.append((self._fed_bytes / self._bytes_per_second, self._speech_buffer_ts or self._last_audio_ts))
+        self._fed_bytes += len(chunk)
 
         try:
             accepted = self.streaming_recognizer.AcceptWaveform(chunk)
@@ -317,6 +357,7 @@ class Transcriber:
         except Exception:
             return
         partial_raw = payload.get("partial", "") or ""
+        # Partials carry no confidences: fillers are decided on the final
         partial = self._sanitize_text(partial_raw)
         now = time.perf_counter()
         if (
@@ -335,12 +376,49 @@ class Transcriber:
             payload = json.loads(result_json)
         except Exception:
             return
-        final_raw = payload.get("text", "") or ""
-        final = self._sanitize_text(final_raw)
+        final, timing = self._filter_final(payload.get("text", "") or "", payload.get("result"))
         if final:
             latency = max(0.0, time.perf_counter() - self._last_audio_ts)
             self._latency_samples.append(latency)
-            self._on_final(final)
+            self._on_final(final, timing)
+
+    def _capture_time(self, stream_seconds: float) -> float:
+        """Maps a recognizer time (seconds of fed audio) to capture time (epoch seconds)."""
+        segments = self._feed_segments
+        if not segments:
+            return stream_seconds + self._epoch_offset
+        # Results refer to recent audio: search backwards from the newest feed
+        for offset, capture_ts in reversed(segments):
+            if offset <= stream_seconds:
+                return capture_ts + (stream_seconds - offset) + self._epoch_offset
+        offset, capture_ts = segments[0]
+        return capture_ts + (stream_seconds - offset) + self._epoch_offset
+
+    @staticmethod
+    def _parse_words(words) -> Optional[List[Tuple[str, float, float, float]]]:
+        """``(word, start, end, conf)`` from Vosk's ``result`` list, or None without usable word data."""
+        if not words:
+            return None
+        parsed = []
+        try:
+            for item in words:
+                parsed.append((str(item["word"]), float(item["start"]), float(item["end"]), float(item.get("conf", 1.0))))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+        return parsed
+
+    def _filter_final(self, text: str, words) -> Tuple[str, Optional[FinalTiming]]:
+        """Filters a final result word by word (with confidences) and keeps the survivors' timings."""
+        parsed = self._parse_words(words)
+        if parsed is None:
+            return self._sanitize_text(text), None
+        keep = self._keep_mask([item[0].lower() for item in parsed], [item[3] for item in parsed])
+        kept = [item for item, keep_it in zip(parsed, keep) if keep_it]
+        if not kept:
+            return "", None
+        timings = [(self._capture_time(start), self._capture_time(end), conf) for _, start, end, conf in kept]
+        final = " ".join(item[0] for item in kept)
+        return final, FinalTiming(start=timings[0][0], end=timings[-1][1], words=timings)
 
     def _flush_recognizer(self, force: bool = False) -> None:
         if self._speech_buffer:
@@ -355,23 +433,82 @@ class Transcriber:
     def _recover_recognizer(self, exc: Exception) -> None:
         try:
             self.streaming_recognizer = KaldiRecognizer(self.model, self.sample_rate)
+            self.streaming_recognizer.SetWords(True)
         except Exception:
             pass
+        # The new recognizer counts time from zero again
+        self._fed_bytes = 0
+        self._feed_segments.clear()
         if self._on_error:
             self._on_error(exc)
 
+    # ------------------------------------------------------------------
+    # Word filtering
+    # ------------------------------------------------------------------
+    def _compile_filters(self, cfg: Dict[str, object]) -> None:
+        """Precompiles the blacklist (as word sets and as one regex) and the filler pattern."""
+        tokens = set()
+        phrases: Dict[str, List[Tuple[str, ...]]] = {}
+        for item in cfg.get("word_blacklist", []) or []:
+            words = tuple(str(item).lower().split())
+            if len(words) == 1:
+                tokens.add(words[0])
+            elif words:
+                phrases.setdefault(words[0], []).append(words)
+        for candidates in phrases.values():
+            candidates.sort(key=len, reverse=True)  # longest phrase wins
+        # Word results (finals) are filtered with the sets...
+        self._blacklist_tokens = frozenset(tokens)
+        self._blacklist_phrases = phrases
+        # ...plain text (partials) with a single regex: a blacklisted word or
+        # phrase and the whitespace after it, with no list of tokens built
+        alternatives = [re.escape(token) for token in tokens]
+        alternatives += [r"\s+".join(map(re.escape, p)) for group in phrases.values() for p in group]
+        alternatives.sort(key=len, reverse=True)
+        self._blacklist_re = (
+            re.compile(r"(?<!\S)(?:%s)(?:\s+|$)" % "|".join(alternatives), re.IGNORECASE)
+            if alternatives
+            else None
+        )
+        pattern = str(cfg.get("filler_pattern") or "")
+        self._filler_re = re.compile(f"(?:{pattern})") if pattern else None
+        self.filler_min_conf = float(cfg.get("filler_min_conf", 0.0) or 0.0)
+        self.min_word_conf = float(cfg.get("min_word_conf", 0.0) or 0.0)
+
+    def _keep_mask(self, lowered: List[str], confs: List[float]) -> List[bool]:
+        """Which words of a final survive: blacklisted words and phrases go, and so do
+        words below ``min_word_conf`` and fillers below ``filler_min_conf``."""
+        count = len(lowered)
+        keep = [True] * count
+        index = 0
+        while index < count:
+            token = lowered[index]
+            if token in self._blacklist_tokens:
+                keep[index] = False
+                index += 1
+                continue
+            matched = 0
+            for phrase in self._blacklist_phrases.get(token, ()):
+                if tuple(lowered[index:index + len(phrase)]) == phrase:
+                    matched = len(phrase)
+                    break
+            if matched:
+                keep[index:index + matched] = [False] * matched
+                index += matched
+                continue
+            conf = confs[index]
+            if conf < self.min_word_conf or (
+                conf < self.filler_min_conf and self._filler_re is not None and self._filler_re.fullmatch(token)
+            ):
+                keep[index] = False
+            index += 1
+        return keep
+
     def _sanitize_text(self, text: str) -> str:
-        cleaned = (text or "").strip()
-        if not cleaned:
-            return ""
-        lowered = cleaned.lower()
-        if lowered in self._blacklist_exact:
-            return ""
-        tokens = [token for token in cleaned.split() if token.lower() not in self._blacklist_tokens]
-        sanitized = " ".join(tokens).strip()
-        if sanitized.lower() in self._blacklist_exact:
-            return ""
-        return sanitized
+        """Blacklist filtering for text without word data."""
+        if self._blacklist_re is None:
+            return (text or "").strip()
+        return self._blacklist_re.sub("", text or "").strip()
 
     def _signal_worker_shutdown(self) -> None:
         try:
@@ -1,8 +1,28 @@
 """
 Pacote de interface do usuário.
+
+Os módulos são importados sob demanda: importar `ui.waiting_screen` ou
+`ui.caption_style` não carrega a tela de transcrição nem o transcriber.
 """
 
-from ui.main_layout import MainLayout
-from ui.ui_state_manager import UIState
-from ui.ui_config import truncate_partial, ICON_PATHS, UI_TEXTS
-from ui.app import TranscriberApp
\ No newline at end of file
+import importlib
+
+_LAZY_EXPORTS = {
+    'MainLayout': 'ui.main_layout',
+    'UIState': 'ui.ui_state_manager',
+    'truncate_partial': 'ui.ui_config',
+    'ICON_PATHS': 'ui.ui_config',
+    'UI_TEXTS': 'ui.ui_config',
+    'TranscriberApp': 'ui.app',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'ui' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
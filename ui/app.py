@@ -7,17 +7,29 @@ import os
 import sys
 from kivy.app import App
 from kivy.clock import Clock
-from transcriber import Transcriber
-from ui.main_layout import MainLayout
+from kivy.uix.screenmanager import NoTransition, Screen, ScreenManager
+from ui.waiting_screen import WaitingScreen
+from ui.update_mailbox import UiUpdateMailbox
+from ui.caption_style import warm_caption_fonts
 from ui.ui_config import truncate_partial, init_window_settings, UI_TEXTS, ICON_PATHS
+from utils import boot_timing
+
+WAITING_SCREEN = 'waiting'
+TRANSCRIBER_SCREEN = 'transcriber'
 
 class TranscriberApp(App):
-    def __init__(self, transcriber: Transcriber, auto_start=True, ble_service_ref=None, **kwargs):
+    """
+    Aplicativo único do Sonoris.
+    Começa na tela de espera; o MainLayout é montado antes da conexão
+    (prepare_main_layout) e exibido sem recriar janela quando o app conecta.
+    """
+
+    def __init__(self, transcriber: "Transcriber" = None, auto_start=True, ble_service_ref=None, **kwargs):
         """
         Inicializa o aplicativo.
         
         Args:
-            transcriber: Instância do transcriber para processar áudio
+            transcriber: Instância do transcriber (se informada, vai direto para a transcrição)
             auto_start: Se True, inicia o transcriber automaticamente
             ble_service_ref: Referência ao BLE service para envio de transcrições
             **kwargs: Argumentos adicionais para o App
@@ -27,35 +39,112 @@ class TranscriberApp(App):
         self.layout = None 
         self._auto_start = auto_start
         self.ble_service_ref = ble_service_ref
+        self.ui_mailbox = None
+        self.screen_manager = None
+        self.waiting_screen = None
+        self._show_when_ready = transcriber is not None
+        self._transcription_started = False
 
     def build(self):
         """
         Constrói a interface do aplicativo.
         
         Returns:
-            Layout principal da aplicação
+            ScreenManager com a tela de espera (a de transcrição entra depois)
         """
+        boot_timing.mark("app_build")
         # Inicializa as configurações da janela
         init_window_settings()
         
         self.title = UI_TEXTS['app_title']
         self.icon = ICON_PATHS['app_icon']
+        
+        self.screen_manager = ScreenManager(transition=NoTransition())
+        waiting = Screen(name=WAITING_SCREEN)
+        self.waiting_screen = WaitingScreen()
+        waiting.add_widget(self.waiting_screen)
+        self.screen_manager.add_widget(waiting)
+        
+        if self.transcriber is not None:
+            self.prepare_main_layout(self.transcriber, self.ble_service_ref)
+        return self.screen_manager
+
+    def on_start(self):
+        """Registra o primeiro frame desenhado."""
+        Clock.schedule_once(lambda dt: boot_timing.mark("first_frame"), 0)
+
+    def update_message(self, message):
+        """Atualiza mensagem na tela de espera."""
+        if self.waiting_screen:
+            self.waiting_screen.update_message(message)
+
+    def prepare_main_layout(self, transcriber, ble_service_ref=None):
+        """
+        Monta o MainLayout fora da tela enquanto a espera é exibida.
+        Deve rodar na thread principal (chamar via Clock).
+        """
+        if self.layout is not None:
+            return self.layout
+        boot_timing.mark("layout_prebuild_start")
+        # Importado só aqui: a tela de espera aparece sem carregar a tela de transcrição
+        from ui.main_layout import MainLayout
+        self.transcriber = transcriber
+        self.ble_service_ref = ble_service_ref
         self.layout = MainLayout(self.transcriber, ble_service_ref=self.ble_service_ref)
+        screen = Screen(name=TRANSCRIBER_SCREEN)
+        screen.add_widget(self.layout)
+        self.screen_manager.add_widget(screen)
+        boot_timing.mark("layout_prebuilt")
+        
+        # Aquece os glifos das fontes das legendas em frames ociosos
+        warm_caption_fonts()
+        
+        if self._show_when_ready:
+            self.show_transcriber()
         return self.layout
 
-    def on_start(self):
-        """Inicializa o aplicativo e configura callbacks do transcriber."""
+    def on_ble_connected(self):
+        """Chamado na thread principal quando o app envia START."""
+        boot_timing.mark("ble_connected")
+        self.update_message("Conectado!\n\nIniciando transcrição...")
+        self.show_transcriber()
+
+    def show_transcriber(self):
+        """Troca para a tela de transcrição (ou agenda a troca se o layout ainda não existe)."""
+        if self.layout is None:
+            self._show_when_ready = True
+            return
+        self._show_when_ready = False
+        self.screen_manager.current = TRANSCRIBER_SCREEN
+        boot_timing.mark("transcriber_shown")
+        self._start_transcription()
+
+    def _apply_transcript_updates(self, finals, partial):
+        self.layout.apply_transcript_updates(finals, partial)
+        if not boot_timing.has_mark("first_caption") and (finals or (partial or "").strip()):
+            boot_timing.mark("first_caption")
+            from widgets.transcript_history import TRANSCRIPT_WRITER
+            print(f"[TRANSCRIBER_APP] Escritor de transcrições: {TRANSCRIPT_WRITER.get_stats()}")
+            boot_timing.print_report()
+
+    def _start_transcription(self):
+        """Configura callbacks do transcriber e inicia a captura."""
+        if self._transcription_started:
+            return
+        self._transcription_started = True
+        
         # Limite de caracteres por linha (força quebra para novo partial)
         MAX_LINE_CHARS = 40
         
+        # Parciais e finais chegam da thread do transcriber e são aplicados uma vez por frame
+        self.ui_mailbox = UiUpdateMailbox(self._apply_transcript_updates)
+        
         # Atualiza o texto parcial
         def on_partial(p):
-            # Se o texto ultrapassar o limite, envia para o histórico e limpa o parcial
+            # Se o texto ultrapassar o limite, envia para o histórico (o parcial volta para a espera)
             if len(p) > MAX_LINE_CHARS:
                 # Envia linha completa para o histórico (sem truncar)
-                Clock.schedule_once(lambda dt, line=p: self.layout.add_final(line))
-                # Limpa o parcial
-                Clock.schedule_once(lambda dt: self.layout.set_partial(''), 0.01)
+                self.ui_mailbox.post_final(p)
                 # Força o recognizer a resetar para começar novo texto
                 if hasattr(self.transcriber, 'streaming_recognizer'):
                     try:
@@ -64,11 +153,11 @@ class TranscriberApp(App):
                         pass
             else:
                 # Texto cabe no limite, mostra normalmente
-                Clock.schedule_once(lambda dt, p=p: self.layout.set_partial(p))
+                self.ui_mailbox.post_partial(p)
 
         # Adiciona linha finalizada no histórico
-        def on_final(f):
-            Clock.schedule_once(lambda dt, f=f: self.layout.add_final(f))
+        def on_final(f, timing=None):
+            self.ui_mailbox.post_final(f, timing)
 
         # Mostra erro no terminal
         def on_error(e):
@@ -89,17 +178,38 @@ class TranscriberApp(App):
         """Finaliza o aplicativo graciosamente."""
         # Para o transcriber graciosamente
         try:
-            self.transcriber.stop()
+            if self.transcriber is not None:
+                self.transcriber.stop()
         except Exception:
             pass
             
-        # Atualiza o tempo ativo no DeviceInfo
+        # Grava as linhas ainda pendentes antes de encerrar o processo
+        try:
+            if self.layout is not None and hasattr(self.layout, 'history'):
+                self.layout.history.flush_pending(timeout=2.0)
+        except Exception as e:
+            print(f"Erro ao gravar transcrições pendentes: {e}")
+        
+        # Grava o estado do DeviceInfo (tempo ativo, contador, nome) antes de sair
         try:
             if hasattr(self.layout, 'history') and hasattr(self.layout.history, 'device_info'):
-                self.layout.history.device_info.update_active_time()
+                device_info = self.layout.history.device_info
+                device_info.flush()
+                print(f"[TRANSCRIBER_APP] DeviceInfo: {device_info.get_stats()}")
         except Exception as e:
             print(f"Erro ao atualizar tempo ativo: {e}")
         
+        try:
+            from widgets.cached_label import get_texture_cache
+            print(f"[TRANSCRIBER_APP] Cache de texturas: {get_texture_cache().get_stats()}")
+            if self.ui_mailbox is not None:
+                print(f"[TRANSCRIBER_APP] Atualizações da UI: {self.ui_mailbox.get_stats()}")
+            from widgets.transcript_history import TRANSCRIPT_WRITER
+            print(f"[TRANSCRIBER_APP] Escritor de transcrições: {TRANSCRIPT_WRITER.get_stats()}")
+            boot_timing.print_report()
+        except Exception:
+            pass
+
         # Encerra o processo completamente ao fechar a janela
         print("[TRANSCRIBER_APP] Janela fechada, encerrando processo...")
         os._exit(0)
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+Estilo das legendas compartilhado pela UI e aplicação em lote dos SETTINGS.
+
+O app envia SETTINGS em rajada enquanto o usuário arrasta um slider. Os
+comandos chegam pela thread do BLE e só são acumulados aqui (o último valor
+de cada chave vence); uma vez por janela o lote é aplicado na thread
+principal: compara com o estilo atual, atualiza env, registra fontes se
+preciso e avisa os widgets com um único evento `on_style_changed`.
+"""
+
+import os
+import threading
+
+from kivy.clock import Clock
+from kivy.event import EventDispatcher
+
+import env
+from utils.font_registry import get_font_registry
+
+# Janela de coalescência dos SETTINGS (o último valor dentro dela vence)
+SETTINGS_BATCH_WINDOW_SEC = 0.15
+
+# Aquece também as outras famílias (troca de fonte instantânea); opcional, ative com SONORIS_FONT_WARMUP=1
+FONT_WARMUP_ALL_FAMILIES = os.environ.get("SONORIS_FONT_WARMUP", "0") == "1"
+
+# Proporção do histórico em relação ao tamanho base da fonte
+HISTORY_FONT_RATIO = 0.65
+
+
+def hex_to_rgba(hex_color):
+    """Converte cor hex (#RRGGBB) para tupla RGBA normalizada (0-1)."""
+    hex_color = str(hex_color).lstrip('#')
+    if len(hex_color) == 6:
+        try:
+            r, g, b = tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+            return (r / 255.0, g / 255.0, b / 255.0, 1.0)
+        except ValueError:
+            pass
+    return (0.168, 0.168, 0.168, 1.0)  # fallback
+
+
+class CaptionStyle(EventDispatcher):
+    """
+    Estilo atual das legendas (parcial, histórico e fundo).
+    Os widgets leem daqui e escutam `on_style_changed(changed_keys)`, que é
+    disparado uma vez por lote aplicado.
+    """
+
+    __events__ = ('on_style_changed',)
+
+    KEYS = ('text_color', 'background_color', 'font_name', 'font_size_partial', 'font_size_history', 'line_height')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.text_color = tuple(env.TEXT_COLOR)
+        self.background_color = tuple(env.BACKGROUND_COLOR)
+        self.font_name = env.FONT_NAME
+        self.font_size_partial = env.FONT_SIZE_PARTIAL
+        self.font_size_history = env.FONT_SIZE_HISTORY
+        self.line_height = env.LINE_HEIGHT
+
+    def partial_style(self):
+        return {
+            'font_size': self.font_size_partial,
+            'font_name': self.font_name,
+            'color': self.text_color,
+            'line_height': self.line_height,
+        }
+
+    def history_style(self):
+        return {
+            'font_size': self.font_size_history,
+            'font_name': self.font_name,
+            'color': self.text_color,
+            'line_height': self.line_height,
+        }
+
+    def sync_from_env(self):
+        """Copia os valores de env e dispara o evento só se algo mudou."""
+        changed = set()
+        for key, value in (
+            ('text_color', tuple(env.TEXT_COLOR)),
+            ('background_color', tuple(env.BACKGROUND_COLOR)),
+            ('font_name', env.FONT_NAME),
+            ('font_size_partial', env.FONT_SIZE_PARTIAL),
+            ('font_size_history', env.FONT_SIZE_HISTORY),
+            ('line_height', env.LINE_HEIGHT),
+        ):
+            if getattr(self, key) != value:
+                setattr(self, key, value)
+                changed.add(key)
+        if changed:
+            self.dispatch('on_style_changed', frozenset(changed))
+        return changed
+
+    def on_style_changed(self, changed_keys):
+        pass
+
+
+CAPTION_STYLE = CaptionStyle()
+
+
+def get_caption_style():
+    return CAPTION_STYLE
+
+
+def _apply_settings_to_env(settings):
+    """
+    Aplica em env apenas os valores que mudaram.
+
+    Args:
+        settings: Dicionário já normalizado (chaves em minúsculas)
+    """
+    if 'textcolor' in settings:
+        color = hex_to_rgba(settings['textcolor'])
+        if tuple(env.TEXT_COLOR) != color:
+            env.TEXT_COLOR = color
+
+    if 'bgcolor' in settings:
+        color = hex_to_rgba(settings['bgcolor'])
+        if tuple(env.BACKGROUND_COLOR) != color:
+            env.BACKGROUND_COLOR = color
+
+    if 'fontsize' in settings:
+        font_size = float(settings['fontsize'])
+        if env.FONT_SIZE != font_size:
+            env.FONT_SIZE = font_size
+            env.FONT_SIZE_PARTIAL = font_size
+            env.FONT_SIZE_HISTORY = int(font_size * HISTORY_FONT_RATIO)
+
+    font_changed = False
+    if 'fontweight' in settings:
+        weight = int(settings['fontweight'])
+        if env.FONT_WEIGHT != weight:
+            env.FONT_WEIGHT = weight
+            font_changed = True
+
+    if 'lineheight' in settings:
+        line_height = float(settings['lineheight'])
+        if env.LINE_HEIGHT != line_height:
+            env.LINE_HEIGHT = line_height
+
+    if 'fontfamily' in settings:
+        family = settings['fontfamily']
+        if env.FONT_FAMILY != family:
+            if env.get_font_file(family, env.FONT_WEIGHT):
+                env.FONT_FAMILY = family
+                font_changed = True
+            else:
+                print(f"[SETTINGS] ⚠️ Fonte {family} não encontrada, mantendo atual")
+
+    if font_changed:
+        # Nome único por (família, peso): registra só na primeira vez que é usado
+        env.FONT_NAME = env.font_name_for(env.FONT_FAMILY, env.FONT_WEIGHT) or env.FONT_NAME
+
+
+def warm_caption_fonts(all_families=FONT_WARMUP_ALL_FAMILIES):
+    """
+    Aquece, em frames ociosos, os glifos da fonte atual nos tamanhos das
+    legendas. Com all_families aquece também as outras famílias no mesmo
+    peso, para que a troca de família pelo app não trave a primeira
+    renderização; elas continuam sem registro no Kivy até serem usadas.
+    """
+    registry = get_font_registry()
+    sizes = (env.FONT_SIZE_PARTIAL, env.FONT_SIZE_HISTORY)
+    registry.warm_glyphs(env.FONT_NAME, sizes)
+    if all_families:
+        for family in registry.families():
+            if family != env.FONT_FAMILY:
+                # Pelo caminho do arquivo: o Kivy guarda o cache pela fonte resolvida
+                registry.warm_glyphs(registry.get_font_file(family, env.FONT_WEIGHT), sizes)
+
+
+class SettingsBatcher:
+    """
+    Acumula SETTINGS vindos de qualquer thread e aplica no máximo um lote por
+    janela na thread principal.
+    """
+
+    def __init__(self, style=None, window_sec=SETTINGS_BATCH_WINDOW_SEC):
+        self.style = style or CAPTION_STYLE
+        self.window_sec = window_sec
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._scheduled = False
+        self._stats = {
+            'received': 0,
+            'coalesced_keys': 0,
+            'batches': 0,
+            'empty_batches': 0,
+        }
+
+    def submit(self, settings_dict):
+        """Chamado pelo callback do BLE; não toca em env nem na UI."""
+        normalized = {str(k).lower(): v for k, v in (settings_dict or {}).items()}
+        if not normalized:
+            return
+        with self._lock:
+            self._stats['received'] += 1
+            self._stats['coalesced_keys'] += sum(1 for k in normalized if k in self._pending)
+            self._pending.update(normalized)
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            Clock.schedule_once(self._apply_pending, self.window_sec)
+
+    def _apply_pending(self, _dt):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._scheduled = False
+        try:
+            _apply_settings_to_env(pending)
+            changed = self.style.sync_from_env()
+        except Exception as e:
+            print(f"[SETTINGS] Erro ao aplicar settings: {e}")
+            return
+        with self._lock:
+            self._stats['batches'] += 1
+            if not changed:
+                self._stats['empty_batches'] += 1
+        if changed:
+            print(f"[SETTINGS] Lote aplicado: {sorted(changed)}")
+            if changed & {'font_name', 'font_size_partial', 'font_size_history'}:
+                warm_caption_fonts()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_keys'] = len(self._pending)
+            return stats
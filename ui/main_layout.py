@@ -10,6 +10,7 @@ from kivy.graphics import Color, Rectangle
 from ui.ui_config import truncate_partial, UI_TEXTS
 from ui.toolbar_components import ToolbarManager
 from ui.transcript_components import TranscriptionManager
+from ui.caption_style import get_caption_style
 from ui.dialogs import PrivateDialog
 from ui.ui_state_manager import UIState
 import env
@@ -38,6 +39,7 @@ class MainLayout(BoxLayout):
         
         # Vincula a atualização do retângulo quando o layout mudar de tamanho/posição
         self.bind(pos=self._update_bg_rect, size=self._update_bg_rect)
+        get_caption_style().bind(on_style_changed=self._on_caption_style_changed)
         
         # Armazena referência ao transcriber
         self.transcriber = transcriber
@@ -83,6 +85,11 @@ class MainLayout(BoxLayout):
         self.bg_rect.pos = self.pos
         self.bg_rect.size = self.size
     
+    def _on_caption_style_changed(self, style, changed_keys):
+        """Atualiza a cor de fundo quando o app muda o tema."""
+        if 'background_color' in changed_keys:
+            self.bg_color.rgba = style.background_color
+    
     def set_partial(self, text):
         """
         Atualiza o texto parcial.
@@ -101,6 +108,16 @@ class MainLayout(BoxLayout):
         """
         self.transcription_manager.add_final(text)
     
+    def apply_transcript_updates(self, finals, partial):
+        """
+        Aplica finais e o parcial mais recente acumulados no frame.
+        
+        Args:
+            finals: Pares (texto, timing) das linhas finalizadas, em ordem
+            partial: Parcial mais recente (ou None)
+        """
+        self.transcription_manager.apply_updates(finals, partial)
+    
     def _on_clear_history(self, instance):
         """
         Limpa o histórico de transcrições e reseta o parcial.
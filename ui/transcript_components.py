@@ -4,13 +4,13 @@ Este módulo contém classes e funções para gerenciar a exibição de transcri
 """
 
 from kivy.uix.scrollview import ScrollView
-from kivy.uix.label import Label
 from kivy.clock import Clock
 from kivy.core.window import Window
 
+from widgets.partial_text import PartialTextView
 from widgets.transcript_history import TranscriptHistory, MAX_PARTIAL_CHARS, PARTIAL_RESET_MS
 from ui.ui_config import truncate_partial, UI_TEXTS
-from env import TEXT_COLOR, FONT_SIZE_PARTIAL, FONT_SIZE_HISTORY, LINE_HEIGHT, FONT_NAME
+from ui.caption_style import get_caption_style
 
 # Configuração da altura do histórico como porcentagem da tela
 HISTORY_HEIGHT_PERCENT = 0.25  # 25% da altura da tela (máximo de metade seria 0.5)
@@ -32,6 +32,9 @@ class TranscriptionManager:
         # Registra como observador do ui_state
         if self.ui_state:
             self.ui_state.register_observer(self)
+        
+        # Mudanças de estilo (SETTINGS do app) chegam em lote, um evento por lote
+        get_caption_style().bind(on_style_changed=self._on_caption_style_changed)
     
     def _setup_ui_components(self):
         """Configura os componentes de UI para transcrição."""
@@ -40,14 +43,14 @@ class TranscriptionManager:
         # Isso garante que o histórico não fique maior que o partial em tamanhos de fonte grandes
         history_height = int(Window.height * HISTORY_HEIGHT_PERCENT)
         
-        self.scroll = ScrollView(
+        # O próprio histórico é um RecycleView (só as linhas visíveis têm widget)
+        self.history = TranscriptHistory(
+            ble_service_ref=self.ble_service_ref,
+            line_style=get_caption_style().history_style(),
             size_hint=(1, None),
             height=history_height,
-            do_scroll_x=False,
-            do_scroll_y=True
         )
-        self.history = TranscriptHistory(ble_service_ref=self.ble_service_ref)
-        self.scroll.add_widget(self.history)
+        self.scroll = self.history
         
         # Atualiza a altura do histórico quando a janela for redimensionada
         def update_history_height(instance, value):
@@ -63,22 +66,16 @@ class TranscriptionManager:
             do_scroll_y=True
         )
         
-        # Texto parcial dentro do ScrollView
-        self.partial_label = Label(
+        # Texto parcial dentro do ScrollView (uma textura por linha; só a última muda)
+        # Estilo vem do CaptionStyle (pode ter mudado via SETTINGS antes desta tela abrir)
+        self.partial_label = PartialTextView(
             text=UI_TEXTS['waiting_text'],
-            size_hint_y=None,
             halign='center',
-            valign='top',
-            text_size=(None, None),
-            font_size=FONT_SIZE_PARTIAL,
-            color=TEXT_COLOR,
-            font_name=FONT_NAME,
-            line_height=LINE_HEIGHT
-        )
-        self.partial_label.bind(
-            width=self._update_partial_text_size,
-            texture_size=self._update_partial_height
+            text_padding_x=20,
+            **get_caption_style().partial_style()
         )
+        # A altura só muda quando o número de linhas muda: verifica overflow no mesmo frame
+        self.partial_label.bind(height=self._scroll_partial_if_needed)
         
         self.partial_scroll.add_widget(self.partial_label)
     
@@ -99,18 +96,8 @@ class TranscriptionManager:
             text: Texto a ser exibido como transcrição parcial
         """
         self.partial_label.text = text
-        
-        # Scrola para o final do texto APENAS se houver overflow (texto maior que a tela)
-        def scroll_if_needed(dt):
-            try:
-                # Verifica se o conteúdo é maior que o viewport
-                if self.partial_label.height > self.partial_scroll.height:
-                    # Só scrola se realmente houver overflow
-                    self.partial_scroll.scroll_y = 0
-            except Exception:
-                pass
-        
-        Clock.schedule_once(scroll_if_needed, 0.05)
+        self._push_live_partial(text)
+        self._prerender_final(text)
         
         # Reseta o timer se já houver um agendado
         if self._partial_reset_ev:
@@ -140,6 +127,32 @@ class TranscriptionManager:
         Args:
             text: Texto finalizado a ser adicionado ao histórico
         """
+        if self._append_final(text):
+            self.history.scroll_to_end()
+        
+        # Limpa o parcial após adicionar final
+        Clock.schedule_once(lambda dt: self.set_partial(UI_TEXTS['waiting_text']), 0.01)
+    
+    def apply_updates(self, finals, partial):
+        """
+        Aplica de uma vez as atualizações acumuladas em um frame (ver UiUpdateMailbox).
+        
+        Args:
+            finals: Pares (texto, timing) das linhas finalizadas, em ordem
+            partial: Parcial mais recente, ou None se nenhum chegou após o último final
+        """
+        added = False
+        for text, timing in finals:
+            added = self._append_final(text, timing) or added
+        if added:
+            self.history.scroll_to_end()
+        if partial is not None:
+            self.set_partial(partial)
+        elif finals:
+            self.set_partial(UI_TEXTS['waiting_text'])
+    
+    def _append_final(self, text, timing=None):
+        """Normaliza o final e adiciona ao histórico. Retorna True se adicionou."""
         sanitized = text.strip() if text else ""
         waiting = UI_TEXTS.get('waiting_text', '').strip().lower()
         if sanitized:
@@ -151,12 +164,49 @@ class TranscriptionManager:
                 except Exception:
                     pass
 
-        if sanitized:
-            self.history.add_line(sanitized)
-            Clock.schedule_once(lambda dt: self.scroll.scroll_to(self.history.lines[-1]))
-        
-        # Limpa o parcial após adicionar final
-        Clock.schedule_once(lambda dt: self.set_partial(UI_TEXTS['waiting_text']), 0.01)
+        if not sanitized:
+            return False
+        self.history.add_line(sanitized, timing)
+        self._push_live_final(sanitized)
+        return True
+    
+    def _prerender_final(self, text):
+        """O parcial costuma virar a próxima linha do histórico: deixa a textura pronta."""
+        txt = (text or "").strip()
+        if not txt or txt.lower() == UI_TEXTS['waiting_text'].lower():
+            return
+        self.history.prerender_line(txt[0].upper() + txt[1:])
+
+    def _live_service(self):
+        """Retorna o BLE service ativo (ou None se BLE não estiver conectado)."""
+        ref = self.ble_service_ref
+        if isinstance(ref, dict):
+            return ref.get('instance')
+        return ref
+    
+    def _live_stream_blocked(self):
+        """No modo privado nenhum texto transcrito sai do dispositivo."""
+        history = getattr(self, 'history', None)
+        return history is not None and history.is_private_mode
+
+    def _push_live_partial(self, text):
+        """Envia o parcial ao app pelo stream BLE (ignora textos de espera e o modo privado)."""
+        if self._live_stream_blocked():
+            return
+        txt = (text or "").strip()
+        if not txt or txt.lower() == UI_TEXTS['waiting_text'].lower():
+            return
+        service = self._live_service()
+        if service is not None and hasattr(service, 'push_partial'):
+            service.push_partial(txt)
+    
+    def _push_live_final(self, text):
+        """Envia a linha final ao app pelo stream BLE (exceto no modo privado)."""
+        if self._live_stream_blocked():
+            return
+        service = self._live_service()
+        if service is not None and hasattr(service, 'push_final'):
+            service.push_final(text)
     
     def clear_history(self):
         """Limpa o histórico de transcrições e reseta o parcial."""
@@ -170,25 +220,20 @@ class TranscriptionManager:
             if hasattr(self, 'history'):
                 self.history.set_private_mode(new_value)
     
-    def _update_partial_text_size(self, inst, val):
-        """
-        Atualiza text_size do label parcial para quebra automática.
-        
-        Args:
-            inst: Instância do widget
-            val: Novo valor
-        """
-        inst.text_size = (inst.width - 40, None)
+    def _on_caption_style_changed(self, style, changed_keys):
+        """Aplica o estilo novo no parcial e no histórico (cada widget re-renderiza uma vez)."""
+        for key, value in style.partial_style().items():
+            if getattr(self.partial_label, key) != value:
+                setattr(self.partial_label, key, value)
+        self.history.refresh_line_style(style.history_style())
     
-    def _update_partial_height(self, inst, val):
-        """
-        Atualiza a altura do label parcial baseado no tamanho da textura.
-        
-        Args:
-            inst: Instância do widget
-            val: Novo valor (texture_size)
-        """
-        inst.height = val[1]
+    def _scroll_partial_if_needed(self, inst, height):
+        """Scrola para o final do parcial APENAS se houver overflow (texto maior que a tela)."""
+        try:
+            if height > self.partial_scroll.height:
+                self.partial_scroll.scroll_y = 0
+        except Exception:
+            pass
     
     def save_ui_state(self):
         """
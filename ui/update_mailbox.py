@@ -0,0 +1,106 @@
+"""
+Caixa de atualizações da UI vindas do transcriber.
+
+O transcriber roda em outra thread e gera rajadas de parciais/finais. Em vez
+de um Clock.schedule_once por evento, as atualizações ficam numa caixa
+protegida por lock e são aplicadas uma vez por frame: só o parcial mais
+recente é exibido, os finais entram em ordem e o histórico faz um único
+scroll/layout.
+"""
+
+import threading
+import time
+from collections import deque
+
+from kivy.clock import Clock
+
+# Janela de amostras para as latências (post -> aplicação na UI)
+LATENCY_WINDOW = 500
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+class UiUpdateMailbox:
+    """
+    Recebe parciais e finais de qualquer thread e entrega ao `apply_cb` no
+    próximo frame como `apply_cb(finals, partial)`, com `finals` em pares
+    `(texto, timing)` (timing das palavras do transcriber, ou None).
+
+    `partial` é None quando nenhum parcial chegou depois do último final
+    (a UI volta para o texto de espera se houve finais).
+    """
+
+    def __init__(self, apply_cb):
+        self.apply_cb = apply_cb
+        self._lock = threading.Lock()
+        self._finals = []
+        self._partial = None
+        self._first_post_at = None
+        self._trigger = Clock.create_trigger(self._drain, 0)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats = {
+            "partials_posted": 0,
+            "finals_posted": 0,
+            "partials_coalesced": 0,
+            "dispatches": 0,
+            "max_finals_per_dispatch": 0,
+        }
+
+    def post_partial(self, text):
+        with self._lock:
+            self._stats["partials_posted"] += 1
+            if self._partial is not None:
+                self._stats["partials_coalesced"] += 1
+            self._partial = text
+            self._mark_pending()
+        self._trigger()
+
+    def post_final(self, text, timing=None):
+        with self._lock:
+            self._stats["finals_posted"] += 1
+            # O final encerra a frase: o parcial pendente dela não é mais exibido
+            if self._partial is not None:
+                self._stats["partials_coalesced"] += 1
+                self._partial = None
+            self._finals.append((text, timing))
+            self._mark_pending()
+        self._trigger()
+
+    def _mark_pending(self):
+        if self._first_post_at is None:
+            self._first_post_at = time.perf_counter()
+
+    def _drain(self, _dt):
+        with self._lock:
+            finals = self._finals
+            partial = self._partial
+            first_post_at = self._first_post_at
+            self._finals = []
+            self._partial = None
+            self._first_post_at = None
+        if not finals and partial is None:
+            return
+        try:
+            self.apply_cb(finals, partial)
+        except Exception as exc:
+            print(f"[UI_MAILBOX] Erro ao aplicar atualizações: {exc}")
+        with self._lock:
+            self._stats["dispatches"] += 1
+            if len(finals) > self._stats["max_finals_per_dispatch"]:
+                self._stats["max_finals_per_dispatch"] = len(finals)
+            if first_post_at is not None:
+                self._latencies.append(time.perf_counter() - first_post_at)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            samples = list(self._latencies)
+        stats["latency_ms_p50"] = _percentile(samples, 0.50) * 1000.0
+        stats["latency_ms_p95"] = _percentile(samples, 0.95) * 1000.0
+        stats["latency_ms_max"] = max(samples) * 1000.0 if samples else 0.0
+        return stats
@@ -0,0 +1,75 @@
+"""
+Marcos de tempo do boot (do início do processo até a primeira legenda).
+
+Cada marco é registrado uma única vez com `mark(nome)`; `get_report()`
+devolve os tempos desde o início do processo e as durações principais,
+incluindo conexão -> primeira legenda. `print_report()` inclui o perfil de
+importação quando ativado (ver utils/import_profiler.py).
+"""
+
+import threading
+import time
+
+# Referência: importação deste módulo (main.py importa logo no início)
+_T0 = time.perf_counter()
+_lock = threading.Lock()
+_marks = {}
+_reported = False
+
+# Durações exibidas no relatório: nome -> (marco inicial, marco final)
+REPORT_SPANS = {
+    "time_to_first_frame": ("process_start", "first_frame"),
+    "model_load": ("setup_start", "model_loaded"),
+    "layout_prebuild": ("layout_prebuild_start", "layout_prebuilt"),
+    "connect_to_screen": ("ble_connected", "transcriber_shown"),
+    "connect_to_first_caption": ("ble_connected", "first_caption"),
+}
+
+
+def mark(name):
+    """Registra o marco (só a primeira ocorrência conta). Pode ser chamado de qualquer thread."""
+    now = time.perf_counter()
+    with _lock:
+        if name not in _marks:
+            _marks[name] = now
+            return True
+    return False
+
+
+def has_mark(name):
+    with _lock:
+        return name in _marks
+
+
+def get_report():
+    """Retorna {"marks_ms": {...}, "spans_ms": {...}} com tempos em milissegundos."""
+    with _lock:
+        marks = dict(_marks)
+    marks.setdefault("process_start", _T0)
+    marks_ms = {
+        name: round((value - _T0) * 1000.0, 1)
+        for name, value in sorted(marks.items(), key=lambda item: item[1])
+    }
+    spans_ms = {}
+    for span, (start, end) in REPORT_SPANS.items():
+        if start in marks and end in marks:
+            spans_ms[span] = round((marks[end] - marks[start]) * 1000.0, 1)
+    return {"marks_ms": marks_ms, "spans_ms": spans_ms}
+
+
+def print_report(force=False):
+    """Imprime o relatório uma vez (ou sempre, com force=True)."""
+    global _reported
+    with _lock:
+        if _reported and not force:
+            return
+        _reported = True
+    report = get_report()
+    print("[BOOT] Marcos (ms desde o início):")
+    for name, value in report["marks_ms"].items():
+        print(f"[BOOT]   {name:<24} {value:>10.1f}")
+    for name, value in report["spans_ms"].items():
+        print(f"[BOOT] {name}: {value:.1f} ms")
+    # Perfil de importação (só se SONORIS_IMPORT_PROFILE=1)
+    from utils import import_profiler
+    import_profiler.print_report()
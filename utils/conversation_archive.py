@@ -0,0 +1,334 @@
+"""
+Arquivo compactado das conversas finalizadas.
+
+Uma conversa finalizada não muda mais, então deixa de ser guardada como
+JSON indentado (quase tudo espaço e as chaves "text"/"timestamp" repetidas)
+e passa a ser um arquivo `<id>.sca` colunar:
+
+    SCA1 {"conversation_id": ..., "created_at": ..., "total_lines": N, "codec": "zstd"}\\n
+    <corpo comprimido>
+
+O cabeçalho fica em texto puro para que a listagem não precise
+descomprimir nada. O corpo é um JSON compacto com os textos em um array e
+os timestamps em outro, codificados como deltas em microssegundos a partir
+do primeiro; timestamps que não são ISO 8601 ficam numa coluna de texto.
+Os tempos das palavras ("w") têm uma coluna própria e outras
+chaves extras de cada linha são guardadas à parte. Usa zstd se o pacote
+`zstandard` estiver instalado e zlib caso contrário.
+
+Benchmark (conversa sintética de 10 mil linhas):
+
+    python -m utils.conversation_archive --lines 10000
+"""
+
+import datetime
+import itertools
+import json
+import os
+import time
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+from utils.durable_io import atomic_write_many
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem ele o arquivo usa zlib
+    zstandard = None
+
+ARCHIVE_SUFFIX = ".sca"
+ARCHIVE_MAGIC = b"SCA1 "
+ARCHIVE_VERSION = 1
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+# Desative com SONORIS_ARCHIVE_FINALIZED=0 para manter as conversas em JSON
+ARCHIVE_ENABLED = os.environ.get("SONORIS_ARCHIVE_FINALIZED", "1") != "0"
+
+_BASE_KEYS = ("text", "timestamp", "w")
+
+
+def archive_path(directory: str, conversation_id: str) -> str:
+    return os.path.join(directory, f"{conversation_id}{ARCHIVE_SUFFIX}")
+
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compress(raw: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("arquivo em zstd, mas o pacote zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    raise ValueError(f"codec desconhecido: {codec}")
+
+
+def _encode_timestamps(timestamps: List[str]) -> dict:
+    """Deltas em microssegundos; volta para texto puro se algum não for ISO reversível."""
+    parsed = []
+    try:
+        for value in timestamps:
+            moment = datetime.datetime.fromisoformat(value)
+            if moment.tzinfo is not None or moment.isoformat() != value:
+                raise ValueError(value)
+            parsed.append(moment)
+    except (TypeError, ValueError):
+        return {"ts_raw": timestamps}
+    if not parsed:
+        return {"ts_base": None, "ts_delta": []}
+    deltas = []
+    previous = parsed[0]
+    for moment in parsed:
+        delta = moment - previous
+        deltas.append((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+        previous = moment
+    return {"ts_base": timestamps[0], "ts_delta": deltas}
+
+
+def _timestamp_offsets(body: dict) -> List[int]:
+    """Microssegundos de cada linha desde ts_base (soma de todos os deltas)."""
+    return list(itertools.accumulate(body.get("ts_delta", [])))
+
+
+def _decode_timestamps(body: dict, offsets: List[int], start: int, end: int) -> List[str]:
+    """Timestamps das linhas [start, end): só essas são formatadas."""
+    if "ts_raw" in body:
+        return body["ts_raw"][start:end]
+    base = body.get("ts_base")
+    if base is None:
+        return []
+    moment = datetime.datetime.fromisoformat(base)
+    return [(moment + datetime.timedelta(microseconds=offset)).isoformat() for offset in offsets[start:end]]
+
+
+def encode_conversation(data: dict, codec: Optional[str] = None) -> bytes:
+    """Serializa a conversa (mesmo formato do JSON em disco) no arquivo compactado."""
+    codec = codec or _default_codec()
+    lines = data.get("lines", [])
+    texts = []
+    timestamps = []
+    words = []
+    extra = {}
+    for index, line in enumerate(lines):
+        texts.append(line.get("text", ""))
+        timestamps.append(line.get("timestamp", ""))
+        words.append(line.get("w"))
+        others = {k: v for k, v in line.items() if k not in _BASE_KEYS}
+        if others:
+            extra[str(index)] = others
+    body = {"texts": texts}
+    body.update(_encode_timestamps(timestamps))
+    if any(item is not None for item in words):
+        body["w"] = words
+    if extra:
+        body["extra"] = extra
+    header = {
+        "v": ARCHIVE_VERSION,
+        "conversation_id": data.get("conversation_id", ""),
+        "created_at": data.get("created_at", ""),
+        "total_lines": len(lines),
+        "codec": codec,
+    }
+    raw = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return (
+        ARCHIVE_MAGIC
+        + json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        + b"\n"
+        + _compress(raw, codec)
+    )
+
+
+def _split(blob: bytes) -> Tuple[dict, bytes]:
+    if not blob.startswith(ARCHIVE_MAGIC):
+        raise ValueError("não é um arquivo de conversa compactado")
+    end = blob.index(b"\n")
+    return json.loads(blob[len(ARCHIVE_MAGIC):end].decode("utf-8")), blob[end + 1:]
+
+
+class ArchivedConversation:
+    """Conversa descomprimida; monta os dicts das linhas só quando pedidas."""
+
+    def __init__(self, header: dict, body: dict):
+        self.header = header
+        self._body = body
+        self.total_lines = len(body.get("texts", []))
+        # Somados na primeira leitura: cada CHUNK seguinte só fatia (sem refazer a soma desde o início)
+        self._ts_offsets: Optional[List[int]] = None
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> List[dict]:
+        start, end, _ = slice(start, end).indices(self.total_lines)
+        if start >= end:
+            return []
+        texts = self._body["texts"][start:end]
+        if self._ts_offsets is None:
+            self._ts_offsets = _timestamp_offsets(self._body)
+        timestamps = _decode_timestamps(self._body, self._ts_offsets, start, end)
+        words = self._body.get("w", [])[start:end]
+        extra = self._body.get("extra", {})
+        result = []
+        for offset, text in enumerate(texts):
+            line = {"text": text, "timestamp": timestamps[offset] if offset < len(timestamps) else ""}
+            if offset < len(words) and words[offset] is not None:
+                line["w"] = words[offset]
+            if extra:
+                line.update(extra.get(str(start + offset), {}))
+            result.append(line)
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "conversation_id": self.header.get("conversation_id", ""),
+            "created_at": self.header.get("created_at", ""),
+            "finalized": True,
+            "lines": self.lines(),
+        }
+
+
+def load_archive(blob: bytes) -> ArchivedConversation:
+    header, compressed = _split(blob)
+    body = json.loads(_decompress(compressed, header.get("codec", "zlib")).decode("utf-8"))
+    return ArchivedConversation(header, body)
+
+
+def decode_conversation(blob: bytes) -> dict:
+    return load_archive(blob).to_dict()
+
+
+def read_archive_header(path: str) -> dict:
+    """Só o cabeçalho (id, created_at, total_lines), sem descomprimir o corpo."""
+    with open(path, "rb") as handle:
+        first = handle.readline()
+    header, _ = _split(first)
+    return header
+
+
+def read_archive(path: str) -> ArchivedConversation:
+    with open(path, "rb") as handle:
+        return load_archive(handle.read())
+
+
+def archive_conversations(directory: str, conversations: Iterable[dict]) -> int:
+    """
+    Compacta conversas finalizadas e remove os JSON correspondentes.
+    Os arquivos são gravados em group commit antes de qualquer JSON ser
+    apagado, então uma queda no meio deixa no máximo as duas versões
+    (quem lê prefere o arquivo compactado).
+
+    Returns:
+        Quantidade de conversas compactadas
+    """
+    items = []
+    for data in conversations:
+        conversation_id = data.get("conversation_id")
+        if conversation_id and data.get("lines"):
+            items.append((archive_path(directory, conversation_id), encode_conversation(data)))
+    if not items:
+        return 0
+    atomic_write_many(items)
+    for path, _ in items:
+        json_path = path[: -len(ARCHIVE_SUFFIX)] + ".json"
+        try:
+            os.remove(json_path)
+        except FileNotFoundError:
+            pass
+    return len(items)
+
+
+# ------------------------------
+# Benchmark
+# ------------------------------
+
+def build_synthetic_conversation(lines: int, seed: int = 42, word_timings: bool = False) -> dict:
+    import random
+
+    rng = random.Random(seed)
+    words = (
+        "então a gente precisa revisar o cronograma da entrega antes da reunião de sexta "
+        "porque o cliente pediu mudanças no relatório e na apresentação do projeto final "
+        "eu acho que dá para dividir as tarefas entre a equipe e conversar com o professor "
+        "sobre o prazo da documentação do dispositivo e dos testes com os usuários"
+    ).split()
+    created = datetime.datetime(2025, 6, 1, 9, 0, 0)
+    moment = created
+    result = []
+    for _ in range(lines):
+        moment += datetime.timedelta(milliseconds=rng.randint(800, 6000))
+        tokens = [rng.choice(words) for _ in range(rng.randint(3, 9))]
+        line = {"text": " ".join(tokens), "timestamp": moment.isoformat()}
+        if word_timings:
+            timings = []
+            at = 0
+            for _ in tokens:
+                duration = rng.randint(120, 600)
+                timings.append(f"{at},{duration},{rng.randint(40, 100)}")
+                at += duration + rng.randint(0, 250)
+            line["w"] = ";".join(timings)
+        result.append(line)
+    return {
+        "conversation_id": f"Conversa_{created.strftime('%Y-%m-%d_%H-%M-%S')}",
+        "created_at": created.isoformat(),
+        "finalized": True,
+        "lines": result,
+    }
+
+
+def run_benchmark(lines: int = 10000, repeats: int = 5, word_timings: bool = False) -> dict:
+    """Compara tamanho e custo de leitura do JSON atual com o arquivo compactado."""
+    data = build_synthetic_conversation(lines, word_timings=word_timings)
+    json_bytes = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def _best(fn):
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - started) * 1000.0
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best, 2)
+
+    report = {
+        "lines": lines,
+        "json_bytes": len(json_bytes),
+        "json_read_ms": _best(lambda: json.loads(json_bytes.decode("utf-8"))),
+        "json_chunk_read_ms": _best(lambda: json.loads(json_bytes.decode("utf-8"))["lines"][lines // 2:lines // 2 + 4]),
+        "codecs": {},
+    }
+    codecs = ["zlib"] + (["zstd"] if zstandard is not None else [])
+    for codec in codecs:
+        blob = encode_conversation(data, codec)
+        if decode_conversation(blob) != data:
+            raise AssertionError(f"ida e volta diferente com {codec}")
+        report["codecs"][codec] = {
+            "bytes": len(blob),
+            "ratio": round(len(json_bytes) / len(blob), 1),
+            "encode_ms": _best(lambda: encode_conversation(data, codec)),
+            "read_ms": _best(lambda: decode_conversation(blob)),
+            "chunk_read_ms": _best(lambda: load_archive(blob).lines(lines // 2, lines // 2 + 4)),
+            "header_ms": _best(lambda: _split(blob[: blob.index(b"\n") + 1])),
+        }
+    return report
+
+
+def _run_cli():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark do arquivo compactado de conversas")
+    parser.add_argument("--lines", type=int, default=10000, help="Linhas da conversa sintética")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetições (vale o melhor tempo)")
+    parser.add_argument("--words", action="store_true", help="Inclui os tempos das palavras em cada linha")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.lines, args.repeats, args.words), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    _run_cli()
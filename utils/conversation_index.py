@@ -0,0 +1,140 @@
+"""
+Índice em memória dos metadados das conversas (id, created_at, finalizada,
+linhas), usado pelo LIST paginado.
+
+Toda gravação na pasta é um rename (ver utils/durable_io.py), que muda o
+mtime da pasta; enquanto ele não muda, o índice é servido sem tocar no
+disco. Quando muda, só os arquivos com mtime/tamanho diferentes são
+relidos (dos compactados, só o cabeçalho).
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List
+
+from utils.conversation_archive import ARCHIVE_SUFFIX, read_archive_header
+
+
+class ConversationEntry:
+    __slots__ = ("conversation_id", "created_at", "finalized", "lines", "mtime", "signature")
+
+    def __init__(self, conversation_id, created_at, finalized, lines, mtime, signature):
+        self.conversation_id = conversation_id
+        self.created_at = created_at
+        self.finalized = finalized
+        self.lines = lines
+        self.mtime = mtime
+        self.signature = signature
+
+
+class ConversationIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._entries: Dict[str, ConversationEntry] = {}
+        self._stats = {"refreshes": 0, "files_read": 0}
+
+    def _read_entry(self, conversation_id, path, stat):
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if path.endswith(ARCHIVE_SUFFIX):
+            header = read_archive_header(path)
+            return ConversationEntry(
+                conversation_id,
+                header.get("created_at", ""),
+                True,
+                header.get("total_lines", 0),
+                stat.st_mtime,
+                signature,
+            )
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        return ConversationEntry(
+            conversation_id,
+            data.get("created_at", ""),
+            bool(data.get("finalized", False)),
+            len(data.get("lines", [])),
+            stat.st_mtime,
+            signature,
+        )
+
+    def refresh(self, force: bool = False) -> None:
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._entries = {}
+                self._dir_mtime = None
+            return
+        with self._lock:
+            if not force and dir_mtime == self._dir_mtime:
+                return
+            previous = self._entries
+
+        found = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                name = entry.name
+                if name.startswith("."):
+                    continue
+                if name.endswith(ARCHIVE_SUFFIX):
+                    conversation_id = name[: -len(ARCHIVE_SUFFIX)]
+                elif name.endswith(".json"):
+                    conversation_id = name[:-5]
+                    if conversation_id in found and found[conversation_id].path.endswith(ARCHIVE_SUFFIX):
+                        continue  # o compactado tem precedência
+                else:
+                    continue
+                found[conversation_id] = entry
+
+        entries = {}
+        files_read = 0
+        for conversation_id, entry in found.items():
+            try:
+                stat = entry.stat()
+                cached = previous.get(conversation_id)
+                if cached is not None and cached.signature == (stat.st_mtime_ns, stat.st_size):
+                    entries[conversation_id] = cached
+                    continue
+                entries[conversation_id] = self._read_entry(conversation_id, entry.path, stat)
+                files_read += 1
+            except Exception as exc:
+                print(f"[STORE] Erro ao indexar {entry.name}: {exc}")
+
+        with self._lock:
+            self._entries = entries
+            self._dir_mtime = dir_mtime
+            self._stats["refreshes"] += 1
+            self._stats["files_read"] += files_read
+
+    def entries(self) -> List[ConversationEntry]:
+        """Entradas atuais (atualiza antes se a pasta mudou)."""
+        self.refresh()
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, conversation_id: str):
+        """Entrada da conversa (ou None), atualizando antes se a pasta mudou."""
+        self.refresh()
+        with self._lock:
+            return self._entries.get(conversation_id)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["conversations"] = len(self._entries)
+            return stats
+
+
+_indexes: Dict[str, ConversationIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_conversation_index(directory: str) -> ConversationIndex:
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ConversationIndex(key)
+        return index
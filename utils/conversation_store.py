@@ -0,0 +1,312 @@
+"""
+Leitura das conversas salvas em transcripts/ para envio via Bluetooth.
+Usado pelos callbacks do servidor BLE e pelo teste de carga (ble_loadtest.py).
+
+Conversas finalizadas podem estar em JSON ou compactadas (.sca, ver
+utils/conversation_archive.py); a leitura é a mesma para quem chama.
+"""
+
+import os
+import json
+import threading
+
+from utils.conversation_archive import archive_path, read_archive, read_archive_header
+from utils.conversation_index import get_conversation_index
+from utils.retention import get_synced_conversations
+from utils.search_index import get_search_index
+from utils.sync_state import get_sync_cursors
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "transcripts")
+
+# Define tamanho do chunk (4 linhas x 40 chars = 492 bytes, MTU-safe)
+CHUNK_SIZE = 4
+
+# Quantidade de conversas retornadas pelo LIST
+LIST_LIMIT = 5
+
+# LIST paginado: tamanho padrão da página (MTU padrão menos o cabeçalho ATT)
+LIST_PAGE_DEFAULT_BYTES = 182
+
+# Última conversa compactada lida: os CHUNKs seguidos não descomprimem de novo
+_archive_cache = {"key": None, "conversation": None}
+_archive_cache_lock = threading.Lock()
+
+
+def _load_archived(file_path):
+    """Conversa compactada, reaproveitando a última leitura se o arquivo não mudou."""
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    with _archive_cache_lock:
+        if _archive_cache["key"] == key:
+            return _archive_cache["conversation"]
+    conversation = read_archive(file_path)
+    with _archive_cache_lock:
+        _archive_cache["key"] = key
+        _archive_cache["conversation"] = conversation
+    return conversation
+
+
+def _mark_synced(conv_id, transcripts_dir):
+    """O celular confirmou (ACK) a conversa finalizada inteira: a retenção pode apagá-la."""
+    try:
+        get_synced_conversations(transcripts_dir).add(conv_id)
+    except Exception as e:
+        print(f"[STORE] Erro ao marcar {conv_id} como sincronizada: {e}")
+
+
+def get_conversations(transcripts_dir=TRANSCRIPTS_DIR, limit=LIST_LIMIT):
+    """Retorna lista RESUMIDA de conversas FINALIZADAS (id, created_at)."""
+    conversations = []
+    try:
+        # Índice em memória: só relê o que mudou na pasta
+        entries = [
+            e for e in get_conversation_index(transcripts_dir).entries()
+            if e.finalized and e.lines > 0
+        ]
+        # ordena mais recentes primeiro e limita
+        entries.sort(key=lambda e: e.mtime, reverse=True)
+        for entry in entries[:limit]:
+            # Retorna apenas metadados mínimos para evitar MTU overflow
+            conversations.append({
+                'conversation_id': entry.conversation_id,
+                'created_at': entry.created_at,
+            })
+    except Exception as e:
+        print(f"[STORE] Erro ao listar conversas: {e}")
+    return conversations
+
+
+def list_conversations_page(options=None, max_bytes=None, transcripts_dir=TRANSCRIPTS_DIR):
+    """
+    LIST paginado: conversas da mais recente para a mais antiga, empacotadas
+    para caber em `max_bytes` (ao menos uma por página). O cursor é o id da
+    última conversa entregue: ids são "Conversa_<data>", então a ordem não
+    muda com conversas novas ou apagadas entre uma página e outra.
+
+    Args:
+        options: {"cursor": id, "since": ISO 8601, "finalized": bool (padrão True),
+                  "unsynced": bool, "limit": int}
+
+    Returns:
+        {"items": [{"id", "at" (created_at), "n" (linhas), "s" (sincronizada)}], "next": cursor ou None}
+    """
+    options = options or {}
+    finalized_only = bool(options.get('finalized', True))
+    unsynced_only = bool(options.get('unsynced', False))
+    since = options.get('since')
+    limit = options.get('limit')
+    cursor = str(options['cursor']) if options.get('cursor') else None
+    max_bytes = max_bytes or LIST_PAGE_DEFAULT_BYTES
+
+    synced = get_synced_conversations(transcripts_dir).snapshot()
+    entries = [
+        e for e in get_conversation_index(transcripts_dir).entries()
+        if e.lines > 0
+        and (e.finalized or not finalized_only)
+        and not (unsynced_only and e.conversation_id in synced)
+        and (not since or e.created_at >= since)
+        and (cursor is None or e.conversation_id < cursor)
+    ]
+    entries.sort(key=lambda e: e.conversation_id, reverse=True)
+
+    # Chaves curtas: cada byte conta para caber mais conversas por leitura
+    return _pack_page(
+        entries,
+        lambda e: {
+            'id': e.conversation_id,
+            'at': e.created_at,
+            'n': e.lines,
+            's': 1 if e.conversation_id in synced else 0,
+        },
+        max_bytes,
+        limit,
+    )
+
+
+def _pack_page(entries, make_item, max_bytes, limit=None):
+    """
+    Empacota itens até `max_bytes` (ao menos um) e devolve o cursor (id do
+    último entregue) se sobrou algum.
+    """
+    items = []
+    used = len(b'{"items":[],"next":null}')
+    for position, entry in enumerate(entries):
+        if limit and len(items) >= int(limit):
+            break
+        item = make_item(entry)
+        size = len(json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) + (1 if items else 0)
+        # Reserva espaço para o cursor (troca o null) se ainda houver itens depois deste
+        cursor_size = len(json.dumps(entry.conversation_id).encode('utf-8')) if position + 1 < len(entries) else 0
+        if items and used + size + cursor_size > max_bytes:
+            break
+        items.append(item)
+        used += size
+    last = len(items)
+    next_cursor = None
+    if last and last < len(entries):
+        next_cursor = entries[last - 1].conversation_id
+    return {'items': items, 'next': next_cursor}
+
+
+def sync_changes(phone, options=None, max_bytes=None, transcripts_dir=TRANSCRIPTS_DIR):
+    """
+    SYNC: conversas com linhas que o celular ainda não confirmou, da mais
+    antiga para a mais nova (inclui a conversa em andamento).
+
+    Args:
+        phone: Identidade do celular (chave dos cursores)
+        options: {"cursor": id, "limit": int}
+
+    Returns:
+        {"items": [{"id", "at", "from", "to", "c" (chunk de "from"), "f" (finalizada)}], "next": cursor ou None}
+    """
+    options = options or {}
+    cursor = str(options['cursor']) if options.get('cursor') else None
+    acked, seen_finalized = get_sync_cursors(transcripts_dir).get_state(phone)
+    entries = [
+        e for e in get_conversation_index(transcripts_dir).entries()
+        # Também volta uma vez (para este celular) quando a conversa confirmada por inteiro é finalizada
+        if (e.lines > acked.get(e.conversation_id, 0) or (e.finalized and e.conversation_id not in seen_finalized))
+        and (cursor is None or e.conversation_id > cursor)
+    ]
+    entries.sort(key=lambda e: e.conversation_id)
+    return _pack_page(
+        entries,
+        lambda e: {
+            'id': e.conversation_id,
+            'at': e.created_at,
+            'from': acked.get(e.conversation_id, 0),
+            'to': e.lines,
+            'c': acked.get(e.conversation_id, 0) // CHUNK_SIZE,
+            'f': 1 if e.finalized else 0,
+        },
+        max_bytes or LIST_PAGE_DEFAULT_BYTES,
+        options.get('limit'),
+    )
+
+
+def ack_conversation(phone, conv_id, lines, transcripts_dir=TRANSCRIPTS_DIR):
+    """
+    ACK: o celular confirma que tem as linhas [0, lines) da conversa.
+    Conversa finalizada confirmada por inteiro conta como sincronizada (retenção).
+
+    Returns:
+        {"id", "acked"} com o cursor atual
+    """
+    entry = get_conversation_index(transcripts_dir).get(conv_id)
+    if entry is None:
+        return {'id': conv_id, 'acked': 0}
+    # Não confirma linhas que o dispositivo ainda não tem
+    acked = get_sync_cursors(transcripts_dir).ack(
+        phone,
+        conv_id,
+        min(int(lines), entry.lines),
+        finalized_lines=entry.lines if entry.finalized else None,
+    )
+    if entry.finalized and acked >= entry.lines:
+        _mark_synced(conv_id, transcripts_dir)
+    return {'id': conv_id, 'acked': acked}
+
+
+def get_conversation_by_id(conv_id, transcripts_dir=TRANSCRIPTS_DIR):
+    """Retorna os metadados da conversa indicando quantos chunks ela tem."""
+    try:
+        archived_path = archive_path(transcripts_dir, conv_id)
+        file_path = os.path.join(transcripts_dir, f"{conv_id}.json")
+        if os.path.exists(archived_path):
+            header = read_archive_header(archived_path)
+            data = {
+                'conversation_id': header.get('conversation_id', ''),
+                'created_at': header.get('created_at', ''),
+                'finalized': True,
+            }
+            total_lines = header.get('total_lines', 0)
+        elif os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            total_lines = len(data.get('lines', []))
+        else:
+            data = None
+
+        if data is not None:
+            # Calcula número total de chunks necessários
+            total_chunks = (total_lines + CHUNK_SIZE - 1) // CHUNK_SIZE if total_lines > 0 else 1
+
+            return {
+                'conversation_id': data.get('conversation_id', ''),
+                'created_at': data.get('created_at', ''),
+                'finalized': data.get('finalized', False),
+                'total_lines': total_lines,
+                'total_chunks': total_chunks,
+                'chunk_size': CHUNK_SIZE,
+                'requires_chunking': total_chunks > 1,
+            }
+    except Exception as e:
+        print(f"[STORE] Erro ao carregar conversa {conv_id}: {e}")
+    return None
+
+
+def get_conversation_chunk(conv_id, chunk_index, transcripts_dir=TRANSCRIPTS_DIR):
+    """Retorna um chunk específico de uma conversa."""
+    try:
+        archived_path = archive_path(transcripts_dir, conv_id)
+        file_path = os.path.join(transcripts_dir, f"{conv_id}.json")
+        if os.path.exists(archived_path):
+            conversation = _load_archived(archived_path)
+            start_idx = chunk_index * CHUNK_SIZE
+            return {
+                'conversation_id': conversation.header.get('conversation_id', ''),
+                'chunk_index': chunk_index,
+                'lines': conversation.lines(start_idx, start_idx + CHUNK_SIZE),
+            }
+        if os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            lines = data.get('lines', [])
+
+            # Calcula início e fim do chunk
+            start_idx = chunk_index * CHUNK_SIZE
+            end_idx = min(start_idx + CHUNK_SIZE, len(lines))
+
+            return {
+                'conversation_id': data.get('conversation_id', ''),
+                'chunk_index': chunk_index,
+                'lines': lines[start_idx:end_idx],
+            }
+    except Exception as e:
+        print(f"[STORE] Erro ao carregar chunk {chunk_index} de {conv_id}: {e}")
+    return None
+
+
+def delete_conversation(conv_id, transcripts_dir=TRANSCRIPTS_DIR):
+    """Remove a conversa do dispositivo."""
+    try:
+        removed = False
+        for file_path in (archive_path(transcripts_dir, conv_id), os.path.join(transcripts_dir, f"{conv_id}.json")):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                removed = True
+        if removed:
+            get_synced_conversations(transcripts_dir).discard([conv_id])
+            get_search_index(transcripts_dir).remove([conv_id])
+            get_sync_cursors(transcripts_dir).forget([conv_id])
+            print(f"[STORE] Conversa {conv_id} deletada do dispositivo.")
+            return True
+    except Exception as e:
+        print(f"[STORE] Erro ao deletar conversa {conv_id}: {e}")
+    return False
+
+
+def search_conversations(query, transcripts_dir=TRANSCRIPTS_DIR):
+    """Busca no índice de texto: conversas e offsets das linhas que casam com a consulta."""
+    try:
+        index = get_search_index(transcripts_dir)
+        index.start()  # no app já foi iniciado; aqui cobre o teste de carga
+        result = index.search(query)
+        result['chunk_size'] = CHUNK_SIZE
+        return result
+    except Exception as e:
+        print(f"[STORE] Erro ao buscar '{query}': {e}")
+    return None
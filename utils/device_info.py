@@ -6,15 +6,28 @@ como nome, tempo ativo e contador de conversas.
 
 import os
 import json
+import threading
 import time
 
+from utils.durable_io import atomic_write_json, recover_json_dir
+
+# Intervalo (s) do flush em segundo plano quando há alterações pendentes
+DEVICE_INFO_FLUSH_INTERVAL_SEC = float(os.environ.get("SONORIS_DEVICE_INFO_FLUSH_SEC", "30"))
+
+# Tempo ativo acumulado (s) sem gravar a partir do qual ele sozinho justifica um flush
+ACTIVE_TIME_SAVE_SEC = 300
+
 class DeviceInfo:
     """
     Classe para gerenciar informações do dispositivo.
     Armazena e gerencia o nome do dispositivo, tempo ativo e contador de conversas.
+
+    O estado fica em memória com uma flag de sujo; uma thread grava o arquivo
+    periodicamente, em `checkpoint()` (assíncrono) ou em `flush()` (síncrono,
+    ao encerrar). Leituras e atualizações nunca tocam o disco na thread de quem chama.
     """
     
-    def __init__(self, base_dir=None):
+    def __init__(self, base_dir=None, flush_interval=DEVICE_INFO_FLUSH_INTERVAL_SEC):
         """Inicializa o gerenciador de informações do dispositivo."""
         self.base_dir = base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.data_dir = os.path.join(self.base_dir, "device_data")
@@ -25,6 +38,15 @@ class DeviceInfo:
         self._total_active_time = 0  # Em segundos
         self._total_conversations = 0
         self._start_time = time.time()
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._dirty = False
+        self._saved_active_time = 0
+        self._flush_interval = flush_interval
+        self._wakeup = threading.Event()
+        self._stats = {"saves": 0, "save_errors": 0, "updates": 0}
+        self._storage_stats_cb = None
         
         # Certifica que o diretório de dados existe
         if not os.path.exists(self.data_dir):
@@ -33,8 +55,15 @@ class DeviceInfo:
             except Exception as e:
                 print(f"Erro ao criar diretório de dados: {e}")
         
+        # Resolve uma gravação interrompida (temporário ou arquivo corrompido) antes de ler
+        recover_json_dir(self.data_dir, salvage_conversations=False)
+
         # Carrega os dados salvos, se existirem
         self._load_data()
+        self._saved_active_time = self._total_active_time
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="device-info-flush", daemon=True)
+        self._flusher.start()
     
     def _load_data(self):
         """Carrega os dados do arquivo JSON."""
@@ -48,19 +77,74 @@ class DeviceInfo:
             except Exception as e:
                 print(f"Erro ao carregar dados do dispositivo: {e}")
     
+    def _snapshot(self):
+        """Incorpora o tempo da sessão e retorna os dados a gravar (com o lock)."""
+        elapsed = int(time.time() - self._start_time)
+        self._total_active_time += elapsed
+        # Avança só os segundos inteiros: a fração continua contando
+        self._start_time += elapsed
+        return {
+            'device_name': self._device_name,
+            'total_active_time': self._total_active_time,
+            'total_conversations': self._total_conversations
+        }
+
     def _save_data(self):
-        """Salva os dados no arquivo JSON."""
-        try:
-            data = {
-                'device_name': self._device_name,
-                'total_active_time': self._total_active_time,
-                'total_conversations': self._total_conversations
-            }
-            
-            with open(self.info_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Erro ao salvar dados do dispositivo: {e}")
+        """Salva os dados no arquivo JSON se houver alteração pendente."""
+        with self._io_lock:
+            with self._lock:
+                data = self._snapshot()
+                if not self._dirty and data['total_active_time'] == self._saved_active_time:
+                    return False
+                self._dirty = False
+            try:
+                # Temporário + fsync + rename: nunca deixa o arquivo pela metade
+                atomic_write_json(self.info_file, data)
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True
+                    self._stats["save_errors"] += 1
+                print(f"Erro ao salvar dados do dispositivo: {e}")
+                return False
+            with self._lock:
+                self._saved_active_time = data['total_active_time']
+                self._stats["saves"] += 1
+            return True
+
+    def _mark_dirty(self):
+        with self._lock:
+            self._dirty = True
+            self._stats["updates"] += 1
+
+    def _needs_flush(self):
+        with self._lock:
+            if self._dirty:
+                return True
+            unsaved = self._total_active_time + int(time.time() - self._start_time) - self._saved_active_time
+            return unsaved >= ACTIVE_TIME_SAVE_SEC
+
+    def _flush_loop(self):
+        while True:
+            requested = self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            if requested or self._needs_flush():
+                self._save_data()
+
+    def checkpoint(self):
+        """Pede uma gravação em segundo plano (não bloqueia)."""
+        self._wakeup.set()
+
+    def flush(self):
+        """Grava agora, na thread de quem chama (ex.: ao encerrar o app)."""
+        with self._lock:
+            self._dirty = True  # garante o tempo ativo mais recente
+        return self._save_data()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["dirty"] = self._dirty
+            return stats
     
     @property
     def device_name(self):
@@ -70,23 +154,20 @@ class DeviceInfo:
     @device_name.setter
     def device_name(self, value):
         """Define o nome do dispositivo (apenas pelo Bluetooth)."""
-        if value and isinstance(value, str):
-            self._device_name = value
-            self._save_data()
+        self.update_device_name(value)
     
     @property
     def total_active_time(self):
         """Tempo total ativo em segundos."""
         # Atualiza o tempo com a sessão atual
-        current_session_time = (time.time() - self._start_time)  # Em segundos
-        return self._total_active_time + int(current_session_time)
+        with self._lock:
+            current_session_time = (time.time() - self._start_time)  # Em segundos
+            return self._total_active_time + int(current_session_time)
     
     def update_active_time(self):
-        """Atualiza o tempo ativo total."""
-        current_session_time = (time.time() - self._start_time)  # Em segundos
-        self._total_active_time += int(current_session_time)
-        self._start_time = time.time()  # Reinicia o contador
-        self._save_data()
+        """Incorpora o tempo da sessão atual ao total (só em memória)."""
+        with self._lock:
+            self._snapshot()
     
     @property
     def total_conversations(self):
@@ -95,26 +176,41 @@ class DeviceInfo:
     
     def increment_conversation_counter(self):
         """Incrementa o contador de conversas."""
-        self._total_conversations += 1
-        self._save_data()
-        return self._total_conversations
+        with self._lock:
+            self._total_conversations += 1
+            total = self._total_conversations
+        self._mark_dirty()
+        return total
     
+    def set_storage_stats_provider(self, callback):
+        """Define a função (só memória) que retorna o uso da pasta de transcrições."""
+        self._storage_stats_cb = callback
+
     def get_device_data_for_bluetooth(self):
         """Retorna um dicionário com os dados para envio via Bluetooth."""
-        return {
+        data = {
             'device_name': self.device_name,
             'total_active_time': self.total_active_time,
             'total_conversations': self.total_conversations
         }
+        if callable(self._storage_stats_cb):
+            try:
+                data['storage'] = self._storage_stats_cb()
+            except Exception as e:
+                print(f"[DEVICE_INFO] Erro ao obter uso do armazenamento: {e}")
+        return data
     
     def update_device_name(self, name):
         """Atualiza o nome do dispositivo via Bluetooth."""
         try:
             if name and isinstance(name, str):
-                self._device_name = name
-                self._save_data()
+                with self._lock:
+                    self._device_name = name
+                self._mark_dirty()
+                # Alteração explícita do usuário: grava logo, sem esperar o timer
+                self.checkpoint()
                 return True
             return False
         except Exception as e:
             print(f"[DEVICE_INFO] Erro ao atualizar nome: {e}")
-            return False
\ No newline at end of file
+            return False
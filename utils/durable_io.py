@@ -0,0 +1,273 @@
+"""
+Gravação à prova de queda de energia para os arquivos JSON do dispositivo.
+
+O dispositivo costuma ser desligado tirando da tomada. Em vez de abrir o
+destino com "w" e escrever por cima, cada arquivo é gravado num temporário
+na mesma pasta, sincronizado (fsync), renomeado por cima do destino
+(os.replace é atômico) e a pasta é sincronizada. Um arquivo nunca fica pela
+metade: ou é a versão antiga, ou a nova.
+
+`atomic_write_many` faz group commit: grava e sincroniza vários
+temporários, renomeia todos e sincroniza cada pasta uma única vez.
+
+`recover_json_dir` roda no boot: promove temporários completos, remove os
+incompletos e tenta salvar conversas truncadas (de antes desta camada ou
+de cartões que não respeitam fsync) em vez de descartá-las.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TMP_SUFFIX = ".tmp"
+CORRUPT_SUFFIX = ".corrupt"
+
+_tmp_counter = 0
+_tmp_lock = threading.Lock()
+
+# Marca dos temporários deste processo. Só o PID não basta: num Pi que já
+# inicia no app o PID costuma se repetir entre boots, e a sobra de um boot
+# anterior pareceria uma gravação ainda em andamento.
+_PROCESS_TAG = f"{os.getpid()}_{os.urandom(4).hex()}"
+
+
+def _tmp_path(path: str) -> str:
+    global _tmp_counter
+    with _tmp_lock:
+        _tmp_counter += 1
+        n = _tmp_counter
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{_PROCESS_TAG}-{n}{TMP_SUFFIX}")
+
+
+def is_own_tmp(name: str) -> bool:
+    """True se o temporário foi criado por este processo (ainda vai ser renomeado ou limpo)."""
+    return name.endswith(TMP_SUFFIX) and f".{_PROCESS_TAG}-" in name
+
+
+def _fsync_dir(directory: str) -> None:
+    # Nem todo sistema permite abrir pasta (ex.: Windows); lá o rename já basta
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_tmp(path: str, payload: bytes, fsync: bool) -> str:
+    tmp = _tmp_path(path)
+    try:
+        with open(tmp, "wb") as handle:
+            handle.write(payload)
+            handle.flush()
+            if fsync:
+                os.fsync(handle.fileno())
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return tmp
+
+
+def dumps_json(data, indent: Optional[int] = 2) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=indent).encode("utf-8")
+
+
+def atomic_write_bytes(path: str, payload: bytes, fsync: bool = True) -> None:
+    """Grava `payload` em `path` de forma atômica e durável."""
+    tmp = _write_tmp(path, payload, fsync)
+    os.replace(tmp, path)
+    if fsync:
+        _fsync_dir(os.path.dirname(path))
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = 2, fsync: bool = True) -> None:
+    atomic_write_bytes(path, dumps_json(data, indent), fsync=fsync)
+
+
+def atomic_write_many(items: Iterable[Tuple[str, bytes]], fsync: bool = True) -> int:
+    """
+    Group commit: grava vários arquivos com um fsync de pasta por diretório.
+    Se o mesmo caminho aparecer mais de uma vez, vale o último conteúdo.
+
+    Returns:
+        Quantidade de arquivos gravados
+    """
+    latest: Dict[str, bytes] = {}
+    for path, payload in items:
+        latest[path] = payload
+    staged: List[Tuple[str, str]] = []
+    try:
+        for path, payload in latest.items():
+            staged.append((_write_tmp(path, payload, fsync), path))
+    except Exception:
+        for tmp, _ in staged:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        raise
+    directories = set()
+    for tmp, path in staged:
+        os.replace(tmp, path)
+        directories.add(os.path.dirname(path))
+    if fsync:
+        for directory in directories:
+            _fsync_dir(directory)
+    return len(staged)
+
+
+# ------------------------------
+# Recuperação no boot
+# ------------------------------
+
+_HEADER_FIELDS = {
+    "conversation_id": re.compile(r'"conversation_id"\s*:\s*"((?:[^"\\]|\\.)*)"'),
+    "created_at": re.compile(r'"created_at"\s*:\s*"((?:[^"\\]|\\.)*)"'),
+}
+
+
+def salvage_conversation(raw: str, fallback_id: str) -> Optional[dict]:
+    """
+    Reconstrói uma conversa a partir de um JSON truncado: lê o cabeçalho e
+    todas as linhas completas do array "lines".
+
+    Returns:
+        Conversa recuperada (finalizada) ou None se não houver nenhuma linha
+    """
+    match = re.search(r'"lines"\s*:\s*\[', raw)
+    if not match:
+        return None
+    decoder = json.JSONDecoder()
+    lines = []
+    pos = match.end()
+    length = len(raw)
+    while pos < length:
+        while pos < length and raw[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= length or raw[pos] == "]":
+            break
+        try:
+            item, pos = decoder.raw_decode(raw, pos)
+        except ValueError:
+            break  # linha cortada no meio: descarta só ela
+        if isinstance(item, dict):
+            lines.append(item)
+    if not lines:
+        return None
+    header = {}
+    for field, pattern in _HEADER_FIELDS.items():
+        found = pattern.search(raw, 0, match.start())
+        if found:
+            try:
+                header[field] = json.loads(f'"{found.group(1)}"')
+            except ValueError:
+                pass
+    return {
+        "conversation_id": header.get("conversation_id") or fallback_id,
+        "created_at": header.get("created_at") or lines[0].get("timestamp", ""),
+        # Arquivo truncado é de uma sessão anterior: já pode ser listado
+        "finalized": True,
+        "lines": lines,
+    }
+
+
+def _quarantine(path: str) -> None:
+    try:
+        os.replace(path, path + CORRUPT_SUFFIX)
+    except OSError as exc:
+        print(f"[DURABLE_IO] Erro ao isolar {path}: {exc}")
+
+
+def recover_json_dir(
+    directory: str,
+    salvage_conversations: bool = True,
+    only: Optional[Iterable[str]] = None,
+) -> Dict[str, int]:
+    """
+    Verifica os JSON de `directory` após uma possível queda de energia.
+
+    - temporários (.tmp) completos cujo destino falta ou está corrompido são promovidos;
+      os demais são removidos. Os deste processo (PID no nome) são de uma
+      gravação em andamento e não são tocados
+    - JSON inválido: tenta salvar as linhas (conversas); se não der, renomeia
+      para .corrupt em vez de apagar
+    - `only`: nomes de arquivo a validar (ex.: os que estavam abertos); os
+      demais não são lidos. None valida todos.
+
+    Returns:
+        Contadores: tmp_promoted, tmp_removed, salvaged, quarantined
+    """
+    report = {"tmp_promoted": 0, "tmp_removed": 0, "salvaged": 0, "quarantined": 0}
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return report
+
+    def _valid_json(path):
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                json.load(handle)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    # Temporários deixados por uma gravação interrompida
+    for entry in entries:
+        name = entry.name
+        if not (name.startswith(".") and name.endswith(TMP_SUFFIX)):
+            continue
+        if is_own_tmp(name):
+            continue  # escritor deste processo ainda vai renomear (ou limpar) o seu
+        parts = name[1:].rsplit(".", 2)
+        target_name = parts[0]
+        target = os.path.join(directory, target_name)
+        if _valid_json(entry.path) and (not os.path.exists(target) or not _valid_json(target)):
+            os.replace(entry.path, target)
+            report["tmp_promoted"] += 1
+        else:
+            try:
+                os.remove(entry.path)
+                report["tmp_removed"] += 1
+            except OSError:
+                pass
+
+    changed_dir = report["tmp_promoted"] > 0
+    selected = None if only is None else set(only)
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json") or not entry.is_file():
+            continue
+        if selected is not None and entry.name not in selected:
+            continue
+        try:
+            with open(entry.path, "r", encoding="utf-8", errors="replace") as handle:
+                raw = handle.read()
+        except OSError:
+            continue
+        try:
+            json.loads(raw)
+            continue
+        except ValueError:
+            pass
+        recovered = salvage_conversation(raw, entry.name[:-5]) if salvage_conversations else None
+        if recovered is not None:
+            atomic_write_json(entry.path, recovered)
+            report["salvaged"] += 1
+            print(f"[DURABLE_IO] {entry.name}: {len(recovered['lines'])} linhas recuperadas")
+        else:
+            _quarantine(entry.path)
+            report["quarantined"] += 1
+            changed_dir = True
+            print(f"[DURABLE_IO] {entry.name}: irrecuperável, movido para {entry.name}{CORRUPT_SUFFIX}")
+    if changed_dir:
+        _fsync_dir(directory)
+    return report
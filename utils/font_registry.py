@@ -0,0 +1,161 @@
+"""
+Registro de fontes por (família, peso).
+
+A pasta fonts/ é lida uma única vez; os arquivos seguem o padrão
+`{Família}-{Peso}.ttf` (ver fonts/README.md). As fontes só são registradas
+no Kivy quando usadas, sempre com um nome único por (família, peso), e
+podem ter os glifos do português aquecidos em frames ociosos para que a
+primeira legenda numa fonte nova não trave.
+"""
+
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS_DIR = os.path.join(BASE_DIR, "fonts")
+
+# Mapeamento de font weights para nomes de arquivo
+FONT_WEIGHT_MAP = {
+    100: "Thin",
+    200: "ExtraLight",
+    300: "Light",
+    400: "Regular",
+    500: "Medium",
+    600: "SemiBold",
+    700: "Bold",
+    800: "ExtraBold",
+    900: "Black"
+}
+_WEIGHT_BY_NAME = {name: weight for weight, name in FONT_WEIGHT_MAP.items()}
+
+# Caracteres usados para aquecer o cache de glifos (português + pontuação comum)
+PT_BR_CHARSET = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    "áàâãéêíóôõúüçÁÀÂÃÉÊÍÓÔÕÚÜÇ"
+    ".,;:!?-–—'\"()[]/%…ºª"
+)
+
+# Chave usada para o arquivo "{Família}.ttf" (sem peso no nome)
+_BASE_FILE = None
+
+
+class FontRegistry:
+    """Índice dos arquivos de fonte e nomes registrados no Kivy."""
+
+    def __init__(self, fonts_dir=FONTS_DIR):
+        self.fonts_dir = fonts_dir
+        self._lock = threading.Lock()
+        self._files = {}
+        self._registered = {}
+        self._warmed = set()
+        self._warm_queue = []
+        self._warm_event = None
+        self._scan()
+
+    def _scan(self):
+        """Lê fonts/ uma vez e indexa por (família, peso)."""
+        try:
+            entries = list(os.scandir(self.fonts_dir))
+        except OSError as e:
+            print(f"[FONTS] Pasta de fontes indisponível: {e}")
+            return
+        for entry in entries:
+            name = entry.name
+            if not name.lower().endswith(".ttf") or not entry.is_file():
+                continue
+            stem = name[:-4]
+            family, sep, weight_name = stem.partition("-")
+            if not sep:
+                self._files[(stem, _BASE_FILE)] = entry.path
+                continue
+            weight = _WEIGHT_BY_NAME.get(weight_name)
+            if weight is not None:
+                self._files[(family, weight)] = entry.path
+
+    def families(self):
+        return sorted({family for family, _ in self._files})
+
+    def get_font_file(self, family="Inter", weight=400):
+        """
+        Caminho do arquivo para (família, peso), com o mesmo fallback de
+        antes: peso pedido -> Regular -> {Família}.ttf -> None.
+        """
+        weight = weight if weight in FONT_WEIGHT_MAP else 400
+        for key in ((family, weight), (family, 400), (family, _BASE_FILE)):
+            path = self._files.get(key)
+            if path:
+                return path
+        return None
+
+    def font_name(self, family, weight=400):
+        """
+        Nome registrado no Kivy para (família, peso), registrando na primeira vez.
+        Retorna None se a família não tiver nenhum arquivo.
+        """
+        weight = weight if weight in FONT_WEIGHT_MAP else 400
+        key = (family, weight)
+        with self._lock:
+            name = self._registered.get(key)
+            if name is not None:
+                return name
+        font_file = self.get_font_file(family, weight)
+        if not font_file:
+            return None
+        name = f"{family}-{FONT_WEIGHT_MAP[weight]}"
+        from kivy.core.text import LabelBase
+        LabelBase.register(name=name, fn_regular=font_file)
+        with self._lock:
+            self._registered[key] = name
+        return name
+
+    def warm_glyphs(self, font_name, font_sizes, charset=PT_BR_CHARSET):
+        """
+        Agenda o aquecimento dos glifos de `charset` para a fonte nos tamanhos dados.
+        `font_name` pode ser um nome registrado ou o caminho do .ttf (sem registrar).
+        Roda em frames ociosos na thread principal (um tamanho por frame).
+        """
+        if not font_name:
+            return
+        from kivy.clock import Clock
+        with self._lock:
+            for size in font_sizes:
+                key = (font_name, int(size))
+                if key not in self._warmed and key not in self._warm_queue:
+                    self._warm_queue.append(key)
+            if self._warm_event is None and self._warm_queue:
+                self._warm_event = Clock.schedule_once(lambda dt: self._warm_next(charset), 0)
+
+    def _warm_next(self, charset):
+        from kivy.clock import Clock
+        from kivy.core.text import Label as CoreLabel
+        with self._lock:
+            self._warm_event = None
+            if not self._warm_queue:
+                return
+            font_name, size = self._warm_queue.pop(0)
+        try:
+            # Renderizar uma vez carrega o arquivo e preenche o cache de glifos do provider
+            CoreLabel(text=charset, font_name=font_name, font_size=size).refresh()
+            with self._lock:
+                self._warmed.add((font_name, size))
+        except Exception as e:
+            print(f"[FONTS] Erro ao aquecer {font_name} {size}: {e}")
+        with self._lock:
+            if self._warm_queue and self._warm_event is None:
+                self._warm_event = Clock.schedule_once(lambda dt: self._warm_next(charset), 0)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "registered": len(self._registered),
+                "warmed": len(self._warmed),
+                "warm_pending": len(self._warm_queue),
+            }
+
+
+FONT_REGISTRY = FontRegistry()
+
+
+def get_font_registry():
+    return FONT_REGISTRY
@@ -0,0 +1,128 @@
+"""
+Perfil de importação embutido no app (no estilo de `python -X importtime`).
+
+Com SONORIS_IMPORT_PROFILE=1 um finder em sys.meta_path mede o tempo de
+execução de cada módulo importado (próprio e acumulado, por thread) e
+`print_report()` mostra os mais lentos com a profundidade de importação.
+"""
+
+import importlib.abc
+import os
+import sys
+import threading
+import time
+
+# Quantidade de módulos listados no relatório
+REPORT_TOP_N = 25
+
+
+class _TimingLoader(importlib.abc.Loader):
+    """Envolve o loader original só para cronometrar exec_module."""
+
+    def __init__(self, loader, profiler, fullname):
+        self._loader = loader
+        self._profiler = profiler
+        self._fullname = fullname
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter(self._fullname)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._fullname)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # nome -> (self_s, cumulative_s, profundidade, thread)
+        self.records = {}
+        self.order = []
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def find_spec(self, fullname, path, target=None):
+        local = self._local
+        if getattr(local, "finding", False):
+            return None
+        local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            local.finding = False
+        loader = spec.loader
+        if loader is not None and hasattr(loader, "exec_module"):
+            spec.loader = _TimingLoader(loader, self, fullname)
+        return spec
+
+    def _enter(self, fullname):
+        # [nome, início, tempo dos filhos]
+        self._stack().append([fullname, time.perf_counter(), 0.0])
+
+    def _exit(self, fullname):
+        stack = self._stack()
+        name, started, children = stack.pop()
+        cumulative = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += cumulative
+        with self._lock:
+            if name not in self.records:
+                self.order.append(name)
+            self.records[name] = (cumulative - children, cumulative, len(stack), threading.current_thread().name)
+
+    def get_report(self, top_n=REPORT_TOP_N):
+        """Módulos mais lentos (acumulado), em ms: [(nome, próprio, acumulado, profundidade, thread)]."""
+        with self._lock:
+            items = [(name,) + self.records[name] for name in self.order]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return [
+            (name, round(own * 1000.0, 2), round(cum * 1000.0, 2), depth, thread)
+            for name, own, cum, depth, thread in items[:top_n]
+        ]
+
+    def print_report(self, top_n=REPORT_TOP_N):
+        print("[IMPORTS] próprio [ms] | acumulado [ms] | módulo (thread)")
+        for name, own, cum, depth, thread in self.get_report(top_n):
+            print(f"[IMPORTS] {own:>10.2f} | {cum:>14.2f} | {'  ' * depth}{name} ({thread})")
+
+
+_profiler = None
+
+
+def install():
+    """Instala o profiler no início de sys.meta_path (idempotente)."""
+    global _profiler
+    if _profiler is None:
+        _profiler = ImportProfiler()
+        sys.meta_path.insert(0, _profiler)
+    return _profiler
+
+
+def install_from_env():
+    """Instala só se SONORIS_IMPORT_PROFILE=1."""
+    if os.environ.get("SONORIS_IMPORT_PROFILE", "0") == "1":
+        return install()
+    return None
+
+
+def print_report(top_n=REPORT_TOP_N):
+    if _profiler is not None:
+        _profiler.print_report(top_n)
@@ -0,0 +1,80 @@
+"""
+Marcador das conversas ainda abertas (não finalizadas) em disco.
+
+O escritor registra a conversa antes de gravá-la pela primeira vez e a
+remove depois de gravá-la finalizada. No boot, só as conversas que ficaram
+no marcador (as da sessão anterior) precisam ser verificadas e finalizadas,
+sem reler o arquivo todo. Sem marcador (primeira execução ou marcador
+perdido) `load()` retorna None e quem chama faz a varredura completa uma vez.
+
+O marcador só vale depois que uma varredura completa terminou (`ensure()`
+grava "scanned": true). O escritor pode registrar conversas antes disso,
+mas um marcador sem a marca continua contando como ausente: uma queda no
+meio da primeira varredura faz o próximo boot varrer tudo de novo.
+"""
+
+import json
+import os
+import threading
+from typing import Iterable, Optional, Set
+
+from utils.durable_io import atomic_write_json
+
+# Sem extensão .json: não aparece nas listagens de conversas
+MARKER_NAME = ".open_conversations"
+
+
+class OpenConversationsMarker:
+    def __init__(self, directory: str, name: str = MARKER_NAME):
+        self.path = os.path.join(directory, name)
+        self._lock = threading.Lock()
+        self._open: Optional[Set[str]] = None
+        self._scanned = False
+
+    def _ensure_loaded(self) -> None:
+        """Chamado com o lock."""
+        if self._open is not None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            self._open = {str(conv_id) for conv_id in data.get("open", [])}
+            self._scanned = bool(data.get("scanned", False))
+        except (OSError, ValueError, AttributeError):
+            self._open = set()
+            self._scanned = False
+
+    def load(self) -> Optional[Set[str]]:
+        """Conversas abertas registradas, ou None se o marcador não existe, está ilegível ou a varredura não terminou."""
+        with self._lock:
+            self._ensure_loaded()
+            return set(self._open) if self._scanned else None
+
+    def _write(self) -> None:
+        atomic_write_json(self.path, {"open": sorted(self._open), "scanned": self._scanned}, indent=None)
+
+    def add(self, conversation_id: str) -> None:
+        """Registra a conversa (grava só se ela ainda não estava no marcador)."""
+        with self._lock:
+            self._ensure_loaded()
+            if conversation_id in self._open:
+                return
+            self._open.add(conversation_id)
+            self._write()
+
+    def discard(self, conversation_ids: Iterable[str]) -> None:
+        """Remove conversas já finalizadas em disco."""
+        with self._lock:
+            self._ensure_loaded()
+            before = len(self._open)
+            self._open.difference_update(conversation_ids)
+            if len(self._open) != before:
+                self._write()
+
+    def ensure(self) -> None:
+        """Marca a varredura completa como concluída (o próximo boot confia no marcador)."""
+        with self._lock:
+            self._ensure_loaded()
+            if not self._scanned or not os.path.exists(self.path):
+                self._scanned = True
+                self._write()
@@ -0,0 +1,277 @@
+"""
+Cota e retenção da pasta transcripts/.
+
+Sem limite, a pasta cresce por meses e toda varredura fica mais lenta. Uma
+thread de baixa prioridade roda periodicamente:
+
+- compacta conversas finalizadas que ainda estão em JSON (ex.: gravadas com
+  o arquivo desativado ou copiadas para a pasta)
+- com SONORIS_TRANSCRIPTS_MAX_MB e/ou SONORIS_TRANSCRIPTS_MAX_AGE_DAYS,
+  apaga as conversas mais antigas primeiro, mas só as que o celular
+  confirmou por inteiro com ACK (sincronizadas); ler os chunks não basta,
+  e conversas não sincronizadas nunca são apagadas, mesmo acima da cota
+
+O uso atual (bytes, conversas, sincronizadas) fica em memória para o
+DeviceInfo responder pelo BLE sem tocar no disco.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from utils.conversation_archive import ARCHIVE_ENABLED, ARCHIVE_SUFFIX, archive_conversations
+from utils.durable_io import atomic_write_json
+from utils.search_index import get_search_index
+from utils.sync_state import get_sync_cursors
+
+# Cota da pasta em MB (0 desativa)
+RETENTION_MAX_MB = float(os.environ.get("SONORIS_TRANSCRIPTS_MAX_MB", "1024"))
+
+# Idade máxima (dias) das conversas sincronizadas (0 desativa)
+RETENTION_MAX_AGE_DAYS = float(os.environ.get("SONORIS_TRANSCRIPTS_MAX_AGE_DAYS", "0"))
+
+# Intervalo entre passadas do compactador/retenção
+RETENTION_INTERVAL_SEC = float(os.environ.get("SONORIS_RETENTION_INTERVAL_SEC", "600"))
+
+# Espera antes da primeira passada (deixa o boot e a finalização terminarem)
+RETENTION_FIRST_DELAY_SEC = 60.0
+
+RETENTION_NICENESS = 15
+
+SYNCED_MARKER_NAME = ".synced"
+
+
+class SyncedConversations:
+    """Conversas finalizadas que o celular confirmou por inteiro com ACK (persistidas em `.synced`)."""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, SYNCED_MARKER_NAME)
+        self._lock = threading.Lock()
+        self._ids: Optional[Set[str]] = None
+
+    def _ensure_loaded(self):
+        if self._ids is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as handle:
+                    self._ids = set(json.load(handle).get("synced", []))
+            except (OSError, ValueError, AttributeError):
+                self._ids = set()
+
+    def _write(self):
+        atomic_write_json(self.path, {"synced": sorted(self._ids)}, indent=None)
+
+    def snapshot(self) -> Set[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return set(self._ids)
+
+    def add(self, conversation_id: str) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            if conversation_id in self._ids:
+                return
+            self._ids.add(conversation_id)
+            self._write()
+
+    def discard(self, conversation_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            before = len(self._ids)
+            self._ids.difference_update(conversation_ids)
+            if len(self._ids) != before:
+                self._write()
+
+
+_synced_sets: Dict[str, SyncedConversations] = {}
+_synced_sets_lock = threading.Lock()
+
+
+def get_synced_conversations(directory: str) -> SyncedConversations:
+    key = os.path.abspath(directory)
+    with _synced_sets_lock:
+        synced = _synced_sets.get(key)
+        if synced is None:
+            synced = _synced_sets[key] = SyncedConversations(key)
+        return synced
+
+
+def _conversation_id(name: str) -> Optional[str]:
+    if name.startswith("."):
+        return None
+    if name.endswith(ARCHIVE_SUFFIX):
+        return name[: -len(ARCHIVE_SUFFIX)]
+    if name.endswith(".json"):
+        return name[:-5]
+    return None
+
+
+class RetentionManager:
+    """
+    Args:
+        directory: Pasta das conversas
+        exclude_fn: Retorna os ids que não podem ser tocados (conversas abertas)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        exclude_fn: Optional[Callable[[], Optional[Iterable[str]]]] = None,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        interval: float = RETENTION_INTERVAL_SEC,
+    ):
+        self.directory = directory
+        self.exclude_fn = exclude_fn
+        self.max_bytes = int(RETENTION_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self.max_age_days = RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.interval = interval
+        self.synced = get_synced_conversations(directory)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._not_finalized = {}  # caminho -> mtime dos JSON abertos já lidos (não relê)
+        self._usage = {
+            "used_bytes": 0,
+            "max_bytes": self.max_bytes,
+            "conversations": 0,
+            "archived": 0,
+            "synced": 0,
+        }
+        self._stats = {"passes": 0, "evicted": 0, "evicted_bytes": 0, "compacted": 0, "last_pass_ms": 0.0}
+
+    def start(self, first_delay: float = RETENTION_FIRST_DELAY_SEC):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(first_delay,), name="transcript-retention", daemon=True)
+            self._thread.start()
+
+    def request_pass(self):
+        """Antecipa a próxima passada (ex.: depois de uma sincronização)."""
+        self._wakeup.set()
+
+    def _run(self, first_delay):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), RETENTION_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        try:
+            self.run_pass(enforce=False)  # só o uso, para o DeviceInfo já ter números
+        except Exception as exc:
+            print(f"[RETENTION] Erro ao medir uso: {exc}")
+        self._wakeup.wait(first_delay)
+        while True:
+            self._wakeup.clear()
+            try:
+                self.run_pass()
+            except Exception as exc:
+                print(f"[RETENTION] Erro na passada: {exc}")
+            self._wakeup.wait(self.interval)
+
+    def _scan(self):
+        """Uma única listagem: id -> [bytes, mtime, caminhos]."""
+        entries = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                conversation_id = _conversation_id(entry.name)
+                if conversation_id is None or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                record = entries.setdefault(conversation_id, [0, 0.0, []])
+                record[0] += stat.st_size
+                record[1] = max(record[1], stat.st_mtime)
+                record[2].append(entry.path)
+        return entries
+
+    def _compact(self, entries, excluded):
+        """Compacta conversas finalizadas que ainda estão só em JSON."""
+        pending = []
+        seen = {}
+        for conversation_id, (_, mtime, paths) in entries.items():
+            if conversation_id in excluded or len(paths) != 1 or not paths[0].endswith(".json"):
+                continue
+            if self._not_finalized.get(paths[0]) == mtime:
+                seen[paths[0]] = mtime
+                continue
+            try:
+                with open(paths[0], "r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            if data.get("finalized") and data.get("lines"):
+                pending.append(data)
+            else:
+                seen[paths[0]] = mtime
+        self._not_finalized = seen
+        return archive_conversations(self.directory, pending) if pending else 0
+
+    def run_pass(self, enforce: bool = True) -> Dict[str, object]:
+        """Compacta, aplica a cota/idade e atualiza o uso. Com enforce=False só mede."""
+        started = time.perf_counter()
+        if not os.path.isdir(self.directory):
+            return self.get_usage()
+        excluded = set(self.exclude_fn() or ()) if self.exclude_fn else set()
+
+        compacted = 0
+        if enforce and ARCHIVE_ENABLED:
+            compacted = self._compact(self._scan(), excluded)
+        entries = self._scan()
+        synced = self.synced.snapshot()
+        used = sum(record[0] for record in entries.values())
+
+        # Candidatas: sincronizadas e fora das abertas, da mais antiga para a mais nova
+        candidates = sorted(
+            (record[1], conversation_id)
+            for conversation_id, record in entries.items()
+            if enforce and conversation_id in synced and conversation_id not in excluded
+        )
+        age_limit = time.time() - self.max_age_days * 86400 if self.max_age_days > 0 else None
+        evicted = []
+        evicted_bytes = 0
+        for mtime, conversation_id in candidates:
+            over_quota = self.max_bytes > 0 and used > self.max_bytes
+            too_old = age_limit is not None and mtime < age_limit
+            if not over_quota and not too_old:
+                break
+            size, _, paths = entries[conversation_id]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError as exc:
+                    print(f"[RETENTION] Erro ao remover {path}: {exc}")
+            used -= size
+            evicted_bytes += size
+            evicted.append(conversation_id)
+            del entries[conversation_id]
+        if evicted:
+            self.synced.discard(evicted)
+            get_search_index(self.directory).remove(evicted)
+            get_sync_cursors(self.directory).forget(evicted)
+            print(f"[RETENTION] {len(evicted)} conversas sincronizadas removidas ({evicted_bytes} bytes)")
+        if enforce and self.max_bytes > 0 and used > self.max_bytes:
+            print(f"[RETENTION] ⚠️ Acima da cota ({used} de {self.max_bytes} bytes) só com conversas não sincronizadas")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._usage = {
+                "used_bytes": used,
+                "max_bytes": self.max_bytes,
+                "conversations": len(entries),
+                "archived": sum(1 for record in entries.values() if any(p.endswith(ARCHIVE_SUFFIX) for p in record[2])),
+                "synced": sum(1 for conversation_id in entries if conversation_id in synced),
+            }
+            self._stats["passes"] += 1
+            self._stats["evicted"] += len(evicted)
+            self._stats["evicted_bytes"] += evicted_bytes
+            self._stats["compacted"] += compacted
+            self._stats["last_pass_ms"] = elapsed_ms
+        return self.get_usage()
+
+    def get_usage(self) -> Dict[str, object]:
+        """Uso da última passada (só memória)."""
+        with self._lock:
+            return dict(self._usage)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,446 @@
+"""
+Índice invertido para busca de texto nas conversas salvas.
+
+Cada palavra (minúscula e sem acentos: "reunião" e "reuniao" casam) aponta
+para as conversas e os offsets das linhas onde aparece. O escritor das
+transcrições entrega as linhas conforme as grava (`index_lines`, só as
+novas são indexadas); no boot uma thread de baixa prioridade carrega o
+índice salvo e reindexa apenas o que mudou no disco (conversas novas, com
+mais linhas ou apagadas).
+
+O índice é salvo em segmentos, um por conversa
+(`.search_segments/<id>.seg`, JSON com zlib): cada gravação reescreve só
+as conversas que mudaram desde a anterior (em geral a que está em
+andamento), então o custo não cresce com o número de conversas.
+
+A busca casa linhas que contêm todos os termos; o último termo também casa
+por prefixo, para o app buscar enquanto o usuário digita.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.conversation_archive import ARCHIVE_SUFFIX, read_archive, read_archive_header
+from utils.durable_io import TMP_SUFFIX, atomic_write_many, is_own_tmp
+
+SEGMENTS_DIR_NAME = ".search_segments"
+SEGMENT_SUFFIX = ".seg"
+INDEX_VERSION = 2
+
+# Índice antigo (um arquivo só, versão 1): migrado para segmentos no boot
+LEGACY_INDEX_NAME = ".search_index"
+
+# Limites da resposta do SEARCH (o app busca os chunks das linhas retornadas)
+SEARCH_MAX_CONVERSATIONS = 10
+SEARCH_MAX_OFFSETS = 20
+
+# Palavras menores que isso não são indexadas
+MIN_TOKEN_LEN = 2
+
+# Intervalo (s) em que a thread do índice grava alterações pendentes
+INDEX_SAVE_INTERVAL_SEC = 60.0
+
+INDEX_NICENESS = 15
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas e sem acentos/cedilha (NFKD sem as marcas combinantes)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(normalize_text(text)) if len(token) >= MIN_TOKEN_LEN]
+
+
+class SearchIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segments_dir = os.path.join(directory, SEGMENTS_DIR_NAME)
+        self.legacy_path = os.path.join(directory, LEGACY_INDEX_NAME)
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # uma gravação por vez (fora do _lock)
+        self._loaded = False
+        self._ready = False
+        self._wakeup = threading.Event()
+        self._thread = None
+        # conversa -> palavra -> offsets das linhas (crescentes): um segmento por conversa
+        self._segments: Dict[str, Dict[str, List[int]]] = {}
+        # palavra -> conversas onde aparece (para a busca não percorrer os segmentos)
+        self._token_docs: Dict[str, Set[str]] = {}
+        # conversa -> linhas já indexadas
+        self._docs: Dict[str, int] = {}
+        # Alterações ainda não gravadas
+        self._dirty_docs: Set[str] = set()
+        self._removed_docs: Set[str] = set()
+        self._legacy_pending = False
+        self._stats = {
+            "queries": 0,
+            "indexed_lines": 0,
+            "reindexed": 0,
+            "saves": 0,
+            "segments_written": 0,
+            "last_save_ms": 0.0,
+            "last_sync_ms": 0.0,
+        }
+
+    # ------------------------------
+    # Carga e persistência
+    # ------------------------------
+
+    def _segment_path(self, conversation_id: str) -> str:
+        return os.path.join(self.segments_dir, f"{conversation_id}{SEGMENT_SUFFIX}")
+
+    def _put_segment(self, conversation_id: str, lines: int, postings: Dict[str, List[int]]):
+        """Chamado com o lock."""
+        self._segments[conversation_id] = postings
+        self._docs[conversation_id] = lines
+        for token in postings:
+            self._token_docs.setdefault(token, set()).add(conversation_id)
+
+    def _ensure_loaded(self):
+        """Chamado com o lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            names = os.listdir(self.segments_dir)
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(self.segments_dir, name)
+            if name.endswith(TMP_SUFFIX):
+                # Sobra de uma gravação interrompida (as deste processo ainda estão em uso)
+                if not is_own_tmp(name):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                continue
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                with open(path, "rb") as handle:
+                    data = json.loads(zlib.decompress(handle.read()).decode("utf-8"))
+                if data.get("v") == INDEX_VERSION:
+                    self._put_segment(name[: -len(SEGMENT_SUFFIX)], int(data.get("n", 0)), data.get("p", {}))
+            except (OSError, ValueError, zlib.error) as exc:
+                print(f"[SEARCH] Segmento {name} ignorado: {exc}")
+        self._load_legacy()
+
+    def _load_legacy(self):
+        """Chamado com o lock: converte o índice de arquivo único em segmentos."""
+        try:
+            with open(self.legacy_path, "rb") as handle:
+                data = json.loads(zlib.decompress(handle.read()).decode("utf-8"))
+        except OSError:
+            return
+        except (ValueError, zlib.error):
+            data = {}
+        self._legacy_pending = True
+        if data.get("v") != 1:
+            return
+        segments: Dict[str, Dict[str, List[int]]] = {}
+        for token, conversations in data.get("postings", {}).items():
+            for conversation_id, offsets in conversations.items():
+                segments.setdefault(conversation_id, {})[token] = offsets
+        for conversation_id, lines in data.get("docs", {}).items():
+            if conversation_id in self._segments:
+                continue
+            self._put_segment(conversation_id, int(lines), segments.get(conversation_id, {}))
+            self._dirty_docs.add(conversation_id)
+
+    def save(self) -> bool:
+        """Grava os segmentos das conversas alteradas e apaga os das removidas."""
+        with self._io_lock:
+            started = time.perf_counter()
+            with self._lock:
+                if not self._dirty_docs and not self._removed_docs and not self._legacy_pending:
+                    return False
+                # Cópia só dos segmentos alterados; a serialização roda fora do lock
+                snapshot = {
+                    conversation_id: (
+                        self._docs.get(conversation_id, 0),
+                        {token: list(offsets) for token, offsets in self._segments.get(conversation_id, {}).items()},
+                    )
+                    for conversation_id in self._dirty_docs
+                }
+                removed = set(self._removed_docs)
+                legacy = self._legacy_pending
+                self._dirty_docs.clear()
+                self._removed_docs.clear()
+                self._legacy_pending = False
+            try:
+                items = []
+                for conversation_id, (lines, postings) in snapshot.items():
+                    raw = json.dumps(
+                        {"v": INDEX_VERSION, "n": lines, "p": postings},
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    ).encode("utf-8")
+                    items.append((self._segment_path(conversation_id), zlib.compress(raw, 6)))
+                if items:
+                    os.makedirs(self.segments_dir, exist_ok=True)
+                    atomic_write_many(items)
+                for conversation_id in removed:
+                    try:
+                        os.remove(self._segment_path(conversation_id))
+                    except FileNotFoundError:
+                        pass
+                if legacy:
+                    try:
+                        os.remove(self.legacy_path)
+                    except FileNotFoundError:
+                        pass
+            except Exception as exc:
+                with self._lock:
+                    # Volta a marcar o que não foi gravado (o que mudou depois já está marcado)
+                    for conversation_id in snapshot:
+                        if conversation_id in self._segments:
+                            self._dirty_docs.add(conversation_id)
+                    self._removed_docs.update(removed - self._segments.keys())
+                    self._legacy_pending = self._legacy_pending or legacy
+                print(f"[SEARCH] Erro ao salvar índice: {exc}")
+                return False
+            with self._lock:
+                self._stats["saves"] += 1
+                self._stats["segments_written"] += len(snapshot)
+                self._stats["last_save_ms"] = (time.perf_counter() - started) * 1000.0
+            return True
+
+    def start(self):
+        """Sincroniza com o disco em segundo plano e grava periodicamente."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+            self._thread.start()
+
+    def request_save(self):
+        self._wakeup.set()
+
+    def _run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), INDEX_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        try:
+            self.sync_with_disk()
+        except Exception as exc:
+            print(f"[SEARCH] Erro ao sincronizar índice: {exc}")
+        with self._lock:
+            self._ready = True
+        while True:
+            self._wakeup.wait(INDEX_SAVE_INTERVAL_SEC)
+            self._wakeup.clear()
+            self.save()
+
+    # ------------------------------
+    # Atualização
+    # ------------------------------
+
+    def _add_lines(self, conversation_id: str, start: int, lines: Iterable[dict]) -> int:
+        """Chamado com o lock."""
+        segment = self._segments.setdefault(conversation_id, {})
+        count = 0
+        for offset, line in enumerate(lines, start):
+            for token in set(tokenize(line.get("text", ""))):
+                offsets = segment.get(token)
+                if offsets is None:
+                    segment[token] = [offset]
+                    self._token_docs.setdefault(token, set()).add(conversation_id)
+                else:
+                    offsets.append(offset)
+            count += 1
+        if count:
+            self._docs[conversation_id] = start + count
+            self._dirty_docs.add(conversation_id)
+            self._removed_docs.discard(conversation_id)
+            self._stats["indexed_lines"] += count
+        elif not segment:
+            del self._segments[conversation_id]
+        return count
+
+    def _remove(self, conversation_id: str) -> bool:
+        """Chamado com o lock."""
+        if self._docs.pop(conversation_id, None) is None:
+            return False
+        for token in self._segments.pop(conversation_id, {}):
+            conversations = self._token_docs.get(token)
+            if conversations is not None:
+                conversations.discard(conversation_id)
+                if not conversations:
+                    del self._token_docs[token]
+        self._dirty_docs.discard(conversation_id)
+        self._removed_docs.add(conversation_id)
+        return True
+
+    def index_lines(self, conversation_id: str, lines: List[dict]) -> int:
+        """
+        Indexa as linhas ainda não indexadas da conversa (lista completa, como
+        a que o escritor grava).
+
+        Returns:
+            Quantidade de linhas novas indexadas
+        """
+        with self._lock:
+            self._ensure_loaded()
+            start = self._docs.get(conversation_id, 0)
+            if start > len(lines):
+                # A conversa encolheu (não deveria): reindexa do zero
+                self._remove(conversation_id)
+                start = 0
+            return self._add_lines(conversation_id, start, lines[start:])
+
+    def remove(self, conversation_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            for conversation_id in conversation_ids:
+                self._remove(conversation_id)
+
+    def sync_with_disk(self) -> Dict[str, int]:
+        """Reindexa conversas novas/alteradas e remove as que sumiram do disco."""
+        started = time.perf_counter()
+        with self._lock:
+            self._ensure_loaded()
+            indexed = dict(self._docs)
+        on_disk = {}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        # O arquivo compactado tem precedência sobre o JSON da mesma conversa
+        for name in sorted(names, key=lambda n: n.endswith(ARCHIVE_SUFFIX)):
+            if name.startswith("."):
+                continue
+            if name.endswith(ARCHIVE_SUFFIX):
+                on_disk[name[: -len(ARCHIVE_SUFFIX)]] = os.path.join(self.directory, name)
+            elif name.endswith(".json"):
+                on_disk[name[:-5]] = os.path.join(self.directory, name)
+
+        removed = [conversation_id for conversation_id in indexed if conversation_id not in on_disk]
+        reindexed = 0
+        for conversation_id, path in on_disk.items():
+            try:
+                if path.endswith(ARCHIVE_SUFFIX):
+                    if read_archive_header(path).get("total_lines", 0) == indexed.get(conversation_id):
+                        continue
+                    lines = read_archive(path).lines()
+                else:
+                    with open(path, "r", encoding="utf-8") as handle:
+                        lines = json.load(handle).get("lines", [])
+                    if len(lines) == indexed.get(conversation_id):
+                        continue
+            except Exception as exc:
+                print(f"[SEARCH] Erro ao indexar {os.path.basename(path)}: {exc}")
+                continue
+            with self._lock:
+                self._remove(conversation_id)
+                self._add_lines(conversation_id, 0, lines)
+            reindexed += 1
+        with self._lock:
+            for conversation_id in removed:
+                self._remove(conversation_id)
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            self._stats["reindexed"] += reindexed
+            self._stats["last_sync_ms"] = elapsed_ms
+        self.save()
+        print(
+            f"[SEARCH] Índice sincronizado: {len(on_disk)} conversas, {reindexed} reindexadas, "
+            f"{len(removed)} removidas em {elapsed_ms:.1f} ms"
+        )
+        return {"conversations": len(on_disk), "reindexed": reindexed, "removed": len(removed)}
+
+    # ------------------------------
+    # Busca
+    # ------------------------------
+
+    def _offsets_for(self, term: str, prefix: bool) -> Dict[str, Set[int]]:
+        """Chamado com o lock: conversa -> offsets das linhas que contêm o termo."""
+        if prefix:
+            tokens = [token for token in self._token_docs if token.startswith(term)]
+        else:
+            tokens = [term] if term in self._token_docs else []
+        result: Dict[str, Set[int]] = {}
+        for token in tokens:
+            for conversation_id in self._token_docs[token]:
+                result.setdefault(conversation_id, set()).update(self._segments[conversation_id][token])
+        return result
+
+    def search(
+        self,
+        query: str,
+        max_conversations: int = SEARCH_MAX_CONVERSATIONS,
+        max_offsets: int = SEARCH_MAX_OFFSETS,
+    ) -> dict:
+        """
+        Linhas que contêm todos os termos da consulta, conversas mais recentes primeiro.
+
+        Returns:
+            {"query", "results": [{"conversation_id", "lines": [offsets], "matches"}], "truncated", "ready"}
+        """
+        terms = tokenize(query)
+        response = {"query": query, "results": [], "truncated": False}
+        with self._lock:
+            self._ensure_loaded()
+            self._stats["queries"] += 1
+            response["ready"] = self._ready
+            if not terms:
+                return response
+            matches: Optional[Dict[str, Set[int]]] = None
+            for position, term in enumerate(terms):
+                found = self._offsets_for(term, prefix=position == len(terms) - 1)
+                if matches is None:
+                    matches = found
+                else:
+                    matches = {
+                        conversation_id: offsets & found[conversation_id]
+                        for conversation_id, offsets in matches.items()
+                        if conversation_id in found
+                    }
+                matches = {k: v for k, v in matches.items() if v}
+                if not matches:
+                    return response
+
+        # Ids são "Conversa_<data>": ordem decrescente = mais recentes primeiro
+        ordered = sorted(matches, reverse=True)
+        response["truncated"] = len(ordered) > max_conversations
+        for conversation_id in ordered[:max_conversations]:
+            offsets = sorted(matches[conversation_id])
+            if len(offsets) > max_offsets:
+                response["truncated"] = True
+            response["results"].append({
+                "conversation_id": conversation_id,
+                "lines": offsets[:max_offsets],
+                "matches": len(offsets),
+            })
+        return response
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["conversations"] = len(self._docs)
+            stats["tokens"] = len(self._token_docs)
+            stats["pending_segments"] = len(self._dirty_docs)
+            stats["ready"] = self._ready
+            return stats
+
+
+_indexes: Dict[str, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(directory: str) -> SearchIndex:
+    """Um índice por pasta (o app e o BLE usam caminhos diferentes para a mesma pasta)."""
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SearchIndex(key)
+        return index
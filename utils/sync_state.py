@@ -0,0 +1,141 @@
+"""
+Cursores de sincronização por celular.
+
+Para cada celular (identificado pelo device do BlueZ ou pelo id que o app
+envia) e cada conversa, guarda quantas linhas o app já confirmou com ACK.
+O SYNC compara isso com o índice de conversas e devolve só o que falta,
+inclusive linhas novas da conversa ainda em andamento; reconectar custa
+bytes proporcionais ao que é novo.
+
+Cada celular também guarda as conversas que já confirmou por inteiro
+depois de finalizadas: uma conversa confirmada linha a linha enquanto
+estava aberta volta uma vez no SYNC de cada celular com "f": 1.
+
+Os cursores ficam em `transcripts/.sync_cursors` (gravação atômica a cada
+ACK que avança algum cursor).
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from utils.durable_io import atomic_write_json
+
+SYNC_CURSORS_NAME = ".sync_cursors"
+
+# Celulares lembrados (o que ficou mais tempo sem sincronizar é esquecido)
+MAX_PHONES = 8
+
+
+class SyncCursors:
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, SYNC_CURSORS_NAME)
+        self._lock = threading.Lock()
+        # celular -> conversa -> linhas confirmadas (a ordem do dict = uso mais recente)
+        self._cursors: Optional[Dict[str, Dict[str, int]]] = None
+        # celular -> conversas confirmadas por inteiro já finalizadas
+        self._finalized: Dict[str, Set[str]] = {}
+
+    def _ensure_loaded(self):
+        if self._cursors is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+                self._cursors = {
+                    str(phone): {str(k): int(v) for k, v in convs.items()}
+                    for phone, convs in data.get("phones", {}).items()
+                }
+                self._finalized = {
+                    str(phone): {str(conv_id) for conv_id in convs}
+                    for phone, convs in data.get("finalized", {}).items()
+                    if phone in self._cursors
+                }
+            except (OSError, ValueError, AttributeError, TypeError):
+                self._cursors = {}
+                self._finalized = {}
+
+    def _write(self):
+        atomic_write_json(
+            self.path,
+            {
+                "phones": self._cursors,
+                "finalized": {phone: sorted(convs) for phone, convs in self._finalized.items() if convs},
+            },
+            indent=None,
+        )
+
+    def get(self, phone: str) -> Dict[str, int]:
+        """Linhas confirmadas por conversa para o celular."""
+        return self.get_state(phone)[0]
+
+    def get_state(self, phone: str) -> Tuple[Dict[str, int], Set[str]]:
+        """Linhas confirmadas por conversa e conversas finalizadas já confirmadas por inteiro."""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._cursors.get(phone, {})), set(self._finalized.get(phone, ()))
+
+    def ack(self, phone: str, conversation_id: str, lines: int, finalized_lines: Optional[int] = None) -> int:
+        """
+        Registra que o celular tem as linhas [0, lines) da conversa.
+        O cursor só avança (ACKs atrasados ou repetidos são ignorados).
+
+        Args:
+            finalized_lines: Total de linhas se a conversa está finalizada; com o
+                cursor nesse total ela conta como vista finalizada pelo celular
+
+        Returns:
+            Cursor atual da conversa para o celular
+        """
+        with self._lock:
+            self._ensure_loaded()
+            convs = self._cursors.pop(phone, {})
+            self._cursors[phone] = convs  # reinsere no fim: uso mais recente
+            current = convs.get(conversation_id, 0)
+            changed = False
+            if lines > current:
+                convs[conversation_id] = lines
+                current = lines
+                changed = True
+            done = self._finalized.setdefault(phone, set())
+            if finalized_lines is not None and current >= finalized_lines and conversation_id not in done:
+                done.add(conversation_id)
+                changed = True
+            if changed:
+                while len(self._cursors) > MAX_PHONES:
+                    forgotten = next(iter(self._cursors))
+                    del self._cursors[forgotten]
+                    self._finalized.pop(forgotten, None)
+                    print(f"[SYNC] Cursores do celular {forgotten} descartados")
+                self._write()
+            return current
+
+    def forget(self, conversation_ids: Iterable[str]) -> None:
+        """Conversas apagadas do dispositivo saem dos cursores de todos os celulares."""
+        ids = set(conversation_ids)
+        with self._lock:
+            self._ensure_loaded()
+            changed = False
+            for convs in self._cursors.values():
+                for conversation_id in ids & convs.keys():
+                    del convs[conversation_id]
+                    changed = True
+            for done in self._finalized.values():
+                if ids & done:
+                    done.difference_update(ids)
+                    changed = True
+            if changed:
+                self._write()
+
+
+_cursors: Dict[str, SyncCursors] = {}
+_cursors_lock = threading.Lock()
+
+
+def get_sync_cursors(directory: str) -> SyncCursors:
+    key = os.path.abspath(directory)
+    with _cursors_lock:
+        cursors = _cursors.get(key)
+        if cursors is None:
+            cursors = _cursors[key] = SyncCursors(key)
+        return cursors
@@ -0,0 +1,160 @@
+"""
+Escritor incremental das conversas em disco.
+
+A UI entrega só as linhas novas de cada conversa (a partir da marca de
+linhas já entregues); o escritor mantém a lista completa na própria thread
+e grava o arquivo. Pedidos que chegam enquanto uma gravação está em
+andamento são juntados em um só por conversa, então a fila nunca cresce
+além de uma entrada por conversa. Se o disco não acompanhar, `is_behind()`
+avisa a UI para espaçar os flushes.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Linhas aguardando gravação a partir das quais o escritor é considerado atrasado
+WRITER_BEHIND_LINES = 200
+
+# Atraso (s) entre o pedido mais antigo pendente e agora que também indica atraso
+WRITER_BEHIND_SECONDS = 5.0
+
+
+class _PendingConversation:
+    __slots__ = ("created_at", "new_lines", "finalized", "requested_at", "requests")
+
+    def __init__(self, created_at, requested_at):
+        self.created_at = created_at
+        self.new_lines: List[dict] = []
+        self.finalized = False
+        self.requested_at = requested_at
+        self.requests = 0
+
+
+class TranscriptWriter:
+    """
+    Thread única de gravação.
+
+    Args:
+        persist_fn: persist_fn(conversation_id, created_at, lines, finalized)
+    """
+
+    def __init__(self, persist_fn: Callable[[str, str, List[dict], bool], None], name: str = "transcript-writer"):
+        self.persist_fn = persist_fn
+        self._cond = threading.Condition()
+        self._pending: Dict[str, _PendingConversation] = {}
+        self._order: List[str] = []
+        self._lines: Dict[str, List[dict]] = {}
+        self._busy = False
+        self._pending_lines = 0
+        self._behind = False
+        self._stats = {
+            "requests": 0,
+            "collapsed": 0,
+            "writes": 0,
+            "lines_written": 0,
+            "write_errors": 0,
+            "behind_events": 0,
+            "last_write_ms": 0.0,
+            "max_write_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def append(self, conversation_id: str, created_at: str, new_lines: List[dict], finalized: bool = False) -> bool:
+        """
+        Entrega linhas novas (e/ou a flag de finalizada) de uma conversa.
+
+        Returns:
+            True se o escritor está em dia; False se está atrasado (a UI deve espaçar os flushes)
+        """
+        if not conversation_id or (not new_lines and not finalized):
+            return not self._behind
+        now = time.monotonic()
+        with self._cond:
+            self._stats["requests"] += 1
+            pending = self._pending.get(conversation_id)
+            if pending is None:
+                pending = _PendingConversation(created_at, now)
+                self._pending[conversation_id] = pending
+                self._order.append(conversation_id)
+            else:
+                self._stats["collapsed"] += 1
+            pending.requests += 1
+            pending.new_lines.extend(new_lines)
+            pending.finalized = pending.finalized or finalized
+            self._pending_lines += len(new_lines)
+            self._update_behind(now)
+            self._cond.notify()
+            return not self._behind
+
+    def _update_behind(self, now):
+        oldest = min((p.requested_at for p in self._pending.values()), default=now)
+        behind = self._pending_lines >= WRITER_BEHIND_LINES or (now - oldest) >= WRITER_BEHIND_SECONDS
+        if behind and not self._behind:
+            self._stats["behind_events"] += 1
+            print(f"[TRANSCRIPTS] Escritor atrasado: {self._pending_lines} linhas pendentes")
+        self._behind = behind
+
+    def is_behind(self) -> bool:
+        with self._cond:
+            return self._behind
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._order:
+                    self._cond.wait()
+                conversation_id = self._order.pop(0)
+                pending = self._pending.pop(conversation_id)
+                self._pending_lines -= len(pending.new_lines)
+                self._busy = True
+                lines = self._lines.setdefault(conversation_id, [])
+                lines.extend(pending.new_lines)
+
+            started = time.monotonic()
+            try:
+                # A lista só é alterada nesta thread: grava sem copiar
+                self.persist_fn(conversation_id, pending.created_at, lines, pending.finalized)
+                ok = True
+            except Exception as exc:
+                print(f"[TRANSCRIPTS] Erro no escritor ({conversation_id}): {exc}")
+                ok = False
+            finished = time.monotonic()
+
+            with self._cond:
+                self._busy = False
+                write_ms = (finished - started) * 1000.0
+                self._stats["writes"] += 1
+                self._stats["last_write_ms"] = write_ms
+                self._stats["max_write_ms"] = max(self._stats["max_write_ms"], write_ms)
+                self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], (finished - pending.requested_at) * 1000.0)
+                if ok:
+                    self._stats["lines_written"] += len(pending.new_lines)
+                else:
+                    self._stats["write_errors"] += 1
+                if ok and pending.finalized:
+                    # Conversa encerrada: não precisa mais das linhas em memória
+                    self._lines.pop(conversation_id, None)
+                self._update_behind(finished)
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera até tudo que foi entregue estar gravado (ex.: ao encerrar o app)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._order or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending_conversations"] = len(self._order)
+            stats["pending_lines"] = self._pending_lines
+            stats["behind"] = self._behind
+            return stats
@@ -5,3 +5,5 @@ from .transcript_history import (
     PARTIAL_RESET_MS,
     TranscriptHistory
 )
+
+from .cached_label import CachedLabel, get_texture_cache
@@ -0,0 +1,223 @@
+"""
+Label com cache de texturas.
+
+O texto é rasterizado pelo provider de texto do Kivy (CoreLabel) sempre em
+branco e tingido por uma instrução Color, então a mesma textura serve para
+qualquer cor. As texturas ficam num cache LRU limitado em bytes e são
+reaproveitadas por linhas iguais, pelo parcial e ao voltar a um estilo já
+usado.
+"""
+
+import os
+from collections import OrderedDict
+
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Rectangle
+from kivy.properties import (
+    ListProperty,
+    NumericProperty,
+    ObjectProperty,
+    OptionProperty,
+    StringProperty,
+)
+from kivy.uix.widget import Widget
+
+# Orçamento de memória de textura (RGBA) do cache; a GPU do Pi é compartilhada
+TEXTURE_CACHE_MAX_BYTES = int(os.environ.get("SONORIS_TEXTURE_CACHE_MB", "16")) * 1024 * 1024
+
+# Pré-renderização: espera o texto ficar estável e renderiza poucos por frame
+PRERENDER_DELAY_SEC = 0.15
+PRERENDER_PER_FRAME = 2
+
+
+class TextTextureCache:
+    """
+    Cache LRU de texturas de texto.
+    Chave: (texto, fonte, tamanho, line_height, largura de quebra, alinhamento).
+    Só deve ser usado na thread principal (criação de textura exige o contexto GL).
+    """
+
+    def __init__(self, max_bytes: int = TEXTURE_CACHE_MAX_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._prerender_pending = OrderedDict()
+        self._prerender_event = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "prerendered": 0,
+        }
+
+    @staticmethod
+    def make_key(text, font_name, font_size, line_height, width, halign="left"):
+        return (text, font_name, float(font_size), float(line_height), int(max(1, width)), halign)
+
+    def get(self, text, font_name, font_size, line_height, width, halign="left"):
+        """Retorna a textura do texto (renderiza e guarda se não estiver no cache)."""
+        if not text:
+            return None
+        key = self.make_key(text, font_name, font_size, line_height, width, halign)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+        self._stats["misses"] += 1
+        return self._render_and_store(key)
+
+    def prerender(self, text, font_name, font_size, line_height, width, halign="left", slot=None):
+        """
+        Agenda a renderização de um texto provável (ex.: o parcial que vai virar
+        linha do histórico) para quando o texto parar de mudar.
+        Pedidos com o mesmo `slot` substituem o anterior.
+        """
+        if not text or self.max_bytes <= 0:
+            return
+        key = self.make_key(text, font_name, font_size, line_height, width, halign)
+        if key in self._entries:
+            return
+        self._prerender_pending[slot if slot is not None else key] = key
+        if self._prerender_event is not None:
+            self._prerender_event.cancel()
+        self._prerender_event = Clock.schedule_once(self._run_prerender, PRERENDER_DELAY_SEC)
+
+    def _run_prerender(self, _dt):
+        self._prerender_event = None
+        for _ in range(min(PRERENDER_PER_FRAME, len(self._prerender_pending))):
+            _, key = self._prerender_pending.popitem(last=False)
+            if key not in self._entries and self._render_and_store(key) is not None:
+                self._stats["prerendered"] += 1
+        if self._prerender_pending:
+            self._prerender_event = Clock.schedule_once(self._run_prerender, 0)
+
+    def _render_and_store(self, key):
+        text, font_name, font_size, line_height, width, halign = key
+        try:
+            core = CoreLabel(
+                text=text,
+                font_name=font_name,
+                font_size=font_size,
+                line_height=line_height,
+                text_size=(width, None),
+                halign=halign,
+                valign="top",
+            )
+            core.refresh()
+            texture = core.texture
+        except Exception as exc:
+            print(f"[TEXTURE_CACHE] Erro ao renderizar texto: {exc}")
+            return None
+        if texture is None:
+            return None
+        nbytes = int(texture.width * texture.height * 4)
+        if nbytes > self.max_bytes:
+            # Maior que o cache inteiro: usa sem guardar
+            return texture
+        self._entries[key] = (texture, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, old_bytes) = self._entries.popitem(last=False)
+            self._bytes -= old_bytes
+            self._stats["evictions"] += 1
+        return texture
+
+    def clear(self):
+        self._entries.clear()
+        self._prerender_pending.clear()
+        self._bytes = 0
+
+    def get_stats(self):
+        lookups = self._stats["hits"] + self._stats["misses"]
+        stats = dict(self._stats)
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        stats["hit_rate"] = (self._stats["hits"] / lookups) if lookups else 0.0
+        return stats
+
+
+TEXTURE_CACHE = TextTextureCache()
+
+
+def get_texture_cache() -> TextTextureCache:
+    return TEXTURE_CACHE
+
+
+class CachedLabel(Widget):
+    """
+    Substituto leve de Label para texto que quebra linha na largura do widget.
+    Mantém a interface usada no app (text, font_*, color, line_height,
+    halign, text_size, texture_size), mas pega a textura do TEXTURE_CACHE.
+    """
+
+    text = StringProperty("")
+    font_name = StringProperty("Roboto")
+    font_size = NumericProperty(15)
+    line_height = NumericProperty(1.0)
+    color = ListProperty([1, 1, 1, 1])
+    halign = OptionProperty("left", options=["left", "center", "right", "justify"])
+    valign = OptionProperty("top", options=["top", "middle", "bottom", "center"])
+    text_size = ListProperty([None, None])
+    texture = ObjectProperty(None, allownone=True)
+    texture_size = ListProperty([0, 0])
+
+    def __init__(self, **kwargs):
+        self._texture_trigger = Clock.create_trigger(self._refresh_texture, -1)
+        super().__init__(**kwargs)
+        with self.canvas:
+            self._color = Color(*self.color)
+            self._rect = Rectangle(pos=self.pos, size=(0, 0))
+        self.bind(
+            text=self._texture_trigger,
+            font_name=self._texture_trigger,
+            font_size=self._texture_trigger,
+            line_height=self._texture_trigger,
+            halign=self._texture_trigger,
+            text_size=self._texture_trigger,
+            width=self._on_width,
+            pos=self._update_rect,
+            size=self._update_rect,
+            color=self._update_color,
+        )
+        self._texture_trigger()
+
+    def _wrap_width(self):
+        width = self.text_size[0] if self.text_size and self.text_size[0] else self.width
+        return max(1, int(width))
+
+    def _on_width(self, *_args):
+        # Sem text_size explícito a quebra acompanha a largura do widget
+        if not (self.text_size and self.text_size[0]):
+            self._texture_trigger()
+        self._update_rect()
+
+    def _refresh_texture(self, *_args):
+        texture = TEXTURE_CACHE.get(
+            self.text,
+            self.font_name,
+            self.font_size,
+            self.line_height,
+            self._wrap_width(),
+            self.halign,
+        )
+        self.texture = texture
+        self._rect.texture = texture
+        self.texture_size = list(texture.size) if texture is not None else [0, 0]
+        self._update_rect()
+
+    def _update_rect(self, *_args):
+        tw, th = self.texture_size
+        if self.halign == "center":
+            x = self.x + (self.width - tw) / 2.0
+        elif self.halign == "right":
+            x = self.right - tw
+        else:
+            x = self.x
+        self._rect.pos = (x, self.top - th)
+        self._rect.size = (tw, th)
+
+    def _update_color(self, _inst, value):
+        self._color.rgba = value
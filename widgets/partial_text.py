@@ -0,0 +1,133 @@
+"""
+Texto parcial renderizado por linha.
+
+O parcial cresce palavra a palavra e é o maior texto da tela. Em vez de
+rasterizar o bloco inteiro a cada atualização, o texto é quebrado em linhas
+(medindo palavras com o provider de texto) e cada linha tem sua própria
+textura: as linhas que não mudaram mantêm a textura e só a última (volátil)
+é renderizada de novo.
+"""
+
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.properties import ListProperty, NumericProperty, OptionProperty, StringProperty
+from kivy.uix.boxlayout import BoxLayout
+
+from widgets.cached_label import CachedLabel
+
+# Limite do cache de larguras de palavras (por estilo)
+WORD_WIDTH_CACHE_MAX = 4000
+
+
+class PartialTextView(BoxLayout):
+    """
+    Substitui a Label do parcial mantendo `.text` e as propriedades de estilo.
+    A altura acompanha o número de linhas; `text_padding_x` é a margem lateral.
+    """
+
+    text = StringProperty("")
+    font_name = StringProperty("Roboto")
+    font_size = NumericProperty(15)
+    line_height = NumericProperty(1.0)
+    color = ListProperty([1, 1, 1, 1])
+    halign = OptionProperty("center", options=["left", "center", "right"])
+    text_padding_x = NumericProperty(20)
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("orientation", "vertical")
+        kwargs.setdefault("size_hint_y", None)
+        self._relayout_trigger = Clock.create_trigger(self._relayout, -1)
+        super().__init__(**kwargs)
+        self._lines = []
+        self._line_texts = []
+        self._measure_label = None
+        self._word_widths = {}
+        self.bind(
+            text=self._relayout_trigger,
+            width=self._relayout_trigger,
+            text_padding_x=self._relayout_trigger,
+            font_name=self._on_style,
+            font_size=self._on_style,
+            line_height=self._on_style,
+            halign=self._on_style,
+            color=self._on_color,
+            minimum_height=self.setter("height"),
+        )
+        self._relayout_trigger()
+
+    def _on_style(self, *_args):
+        self._measure_label = None
+        self._word_widths = {}
+        for line in self._lines:
+            self._apply_style(line)
+        self._relayout_trigger()
+
+    def _on_color(self, _inst, value):
+        for line in self._lines:
+            line.color = value
+
+    def _apply_style(self, line):
+        line.font_name = self.font_name
+        line.font_size = self.font_size
+        line.line_height = self.line_height
+        line.halign = self.halign
+        line.color = self.color
+
+    def _word_width(self, word):
+        width = self._word_widths.get(word)
+        if width is None:
+            if self._measure_label is None:
+                self._measure_label = CoreLabel(font_name=self.font_name, font_size=self.font_size)
+            width = self._measure_label.get_extents(word)[0]
+            if len(self._word_widths) >= WORD_WIDTH_CACHE_MAX:
+                self._word_widths.clear()
+            self._word_widths[word] = width
+        return width
+
+    def _wrap(self, text, max_width):
+        """Quebra gulosa por palavras (mesma regra do Label com text_size)."""
+        lines = []
+        current = []
+        current_width = 0
+        space = self._word_width(" ")
+        for word in text.split():
+            word_width = self._word_width(word)
+            if current and current_width + space + word_width > max_width:
+                lines.append(" ".join(current))
+                current = [word]
+                current_width = word_width
+            else:
+                current_width += (space if current else 0) + word_width
+                current.append(word)
+        if current:
+            lines.append(" ".join(current))
+        return lines
+
+    def _relayout(self, *_args):
+        pad = self.text_padding_x
+        if list(self.padding) != [pad, 0, pad, 0]:
+            self.padding = [pad, 0, pad, 0]
+        max_width = max(1, self.width - 2 * pad)
+        line_texts = self._wrap(self.text or "", max_width)
+
+        # Ajusta a quantidade de linhas reaproveitando os widgets existentes
+        while len(self._lines) < len(line_texts):
+            line = CachedLabel(size_hint_y=None)
+            self._apply_style(line)
+            line.bind(texture_size=self._on_line_texture_size)
+            self._lines.append(line)
+            self.add_widget(line)
+        while len(self._lines) > len(line_texts):
+            self.remove_widget(self._lines.pop())
+
+        for line, line_text in zip(self._lines, line_texts):
+            line.text_size = (max_width, None)
+            # StringProperty só dispara se mudou: linhas iguais não re-renderizam
+            line.text = line_text
+        self._line_texts = line_texts
+
+    def _on_line_texture_size(self, inst, tex_size):
+        inst.height = tex_size[1]
+
+    def get_line_count(self):
+        return len(self._line_texts)
@@ -3,22 +3,33 @@
 import datetime
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 from typing import List, Optional
 
 from kivy.clock import Clock
-from kivy.uix.gridlayout import GridLayout
-from kivy.uix.label import Label
+from kivy.metrics import dp
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 
 from utils.device_info import DeviceInfo
-from env import TEXT_COLOR, FONT_SIZE_HISTORY, LINE_HEIGHT, FONT_NAME
+from utils.conversation_archive import ARCHIVE_ENABLED, ARCHIVE_SUFFIX, archive_conversations, read_archive
+from utils.durable_io import atomic_write_json, atomic_write_many, dumps_json, recover_json_dir
+from utils.open_conversations import OpenConversationsMarker
+from utils.retention import RetentionManager
+from utils.search_index import get_search_index
+from utils.transcript_writer import TranscriptWriter
+from widgets.cached_label import CachedLabel, get_texture_cache
 
 BASE_DIR = os.path.dirname(__file__)
 
 # Configurações exportadas (utilizadas por outros módulos)
 MAX_PARTIAL_CHARS = 120
 PARTIAL_UPDATE_MIN_MS = 80
-HISTORY_MAX_LINES = 200
+HISTORY_MAX_LINES = 200  # linhas mantidas na tela (o arquivo da conversa guarda todas)
+HISTORY_TRIM_SLACK = 50  # remove as linhas antigas em lotes para evitar relayout a cada final
+HISTORY_PADDING = 10
 PARTIAL_RESET_MS = 3000
 MAX_LINE_CHARS = 40
 
@@ -26,7 +37,9 @@ TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "..", "transcripts")
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
 
 FLUSH_DEBOUNCE_SEC = 0.6
-TRANSCRIPT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+FLUSH_DEBOUNCE_BEHIND_SEC = 3.0  # intervalo usado enquanto o escritor está atrasado
+# Niceness da thread de finalização do boot (Linux: afeta só a thread)
+FINALIZER_NICENESS = 10
 DEBUG_TRANSCRIPTS = bool(int(os.environ.get("SONORIS_DEBUG_TRANSCRIPTS", "0")))
 
 
@@ -51,41 +64,133 @@ def _persist_conversation(
             "lines": lines,
         }
         conversation_file = os.path.join(TRANSCRIPTS_DIR, f"{conversation_id}.json")
-        with open(conversation_file, "w", encoding="utf-8") as handle:
-            json.dump(payload, handle, ensure_ascii=False, indent=2)
+        if not finalized:
+            # Registra antes da primeira gravação: no próximo boot só ela é verificada
+            OPEN_CONVERSATIONS.add(conversation_id)
+        if finalized and ARCHIVE_ENABLED:
+            # Conversa encerrada não muda mais: vai direto para o arquivo compactado
+            archive_conversations(TRANSCRIPTS_DIR, [payload])
+        else:
+            atomic_write_json(conversation_file, payload)
+        if finalized:
+            OPEN_CONVERSATIONS.discard([conversation_id])
+        # Só as linhas ainda não indexadas entram no índice
+        SEARCH_INDEX.index_lines(conversation_id, lines)
+        if finalized:
+            SEARCH_INDEX.request_save()
         if DEBUG_TRANSCRIPTS:
             print(f"[TRANSCRIPTS] Persisted {conversation_id} ({len(lines)} linhas)")
     except Exception as exc:
         print(f"[TRANSCRIPTS] Erro ao salvar {conversation_id}: {exc}")
 
 
-class TranscriptHistory(GridLayout):
-    """Widget que exibe e persiste o histórico de transcrições."""
+OPEN_CONVERSATIONS = OpenConversationsMarker(TRANSCRIPTS_DIR)
+SEARCH_INDEX = get_search_index(TRANSCRIPTS_DIR)
+TRANSCRIPT_WRITER = TranscriptWriter(_persist_conversation)
+RETENTION = RetentionManager(TRANSCRIPTS_DIR, exclude_fn=OPEN_CONVERSATIONS.load)
+
+
+def encode_word_timings(timing) -> str:
+    """
+    Tempos das palavras da linha, na ordem do texto, como "início,duração,conf"
+    separados por ";": início em ms a partir do timestamp da linha, duração
+    em ms e confiança em % (0-100). Uma string curta em vez de uma lista
+    mantém o JSON indentado da conversa aberta em uma linha por frase.
+    """
+    return ";".join(
+        f"{int(round((start - timing.start) * 1000))},"
+        f"{max(0, int(round((end - start) * 1000)))},"
+        f"{max(0, min(100, int(round(conf * 100))))}"
+        for start, end, conf in timing.words
+    )
+
+
+def _current_line_style() -> dict:
+    """Estilo atual das linhas do histórico (lido do env, que muda via SETTINGS)."""
+    import env as env_module
+
+    return {
+        "font_size": env_module.FONT_SIZE_HISTORY,
+        "font_name": env_module.FONT_NAME,
+        "color": env_module.TEXT_COLOR,
+        "line_height": env_module.LINE_HEIGHT,
+    }
+
+
+class HistoryLine(RecycleDataViewBehavior, CachedLabel):
+    """
+    Linha reciclada do histórico.
+    Só existem instâncias para as linhas visíveis; ao rolar, a mesma linha
+    recebe o texto de outra em refresh_view_attrs e a textura vem do cache.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("size_hint_y", None)
+        kwargs.setdefault("halign", "left")
+        super().__init__(**kwargs)
+        self.bind(texture_size=self._on_texture_size)
+
+    def refresh_view_attrs(self, rv, index, data):
+        # Estilo é compartilhado por todas as linhas e fica no RecycleView, não em cada item
+        for key, value in rv.line_style.items():
+            if getattr(self, key) != value:
+                setattr(self, key, value)
+        return super().refresh_view_attrs(rv, index, data)
+
+    def _on_texture_size(self, inst, tex_size):
+        # O RecycleBoxLayout percebe a mudança de altura e reposiciona as linhas
+        inst.height = tex_size[1]
 
-    def __init__(self, ble_service_ref=None, **kwargs):
-        kwargs.setdefault("padding", 10)
+
+class TranscriptHistory(RecycleView):
+    """Widget que exibe (virtualizado) e persiste o histórico de transcrições."""
+
+    def __init__(self, ble_service_ref=None, line_style: Optional[dict] = None, **kwargs):
         super().__init__(**kwargs)
-        self.cols = 1
-        self.size_hint_y = None
-        self.spacing = 10
-        self.bind(minimum_height=self.setter("height"))
-        self.lines: List[Label] = []
+        self.do_scroll_x = False
+        self.do_scroll_y = True
+        self.viewclass = HistoryLine
+        self.line_style = dict(line_style) if line_style is not None else _current_line_style()
+
+        layout = RecycleBoxLayout(
+            orientation="vertical",
+            default_size=(None, dp(40)),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            padding=HISTORY_PADDING,
+            spacing=10,
+        )
+        layout.bind(minimum_height=layout.setter("height"))
+        self.add_widget(layout)
+        self._scroll_event = None
 
         self.ble_service_ref = ble_service_ref
         self.device_info = DeviceInfo()
+        self.device_info.set_storage_stats_provider(RETENTION.get_usage)
 
         self.is_private_mode = False
         self.saved_lines: List[dict] = []
+        self._handed_off = 0  # linhas de saved_lines já entregues ao escritor
         self.conversation_id: Optional[str] = None
         self._conversation_created_at: Optional[str] = None
         self.conversation_finalized = False
         self._flush_event = None
 
+        # Lido antes da nova conversa ser registrada: são as abertas da sessão anterior
+        previous_open = OPEN_CONVERSATIONS.load()
         self._begin_new_conversation()
-        TRANSCRIPT_EXECUTOR.submit(self._finalize_old_conversations)
+        threading.Thread(
+            target=self._finalize_old_conversations,
+            args=(previous_open, self.conversation_id),
+            name="transcript-finalizer",
+            daemon=True,
+        ).start()
+        RETENTION.start()
+        SEARCH_INDEX.start()
 
     def _begin_new_conversation(self):
         self.saved_lines = []
+        self._handed_off = 0
         self.conversation_finalized = False
         self.conversation_id = self._generate_conversation_id()
         self._conversation_created_at = datetime.datetime.now().isoformat()
@@ -96,27 +201,73 @@ class TranscriptHistory(GridLayout):
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         return f"Conversa_{timestamp}"
 
-    def _finalize_old_conversations(self) -> None:
+    def _finalize_old_conversations(self, previous_open: Optional[set], current_id: Optional[str]) -> None:
+        """
+        Finaliza as conversas que ficaram abertas na sessão anterior.
+
+        Com o marcador, só esses arquivos são lidos; sem ele (primeira
+        execução ou varredura anterior interrompida), varre a pasta inteira
+        e só no fim marca o marcador como válido.
+        """
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), FINALIZER_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        started = time.perf_counter()
+        scanned = 0
+        finalized_ids = []
         try:
             if not os.path.exists(TRANSCRIPTS_DIR):
                 return
-            for file in os.listdir(TRANSCRIPTS_DIR):
-                if not file.endswith(".json"):
-                    continue
+            full_scan = previous_open is None
+            if full_scan:
+                names = [file for file in os.listdir(TRANSCRIPTS_DIR) if file.endswith(".json")]
+            else:
+                names = [f"{conv_id}.json" for conv_id in previous_open]
+            names = [file for file in names if file != f"{current_id}.json"]
+
+            # Antes de ler: resolve temporários e arquivos truncados por queda de energia
+            report = recover_json_dir(TRANSCRIPTS_DIR, only=None if full_scan else names)
+            if any(report.values()):
+                print(f"[TRANSCRIPTS] Recuperação após queda: {report}")
+            to_finalize = []
+            to_archive = []
+            for file in names:
                 path = os.path.join(TRANSCRIPTS_DIR, file)
+                if not os.path.exists(path):
+                    finalized_ids.append(file[:-5])  # apagada pelo app: só sai do marcador
+                    continue
+                scanned += 1
                 try:
                     with open(path, "r", encoding="utf-8") as handle:
                         data = json.load(handle)
                     lines = data.get("lines", [])
                     if not lines:
                         os.remove(path)
+                        finalized_ids.append(file[:-5])
                         continue
                     if not data.get("finalized"):
                         data["finalized"] = True
-                        with open(path, "w", encoding="utf-8") as handle:
-                            json.dump(data, handle, ensure_ascii=False, indent=2)
+                        to_finalize.append((path, dumps_json(data)))
+                    to_archive.append(data)
+                    finalized_ids.append(file[:-5])
                 except Exception as exc:
                     print(f"[TRANSCRIPTS] Erro ao finalizar {file}: {exc}")
+            archived = 0
+            if ARCHIVE_ENABLED and to_archive:
+                # Inclui as já finalizadas em JSON (migração na varredura completa)
+                archived = archive_conversations(TRANSCRIPTS_DIR, to_archive)
+            elif to_finalize:
+                # Group commit: um fsync da pasta para todas as conversas
+                atomic_write_many(to_finalize)
+            OPEN_CONVERSATIONS.discard(finalized_ids)
+            if full_scan:
+                OPEN_CONVERSATIONS.ensure()
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            print(
+                f"[TRANSCRIPTS] Finalização do boot ({'varredura completa' if full_scan else 'marcador'}): "
+                f"{scanned} arquivos lidos, {len(to_finalize)} finalizados, {archived} compactados em {elapsed_ms:.1f} ms"
+            )
         except Exception as exc:
             print(f"[TRANSCRIPTS] Erro geral ao finalizar conversas: {exc}")
 
@@ -124,6 +275,7 @@ class TranscriptHistory(GridLayout):
         if not self.is_private_mode and self.saved_lines:
             self._flush_conversation_async(finalized=True)
         self._begin_new_conversation()
+        self.device_info.checkpoint()
 
     def set_private_mode(self, is_private: bool):
         self.is_private_mode = is_private
@@ -134,50 +286,68 @@ class TranscriptHistory(GridLayout):
                 pass
             self._flush_event = None
 
-    def add_line(self, text):
-        import env as env_module
-
-        lbl = Label(
-            text=text,
-            size_hint_y=None,
-            halign="left",
-            valign="middle",
-            text_size=(self.width, None),
-            font_size=env_module.FONT_SIZE_HISTORY,
-            color=env_module.TEXT_COLOR,
-            font_name=env_module.FONT_NAME,
-            line_height=env_module.LINE_HEIGHT,
-        )
-
-        def _on_width(inst, width_val):
-            inst.text_size = (width_val, None)
-
-        def _on_texture_size(inst, tex_size):
-            try:
-                inst.height = tex_size[1]
-            except Exception:
-                pass
-
-        lbl.bind(width=_on_width, texture_size=_on_texture_size)
-        self.add_widget(lbl)
-        Clock.schedule_once(lambda dt: _on_texture_size(lbl, lbl.texture_size), 0)
-        self.lines.append(lbl)
+    def add_line(self, text, timing=None):
+        """
+        Args:
+            text: Texto da linha
+            timing: FinalTiming do transcriber (tempos de captura das palavras), se houver
+        """
+        self.data.append({"text": text})
+        if len(self.data) > HISTORY_MAX_LINES + HISTORY_TRIM_SLACK:
+            del self.data[: len(self.data) - HISTORY_MAX_LINES]
 
         if self.is_private_mode:
             return
 
-        timestamp = datetime.datetime.now().isoformat()
-        self.saved_lines.append({"text": text, "timestamp": timestamp})
+        if timing is not None and len(timing.words) == len(text.split()):
+            # Hora em que a fala foi captada, não a hora em que a UI mostrou a linha
+            line = {
+                "text": text,
+                "timestamp": datetime.datetime.fromtimestamp(timing.start).isoformat(),
+                "w": encode_word_timings(timing),
+            }
+        else:
+            line = {"text": text, "timestamp": datetime.datetime.now().isoformat()}
+        self.saved_lines.append(line)
         self._schedule_flush()
 
+    def scroll_to_end(self):
+        """Rola para a última linha depois que o layout incorporar as linhas novas."""
+        if self._scroll_event is None:
+            self._scroll_event = Clock.schedule_once(self._do_scroll_to_end, 0)
+
+    def _do_scroll_to_end(self, _dt):
+        self._scroll_event = None
+        self.scroll_y = 0
+
+    def prerender_line(self, text):
+        """Renderiza antecipadamente (em frame ocioso) uma linha que deve chegar em breve."""
+        style = self.line_style
+        get_texture_cache().prerender(
+            text,
+            style["font_name"],
+            style["font_size"],
+            style["line_height"],
+            self.width - 2 * HISTORY_PADDING,
+            "left",
+            slot="history_next_line",
+        )
+
+    def refresh_line_style(self, style: Optional[dict] = None):
+        """
+        Aplica um novo estilo às linhas (padrão: relê o env).
+        Só as linhas visíveis são renderizadas de novo; as demais pegam o
+        estilo quando forem recicladas.
+        """
+        style = dict(style) if style is not None else _current_line_style()
+        if style == self.line_style:
+            return
+        self.line_style = style
+        self.refresh_from_data()
+
     def clear_all(self):
         self.start_new_conversation()
-        for widget in list(self.lines):
-            try:
-                self.remove_widget(widget)
-            except Exception:
-                pass
-        self.lines = []
+        self.data = []
 
     def _schedule_flush(self, force: bool = False):
         if self.is_private_mode:
@@ -192,40 +362,47 @@ class TranscriptHistory(GridLayout):
             self._flush_conversation_async()
             return
         if self._flush_event is None:
-            self._flush_event = Clock.schedule_once(self._flush_timer_cb, FLUSH_DEBOUNCE_SEC)
+            # Com o disco atrasado, espaça os flushes (as linhas se acumulam num só pedido)
+            delay = FLUSH_DEBOUNCE_BEHIND_SEC if TRANSCRIPT_WRITER.is_behind() else FLUSH_DEBOUNCE_SEC
+            self._flush_event = Clock.schedule_once(self._flush_timer_cb, delay)
 
     def _flush_timer_cb(self, _dt):
         self._flush_event = None
         self._flush_conversation_async()
 
-    def _flush_conversation_async(
-        self,
-        lines_snapshot: Optional[List[dict]] = None,
-        finalized: Optional[bool] = None,
-    ) -> None:
+    def _flush_conversation_async(self, finalized: Optional[bool] = None) -> None:
+        """Entrega ao escritor só as linhas ainda não entregues (sem copiar o histórico)."""
         if self.is_private_mode:
             return
-        lines = lines_snapshot if lines_snapshot is not None else list(self.saved_lines)
-        if not lines:
+        finalized_flag = self.conversation_finalized if finalized is None else finalized
+        new_lines = self.saved_lines[self._handed_off:]
+        if not new_lines and not (finalized_flag and self.saved_lines):
             return
-        conversation_id = self.conversation_id
+        self._handed_off = len(self.saved_lines)
         created_at = self._conversation_created_at or datetime.datetime.now().isoformat()
-        finalized_flag = self.conversation_finalized if finalized is None else finalized
-        TRANSCRIPT_EXECUTOR.submit(
-            _persist_conversation,
-            conversation_id,
-            created_at,
-            lines,
-            finalized_flag,
-        )
+        TRANSCRIPT_WRITER.append(self.conversation_id, created_at, new_lines, finalized_flag)
+
+    def flush_pending(self, timeout: float = 2.0) -> bool:
+        """Entrega o que falta e espera o escritor gravar (usado ao encerrar)."""
+        if self._flush_event:
+            try:
+                self._flush_event.cancel()
+            except Exception:
+                pass
+            self._flush_event = None
+        self._flush_conversation_async()
+        return TRANSCRIPT_WRITER.flush(timeout)
 
     def get_saved_conversations(self):
         conversations = []
         try:
             for file in os.listdir(TRANSCRIPTS_DIR):
+                path = os.path.join(TRANSCRIPTS_DIR, file)
+                if file.endswith(ARCHIVE_SUFFIX):
+                    conversations.append(read_archive(path).to_dict())
+                    continue
                 if not file.endswith(".json"):
                     continue
-                path = os.path.join(TRANSCRIPTS_DIR, file)
                 with open(path, "r", encoding="utf-8") as handle:
                     conversations.append(json.load(handle))
         except Exception as exc:
@@ -233,7 +410,7 @@ class TranscriptHistory(GridLayout):
         return conversations
 
     def get_device_info_for_bluetooth(self):
-        self.device_info.update_active_time()
+        # Chamado pela thread do BLE: só memória, a gravação fica com o DeviceInfo
         return self.device_info.get_device_data_for_bluetooth()
 
     def update_device_name(self, name):